@@ -4,4 +4,13 @@ from .config import *
 from .hashstash import *
 from .utils import *
 from .serializers import *
-from .engines import *
\ No newline at end of file
+from .engines import *
+
+# `from hashstash import *` still exports the engines, loading them at that point
+__all__ = [k for k in globals() if not k.startswith('_')] + list(LAZY_ENGINE_ATTRS)
+
+
+def __getattr__(name):
+    if name in LAZY_ENGINE_ATTRS:
+        return getattr(engines, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
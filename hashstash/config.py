@@ -6,8 +6,9 @@ class Config:
         serializer: Union[SERIALIZER_TYPES, List[SERIALIZER_TYPES]] = None,
         engine: ENGINE_TYPES = None,
         compress: bool = None,
-        b64: bool = DEFAULT_B64,
+        b64: bool = None,  # None: only on engines that can't hold bytes
         root_dir: str = DEFAULT_ROOT_DIR,
+        json_backend: JSON_BACKEND_TYPES = None,
         **kwargs,
     ):
         self.serializer = get_serializer_type(serializer)
@@ -15,6 +16,13 @@ class Config:
         self.compress = get_compresser(compress)
         self.b64 = b64
         self.root_dir = root_dir
+        if json_backend is not None:
+            self.set_json_backend(json_backend)
+
+    @property
+    def json_backend(self):
+        from .serializers.jsons import get_json_backend_name
+        return get_json_backend_name()
 
 
     def to_dict(self):
@@ -24,6 +32,7 @@ class Config:
             "compress": self.compress,
             "b64": self.b64,
             "root_dir": self.root_dir,
+            "json_backend": self.json_backend,
         }
 
     def __repr__(self):
@@ -47,6 +56,15 @@ class Config:
             )
         self.engine = engine
 
+    def set_json_backend(self, json_backend: JSON_BACKEND_TYPES):
+        """Switch the JSON backend for all serialization (process-wide). Keys are unaffected."""
+        from .serializers.jsons import set_json_backend
+        if json_backend not in JSON_BACKENDS_LIST:
+            raise ValueError(
+                f"Invalid JSON backend: {json_backend}. Options: {', '.join(JSON_BACKENDS_LIST)}."
+            )
+        set_json_backend(json_backend)
+
     def set_compress(self, compress: bool):
         self.compress = compress
 
@@ -77,13 +95,6 @@ class Config:
 def get_working_engines():
     working_engines = set(BUILTIN_ENGINES)
 
-    try:
-        import sqlitedict
-
-        working_engines.add("sqlite")
-    except ImportError:
-        pass
-
     try:
         import redis
         import redis_dict
@@ -147,7 +158,10 @@ def get_engine(engine):
 @fcache
 def get_working_serializers():
     from .utils.logs import log
-    working_serializers = ['hashstash','pickle']
+    import pickle
+    working_serializers = ['hashstash','hashstash-binary','auto','pickle']
+    if hasattr(pickle, 'PickleBuffer'):  # python 3.8+
+        working_serializers.append('pickle5-oob')
     try:
         import jsonpickle
         working_serializers.append('jsonpickle')
@@ -155,6 +169,36 @@ def get_working_serializers():
         pass
     return working_serializers
 
+@fcache
+def get_working_json_backends():
+    working_backends = ["json"]
+    try:
+        import orjson
+        working_backends.append("orjson")
+    except ImportError:
+        pass
+    try:
+        import ujson
+        working_backends.append("ujson")
+    except ImportError:
+        pass
+    try:
+        import simdjson
+        working_backends.append("simdjson")
+    except ImportError:
+        pass
+    return working_backends
+
+def get_json_backend_type(json_backend=None):
+    from .utils.logs import log
+    if json_backend is None:
+        json_backend = OPTIMAL_JSON_BACKEND
+        return json_backend if json_backend in get_working_json_backends() else DEFAULT_JSON_BACKEND
+    if json_backend not in get_working_json_backends():
+        log.warning(f"JSON backend {json_backend} is not installed. Defaulting to {DEFAULT_JSON_BACKEND}.")
+        return DEFAULT_JSON_BACKEND
+    return json_backend
+
 def get_serializer_type(serializer):
     if serializer is None:
         serializer = OPTIMAL_SERIALIZER
@@ -262,6 +306,12 @@ def get_working_compressers():
         compressers.append('lz4')
     except ImportError:
         pass
+
+    try:
+        import zstandard
+        compressers.append('zstd')
+    except ImportError:
+        pass
     return set(compressers)
 
 @fcache
@@ -1,8 +1,4 @@
-import warnings
-warnings.filterwarnings('ignore')
 import sys
-
-sys.path.insert(0, "/Users/ryan/github/prosodic")
 import logging
 from typing import *
 import os
@@ -37,7 +33,25 @@ OPTIMAL_COMPRESS = 'lz4'
 DEFAULT_COMPRESS = RAW_NO_COMPRESS
 DEFAULT_B64 = True
 
-COMPRESSERS = ['zlib','lz4','blosc','gzip','bz2']
+COMPRESSERS = ['zlib','lz4','blosc','gzip','bz2','zstd']
+# The latest record of a key with versions (see BaseHashStash._append) starts with
+# VERSIONED_MAGIC, so only those keys look up the versions store. No encoded value,
+# b64 or not, starts with "~".
+VERSIONED_MAGIC = '~HSV'
+
+# Compressed values start with CODEC_MAGIC and a byte naming their codec, so one
+# stash can hold values written with any codec; uncompressed values have no header.
+CODEC_MAGIC = b'\x00HSC'
+CODEC_IDS = {'zlib': 1, 'lz4': 2, 'blosc': 3, 'gzip': 4, 'bz2': 5, 'zstd': 6}
+ZSTD_LEVEL = 3
+# values smaller than this (in serialized bytes) are stored uncompressed
+DEFAULT_COMPRESS_MIN_SIZE = 256
+# Values of at least CODEC_CHUNK_MIN_SIZE serialized bytes are compressed in chunks
+# of CODEC_CHUNK_SIZE, framed by CHUNKED_MAGIC, so they can be written and read
+# piece by piece.
+CHUNKED_MAGIC = b'\x00HSK'
+CODEC_CHUNK_SIZE = 4 * 1024**2
+CODEC_CHUNK_MIN_SIZE = 16 * 1024**2
 
 # Cache engines
 ENGINE_TYPES = Literal[
@@ -52,7 +66,7 @@ ENGINE_TYPES = Literal[
     "mongo",
 ]
 ENGINES = ENGINE_TYPES.__args__
-BUILTIN_ENGINES = ['memory', 'pairtree', 'shelve']
+BUILTIN_ENGINES = ['memory', 'pairtree', 'shelve', 'sqlite']
 EXT_ENGINES = [e for e in ENGINES if e not in BUILTIN_ENGINES]
 
 # Performance testing constants
@@ -92,13 +106,33 @@ OBJ_SRC_KEY = "__py_src__"
 
 SERIALIZER_TYPES = Literal[
     "hashstash",          # flexible, but not as fast as jsonpickle
+    "hashstash-binary",   # hashstash with array/bytes payloads kept raw, outside the JSON
     "jsonpickle",      # pretty flexible json replacement for pickle
     "pickle",          # fastest but not platform independent
+    "pickle5-oob",     # pickle protocol 5 with large buffers stored raw, read without copying
+    "auto",            # per value: plain JSON, hashstash, or hashstash-binary, tagged in the output
 ]
 DEFAULT_SERIALIZER = "hashstash"
 OPTIMAL_SERIALIZER = "hashstash"
 SERIALIZERS = list(SERIALIZER_TYPES.__args__)
 
+# JSON libraries the hashstash serializer can write and read values with
+JSON_BACKEND_TYPES = Literal[
+    "json",      # stdlib
+    "orjson",    # fastest, writes and reads
+    "ujson",
+    "simdjson",  # reads only; writes with stdlib json
+]
+DEFAULT_JSON_BACKEND = "json"
+OPTIMAL_JSON_BACKEND = "orjson"
+JSON_BACKENDS_LIST = list(JSON_BACKEND_TYPES.__args__)
+
+KEY_MODE_TYPES = Literal[
+    "serialized",      # engine key is the encoded serialized key
+    "digest",          # engine key is a fixed-size fingerprint; key stored once aside
+]
+KEY_MODES = list(KEY_MODE_TYPES.__args__)
+
 DATA_TYPES = ('pandas_df', 'dict')
 DEFAULT_DATA_TYPE = 'pandas_df'
 
@@ -1,11 +1,31 @@
 from .. import *
 from .base import *
-from .memory import *
-from .pairtree import *
-from .shelve import *
-from .diskcache import *
-from .redis import *
-from .mongo import *
-from .sqlite import *
-from .lmdb import *
-from .dataframe import *
\ No newline at end of file
+
+# engine modules (and the optional libraries behind them) are only imported on
+# first use: either through HashStash(engine=...) or by attribute access below
+LAZY_ENGINE_ATTRS = {
+    "MemoryHashStash": "memory",
+    "get_shared_memory_cache": "memory",
+    "PairtreeHashStash": "pairtree",
+    "ShelveHashStash": "shelve",
+    "DiskCacheHashStash": "diskcache",
+    "RedisHashStash": "redis",
+    "start_redis_server": "redis",
+    "get_db_number": "redis",
+    "MAX_REDIS_DB": "redis",
+    "MongoHashStash": "mongo",
+    "start_mongo_server": "mongo",
+    "get_db_name": "mongo",
+    "stream_subprocess_output": "mongo",
+    "MAX_MONGO_DB": "mongo",
+    "SqliteHashStash": "sqlite",
+    "LMDBHashStash": "lmdb",
+    "DataFrameHashStash": "dataframe",
+}
+
+
+def __getattr__(name):
+    if name in LAZY_ENGINE_ATTRS:
+        module = importlib.import_module(f"{__name__}.{LAZY_ENGINE_ATTRS[name]}")
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
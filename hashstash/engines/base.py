@@ -1,13 +1,13 @@
 from . import *
+import itertools
 import time
 import threading
 from contextlib import contextmanager
-from multiprocessing import Manager, Lock as mp_Lock
-from multiprocessing.managers import SyncManager
-from ..serializers import serialize, deserialize
+from ..serializers import serialize, deserialize, serialize_parts, deserialize_range
 
-_manager = Manager()
-_connection_lock = _manager.dict()
+# the lock manager is a server process, so only start it once a lock is needed
+_manager = None
+_connection_lock = None
 _connection_pool = {}
 _last_used = {}
 
@@ -15,8 +15,7 @@ _last_used = {}
 def get_manager():
     global _manager, _connection_lock
     if _manager is None:
-        _manager = SyncManager()
-        _manager.start()
+        _manager = get_mp_context().Manager()
         _connection_lock = _manager.dict()
     return _manager
 
@@ -31,14 +30,54 @@ def get_lock(path):
 
 
 
+class StashedStream:
+    """Stands in for a streamed value whose records are kept in chunks (see BaseHashStash.stream)."""
+
+    def __init__(self, stream_id, num_chunks=0, length=0):
+        self.stream_id = stream_id
+        self.num_chunks = num_chunks
+        self.length = length
+
+    def __repr__(self):
+        return f"StashedStream({self.stream_id!r}, num_chunks={self.num_chunks}, length={self.length})"
+
+
+_BLOB_SCALARS = frozenset({int, float, bool, complex, type(None)})
+_IMMUTABLE_TYPES = _BLOB_SCALARS | {str, bytes}
+_VERSIONED_MAGIC_BYTES = VERSIONED_MAGIC.encode()
+
+
+def _mark_versioned(encoded_value):
+    if isinstance(encoded_value, str):
+        return VERSIONED_MAGIC + encoded_value
+    return _VERSIONED_MAGIC_BYTES + encoded_value
+
+
+def _unmark_versioned(encoded_value):
+    """(whether a key's record is marked as having versions, the record without the mark)"""
+    magic = VERSIONED_MAGIC if isinstance(encoded_value, str) else _VERSIONED_MAGIC_BYTES
+    if encoded_value[: len(magic)] != magic:
+        return False, encoded_value
+    if isinstance(encoded_value, str):
+        return True, encoded_value[len(magic):]
+    return True, memoryview(encoded_value)[len(magic):]
+
+
 class BaseHashStash(MutableMapping):
     engine = "base"
     name = DEFAULT_NAME
     filename = DEFAULT_FILENAME
     dbname = DEFAULT_DBNAME
     compress = DEFAULT_COMPRESS
+    compress_min_size = DEFAULT_COMPRESS_MIN_SIZE
+    # values of at least codec_chunk_min_size serialized bytes are encoded in chunks
+    # (see iter_encode_chunked) and handed to the engine piece by piece
+    codec_chunk_size = CODEC_CHUNK_SIZE
+    codec_chunk_min_size = CODEC_CHUNK_MIN_SIZE
     b64 = DEFAULT_B64
     ensure_dir = True
+    # engines that can only hold str keys or values declare it here; by default
+    # only they are base64-encoded
     string_keys = False
     string_values = False
     serializer = DEFAULT_SERIALIZER
@@ -51,18 +90,44 @@ class BaseHashStash(MutableMapping):
         "engine",
         "serializer",
         "compress",
+        "compress_min_size",
+        "codec_chunk_size",
+        "codec_chunk_min_size",
         "b64",
         "append_mode",
         "is_function_stash",
         "is_tmp",
+        "lru_size",
+        "lru_bytes",
+        "key_mode",
+        "stream_chunk_size",
+        "blob_min_size",
     ]
     metadata_cols = ["_version"]
     CONNECTION_TIMEOUT = 60  # Close connections after 60 seconds of inactivity
     append_mode = DEFAULT_APPEND_MODE
     is_tmp = False
     is_function_stash = False
+    versions_dbname = "_versions"
+    # "serialized": the engine key is the encoded, serialized key (the default)
+    # "digest": the engine key is a fixed-size fingerprint of the key, and the
+    #     serialized key is written once to a sibling stash for keys()/items()
+    key_mode = "serialized"
+    key_payloads_dbname = "_keys"
+    # optional per-process LRU of decoded values, bounded by entries and bytes; hits
+    # return fresh copies, and only writes made through this instance invalidate it
+    lru_size = 0
+    lru_bytes = 64 * 1024**2
     needs_lock = True
     needs_reconnect = False
+    streams_dbname = "_streams"
+    stream_chunk_size = 1000
+    # with blob_min_size set, values' strings, buffers, arrays and dataframes of at
+    # least that many bytes are stored once each in a content-addressed sibling stash
+    blob_min_size = None
+    blobs_dbname = "_blobs"
+    # zstd dictionaries from train_compression_dictionary(), by dict id
+    dictionaries_dbname = "_dictionaries"
 
     @log.debug
     def __init__(
@@ -70,6 +135,9 @@ class BaseHashStash(MutableMapping):
         root_dir: str = None,
         dbname: str = None,
         compress: str = None,
+        compress_min_size: int = None,
+        codec_chunk_size: int = None,
+        codec_chunk_min_size: int = None,
         b64: bool = None,
         serializer: SERIALIZER_TYPES = None,
         parent: "BaseHashStash" = None,
@@ -77,7 +145,13 @@ class BaseHashStash(MutableMapping):
         is_function_stash=None,
         is_tmp=None,
         append_mode: bool = False,
+        lru_size: int = None,
+        lru_bytes: int = None,
+        key_mode: KEY_MODE_TYPES = None,
+        stream_chunk_size: int = None,
+        blob_min_size: int = None,
         clear: bool = False,
+        legacy_codec: str = None,
         **kwargs,
     ) -> None:
         config = Config()
@@ -94,9 +168,14 @@ class BaseHashStash(MutableMapping):
         self.compress = get_compresser(
             compress if compress is not None else config.compress
         )
+        self.compress_min_size = compress_min_size if compress_min_size is not None else self.compress_min_size
+        self.codec_chunk_size = codec_chunk_size if codec_chunk_size is not None else self.codec_chunk_size
+        self.codec_chunk_min_size = codec_chunk_min_size if codec_chunk_min_size is not None else self.codec_chunk_min_size
         self.b64 = b64 if b64 is not None else config.b64
-        if self.compress and (self.string_keys or self.string_values):
+        if self.string_keys or self.string_values:
             self.b64 = True
+        elif self.b64 is None:
+            self.b64 = False
         self.serializer = serializer if serializer is not None else config.serializer
         self.dbname = dbname if dbname is not None else self.dbname
         self.parent = parent
@@ -109,15 +188,62 @@ class BaseHashStash(MutableMapping):
         self.is_tmp = is_tmp if is_tmp is not None else self.is_tmp
         self._tmp = None
         self.append_mode = append_mode if append_mode is not None else self.append_mode
-        # get folders
+        self.lru_size = lru_size if lru_size is not None else self.lru_size
+        self.lru_bytes = lru_bytes if lru_bytes is not None else self.lru_bytes
+        self._lru = LRUCache(self.lru_size, self.lru_bytes) if self.lru_size else None
+        self.key_mode = key_mode if key_mode is not None else self.key_mode
+        if self.key_mode not in KEY_MODES:
+            raise ValueError(f"Invalid key_mode: {self.key_mode}. Choose one of: {', '.join(KEY_MODES)}")
+        self._stored_key_payloads = set()
+        self.stream_chunk_size = stream_chunk_size if stream_chunk_size is not None else self.stream_chunk_size
+        self.blob_min_size = blob_min_size if blob_min_size is not None else self.blob_min_size
+        self._stored_blobs = set()
+        self._compression_dictionaries = {}
+        self._own_b64 = self.b64
+        self._use_folder(self.b64, legacy_codec)
+        if clear:
+            self.clear()
+        elif (
+            legacy_codec is None
+            and parent is None
+            and self.ensure_dir
+            and not os.path.exists(self.path_dirname)
+        ):
+            # until migrate_legacy(), read and write the legacy folder this stash
+            # was kept in by earlier versions, if any, in its own encoding
+            legacy = [
+                (codec, b64)
+                for codec, b64, _ in self._legacy_path_dirnames()
+                if b64 or not (self.string_keys or self.string_values)
+            ]
+            if legacy:
+                # the folder of this stash's compress if there is one, else the newest
+                codec, b64 = sorted(legacy, key=lambda x: x[0] == self.compress)[-1]
+                self._use_folder(b64, codec)
+                log.info(f"reading legacy folder {self.path_dirname}; move it to the current layout with migrate_legacy()")
+
+    def _use_folder(self, b64, legacy_codec=None):
+        # legacy_codec is only set on stashes kept in a legacy folder (see migrate_legacy)
+        self.b64 = b64
+        self.legacy_codec = legacy_codec
+        self.path_dirname = self._get_path_dirname(b64, legacy_codec or RAW_NO_COMPRESS)
+        self.path = os.path.join(self.path_dirname, self.filename)
+
+    @property
+    def _legacy_compressed(self) -> bool:
+        # legacy values are compressed with the folder's codec, without a codec header
+        return self.legacy_codec not in (None, RAW_NO_COMPRESS)
+
+    def _get_path_dirname(self, b64, codec=RAW_NO_COMPRESS):
         folders = [self.root_dir]
         if self.dbname: folders.append(self.dbname)
-        param_folder_name = f"{self.engine}.{self.serializer}.{get_encoding_str(self.compress, self.b64)}"
+        # values name their codec, so the folder doesn't depend on it (uncompressed
+        # stashes keep the "raw" folder they always had)
+        param_folder_name = f"{self.engine}.{self.serializer}.{get_encoding_str(codec, b64)}"
+        if self.key_mode != "serialized":
+            param_folder_name += f".{self.key_mode}"
         folders.append(param_folder_name)
-        self.path_dirname = os.path.join(*folders)
-        self.path = os.path.join(self.path_dirname, self.filename)
-        if clear:
-            self.clear()
+        return os.path.join(*folders)
 
     @staticmethod
     def _remove_dir(dir_path):
@@ -126,19 +252,33 @@ class BaseHashStash(MutableMapping):
 
     @log.debug
     def encode(self, *args, b64=None, compress=None, **kwargs):
-        return encode(
+        if self._legacy_compressed and compress is None:
+            return encode(*args, b64=self.b64 if b64 is None else b64, compress=self.legacy_codec, **kwargs)
+        compress = self.compress if compress is None else compress
+        return encode_tagged(
             *args,
             b64=self.b64 if b64 is None else b64,
-            compress=self.compress if compress is None else compress,
+            compress=compress,
+            min_size=self.compress_min_size,
+            dictionary=self.compression_dictionary if compress == "zstd" else None,
             **kwargs,
         )
 
     @log.debug
-    def decode(self, *args, b64=None, compress=None, **kwargs):
-        return decode(
+    def decode(self, encoded_value, *args, b64=None, **kwargs):
+        if self._legacy_compressed:
+            return decode(
+                _unmark_versioned(encoded_value)[1],
+                *args,
+                b64=self.b64 if b64 is None else b64,
+                compress=self.legacy_codec,
+                **kwargs,
+            )
+        return decode_tagged(
+            _unmark_versioned(encoded_value)[1],
             *args,
             b64=self.b64 if b64 is None else b64,
-            compress=self.compress if compress is None else compress,
+            get_dictionary=self._get_compression_dictionary,
             **kwargs,
         )
 
@@ -374,12 +514,13 @@ class BaseHashStash(MutableMapping):
             unencoded_key,
             default=None,
             with_metadata=with_metadata,
-            all_results=all_results,
+            # only the newest version is returned, so only read it
+            all_results=all_results if with_metadata else False,
             as_dataframe=as_dataframe,
             **kwargs,
         )
         value = values[-1] if values else default
-        return self.serialize(value) if as_string else value
+        return self.serialize(value, as_string=True) if as_string else value
 
     @log.debug
     def get_all(
@@ -391,21 +532,33 @@ class BaseHashStash(MutableMapping):
         **kwargs,
     ) -> Any:
         encoded_key = self.encode_key(unencoded_key)
-        encoded_value = self._get(encoded_key)
-        if encoded_value is None:
-            return default
+        if self._all_results(all_results) or with_metadata:
+            encoded_value = self._get(encoded_key)
+            if encoded_value is None:
+                return default
+            values = None
+            if _unmark_versioned(encoded_value)[0]:
+                values = self._get_versions(encoded_key)
+            if values is None:
+                values = self.decode_value(encoded_value)
+        else:
+            values = self._get_decoded(encoded_key)
+            if values is None:
+                return default
 
-        values = self.decode_value(encoded_value)
+        values = [self._replay_if_stream(value) for value in values]
         if with_metadata:
             values = [
                 {"_version": vi + 1, "_value": value} for vi, value in enumerate(values)
             ]
-        if not self._all_results(all_results):
-            values = values[-1:]
-        return values
+        return values[-1:] if not self._all_results(all_results) else list(values)
 
     @log.debug
     def set(self, unencoded_key: Any, unencoded_value: Any, append=None) -> None:
+        if is_generator(unencoded_value):
+            for _ in self.stream(unencoded_key, unencoded_value, append=append):
+                pass
+            return
         encoded_key = self.encode_key(unencoded_key)
         # log.info(encoded_key)
         new_unencoded_value = self.new_unencoded_value(
@@ -414,8 +567,68 @@ class BaseHashStash(MutableMapping):
             append=append,
         )
 
-        encoded_value = self.encode_value(new_unencoded_value)
-        self._set(encoded_key, encoded_value)
+        pieces = self._encode_value_pieces(new_unencoded_value)
+        self._lru_pop([encoded_key])
+        self._set_key_payloads([(encoded_key, unencoded_key)])
+        self._set_pieces(encoded_key, pieces, append=bool(append or self.append_mode))
+
+    @log.debug
+    def get_many(self, unencoded_keys: Iterable[Any], default: Any = None) -> List[Any]:
+        """
+        Get the latest value for each of several keys in one batch.
+
+        Returns a list aligned with `unencoded_keys`, with `default` for missing keys.
+        """
+        encoded_keys = [self.encode_key(k) for k in unencoded_keys]
+        cached = [self._lru_get(k) for k in encoded_keys]
+        missing = [k for k, values in zip(encoded_keys, cached) if values is None]
+        fetched = dict(zip(missing, self._get_many(missing))) if missing else {}
+        out = []
+        for encoded_key, values in zip(encoded_keys, cached):
+            if values is None and fetched.get(encoded_key) is not None:
+                values = self.decode_value(fetched[encoded_key])
+                self._lru_set(encoded_key, values, fetched[encoded_key])
+            out.append(self._replay_if_stream(values[-1]) if values else default)
+        return out
+
+    @log.debug
+    def set_many(self, items: Union[Mapping, Iterable[Tuple[Any, Any]]], append=None) -> None:
+        """
+        Set several key/value pairs in one batch.
+
+        `items` can be a mapping or an iterable of (key, value) pairs. Repeated
+        keys behave as if set one after the other.
+        """
+        batch, unencoded_keys = {}, {}
+        for unencoded_key, unencoded_value in iter_pairs(items):
+            encoded_key = self.encode_key(unencoded_key)
+            batch.setdefault(encoded_key, []).append(unencoded_value)
+            unencoded_keys[encoded_key] = unencoded_key
+
+        self._lru_pop(batch)
+        self._set_key_payloads(unencoded_keys.items())
+        if append or self.append_mode:
+            # each key's new values become one version record
+            for encoded_key, values in batch.items():
+                self._append(encoded_key, self.encode_value(values))
+        else:
+            self._set_many(
+                [(encoded_key, self.encode_value(values[-1:])) for encoded_key, values in batch.items()]
+            )
+
+    @log.debug
+    def has_many(self, unencoded_keys: Iterable[Any]) -> List[bool]:
+        return self._has_many([self.encode_key(k) for k in unencoded_keys])
+
+    @log.debug
+    def delete_many(self, unencoded_keys: Iterable[Any]) -> None:
+        """
+        Delete several keys in one batch. Unlike `del stash[key]`, missing keys are skipped.
+        """
+        encoded_keys = [self.encode_key(k) for k in unencoded_keys]
+        self._lru_pop(encoded_keys)
+        self._del_many(encoded_keys)
+        self._drop_key_payloads(encoded_keys)
 
     @log.debug
     def run(
@@ -462,7 +675,9 @@ class BaseHashStash(MutableMapping):
         # result = unwrap_func(func)(*args, **kwargs)
         funcx = unwrap_func(func)
         result = call_function_politely(funcx, *args, **kwargs, _force=_force)
-        result = list(result) if is_generator(result) else result
+        if is_generator(result):
+            # stored chunk by chunk as the caller consumes it
+            return fstash.stream(unencoded_key, result)
         log.debug(
             f"Caching result for {func.__name__} under {serialize(unencoded_key)}"
         )
@@ -544,7 +759,7 @@ class BaseHashStash(MutableMapping):
         #     "kwargs": kwargs,
         # }
         key = (args,kwargs)
-        return encode_hash(self.serialize(key)) if not store_args else key
+        return encode_hash(self.serialize(key, canonical=True)) if not store_args else key
 
     @log.debug
     def new_unencoded_value(
@@ -553,14 +768,524 @@ class BaseHashStash(MutableMapping):
         unencoded_key=None,
         append=None,
     ):
-        if (append or self.append_mode) and unencoded_key is not None:
-            oldvals = self.get_all(
-                unencoded_key, all_results=True, default=[], with_metadata=False
+        # earlier versions live in their own records (see _append), so never re-read them here
+        return [unencoded_value]
+
+    ## LRU of decoded values
+
+    def _lru_get(self, encoded_key):
+        cached = self._lru.get(encoded_key) if self._lru is not None else None
+        # mutable values are held pickled, so callers never share (and edit) the cached copy
+        return pickle.loads(cached) if type(cached) is bytes else cached
+
+    def _lru_set(self, encoded_key, values, encoded_value):
+        if self._lru is None:
+            return
+        if all(type(value) in _IMMUTABLE_TYPES for value in values):
+            self._lru.set(encoded_key, values, nbytes=len(encoded_value))
+            return
+        try:
+            cached = pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return self._lru.pop(encoded_key)
+        self._lru.set(encoded_key, cached, nbytes=len(cached))
+
+    def _lru_pop(self, encoded_keys):
+        if self._lru is not None:
+            for encoded_key in encoded_keys:
+                self._lru.pop(encoded_key)
+
+    def _get_decoded(self, encoded_key) -> Optional[List[Any]]:
+        """Decoded main record for an encoded key, via the LRU when enabled."""
+        values = self._lru_get(encoded_key)
+        if values is None:
+            encoded_value = self._get(encoded_key)
+            if encoded_value is not None:
+                values = self.decode_value(encoded_value)
+                self._lru_set(encoded_key, values, encoded_value)
+        return values
+
+    def lru_info(self) -> Optional[LRUCacheInfo]:
+        """Hit/miss counts and current size of the decoded-value LRU, or None if disabled."""
+        return self._lru.info() if self._lru is not None else None
+
+    def lru_clear(self):
+        if self._lru is not None:
+            self._lru.clear()
+
+    ## Key payloads (key_mode="digest")
+
+    @cached_property
+    def key_payloads(self) -> "BaseHashStash":
+        return self._sibling_stash(self.key_payloads_dbname)
+
+    def _set_key_payloads(self, encoded_unencoded_keys) -> None:
+        if self.key_mode != "digest":
+            return
+        new = {
+            encoded_key: unencoded_key
+            for encoded_key, unencoded_key in encoded_unencoded_keys
+            if encoded_key not in self._stored_key_payloads
+        }
+        if new:
+            self.key_payloads._set_many(
+                [
+                    (encoded_key, encode(self.serialize(unencoded_key), b64=self.b64, compress=False, as_string=self.string_values))
+                    for encoded_key, unencoded_key in new.items()
+                ]
             )
-            new_unencoded_value = oldvals + [unencoded_value]
+            self._stored_key_payloads.update(new)
+
+    def _drop_key_payloads(self, encoded_keys) -> None:
+        if self.key_mode != "digest":
+            return
+        self._stored_key_payloads.difference_update(encoded_keys)
+        self.key_payloads._del_many(list(encoded_keys))
+
+    ## Versions
+    # In append mode each write is stored as its own version record in a sibling
+    # stash (`versions`), under `<encoded_key>/<n>`, with the record count under
+    # `<encoded_key>`. The main record always holds the newest version, so
+    # appends are O(1) and reading the latest value never touches the history.
+    # It is marked (VERSIONED_MAGIC) while those records are current: a plain set
+    # or delete leaves them unmarked and unread, for prune_versions() to reclaim.
+
+    def _sibling_stash(self, dbname, **overrides) -> "BaseHashStash":
+        # a plain stash next to this one's data, cleared along with it
+        stash = self.__class__(
+            **{
+                **self.to_dict(),
+                "root_dir": self.path_dirname,
+                "dbname": f"{self.dbname}/{dbname}" if self.dbname else dbname,
+                "append_mode": False,
+                "lru_size": 0,
+                "key_mode": "serialized",
+                "blob_min_size": None,
+                "parent": self,
+                **overrides,
+            }
+        )
+        self.children.append(stash)
+        return stash
+
+    @cached_property
+    def versions(self) -> "BaseHashStash":
+        return self._sibling_stash(self.versions_dbname)
+
+    @staticmethod
+    def _encode_version_key(encoded_key, version: int):
+        suffix = f"/{version}"
+        return encoded_key + (suffix if isinstance(encoded_key, str) else suffix.encode())
+
+    def _has_versions_store(self) -> bool:
+        # avoid creating an on-disk versions store just to find it empty
+        return not self.ensure_dir or os.path.exists(self.versions.path_dirname)
+
+    def _get_version_counts(self, encoded_keys):
+        if not self._has_versions_store():
+            return [0 for _ in encoded_keys]
+        return [
+            self.versions.decode_value(count) if count is not None else 0
+            for count in self.versions._get_many(encoded_keys)
+        ]
+
+    def _get_versions(self, encoded_key) -> Optional[List[Any]]:
+        (count,) = self._get_version_counts([encoded_key])
+        if not count:
+            return None
+        records = self.versions._get_many(
+            [self._encode_version_key(encoded_key, n) for n in range(1, count + 1)]
+        )
+        return [
+            value
+            for record in records
+            if record is not None
+            for value in self.decode_value(record)
+        ]
+
+    @log.debug
+    def _append(self, encoded_key, encoded_value) -> None:
+        """
+        Add a version record for an encoded list of values, without reading older ones.
+        The count is read, then written: append to a key from one writer at a time.
+        """
+        encoded_current = self._get(encoded_key)
+        versioned = encoded_current is not None and _unmark_versioned(encoded_current)[0]
+        (stored,) = self._get_version_counts([encoded_key])
+        count = stored if versioned else 0
+        records = []
+        if encoded_current is not None and not versioned:
+            # the current plain value becomes the first version
+            count += 1
+            records.append((self._encode_version_key(encoded_key, count), encoded_current))
+        count += 1
+        records.append((self._encode_version_key(encoded_key, count), encoded_value))
+        records.append((encoded_key, self.versions.encode_value(count)))
+        self.versions._set_many(records)
+        if count < stored:
+            self.versions._del_many(
+                [self._encode_version_key(encoded_key, n) for n in range(count + 1, stored + 1)]
+            )
+        self._set(encoded_key, _mark_versioned(encoded_value))
+
+    @log.debug
+    def prune_versions(self, batch_size: int = 1000) -> int:
+        """
+        Delete the version records of keys since set without append or deleted, and
+        return how many. Run it while nothing else is writing to the stash.
+        """
+        if not self._has_versions_store():
+            return 0
+        stored = set(self.versions._keys())
+        counted = [k for k in stored if self._encode_version_key(k, 1) in stored]
+        stale = []
+        for i in range(0, len(counted), batch_size):
+            encoded_keys = counted[i : i + batch_size]
+            current = self._get_many(encoded_keys)
+            encoded_keys = [
+                encoded_key
+                for encoded_key, encoded_value in zip(encoded_keys, current)
+                if encoded_value is None or not _unmark_versioned(encoded_value)[0]
+            ]
+            for encoded_key, count in zip(encoded_keys, self._get_version_counts(encoded_keys)):
+                stale.append(encoded_key)
+                stale.extend(self._encode_version_key(encoded_key, n) for n in range(1, count + 1))
+        if stale:
+            self.versions._del_many(stale)
+        return len(stale)
+
+    ## Streams
+    # A streamed value is stored as numbered chunks of records in a sibling stash
+    # (`streams`), under `<stream_id>/<n>`. Once the stream is exhausted, the key
+    # itself is set to a StashedStream saying how many chunks to replay.
+
+    @cached_property
+    def streams(self) -> "BaseHashStash":
+        return self._sibling_stash(self.streams_dbname)
+
+    @log.debug
+    def stream(self, unencoded_key: Any, iterable: Iterable[Any], chunk_size=None, append=None):
+        """
+        Store the records of `iterable` under a key while yielding them on, writing
+        `chunk_size` records at a time so only one chunk is ever held in memory.
+
+        The key is set only if the iterable is exhausted; otherwise the chunks
+        written so far are dropped. get() returns a generator replaying the
+        records chunk by chunk. A stream's chunks are dropped when its key is
+        streamed again (outside append mode) or the stash is cleared.
+        """
+        chunk_size = chunk_size or self.stream_chunk_size
+        ref = StashedStream(uuid.uuid4().hex)
+        chunk = []
+        done = False
+        try:
+            for record in iterable:
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    self._set_stream_chunk(ref, chunk)
+                    chunk = []
+                yield record
+            if chunk:
+                self._set_stream_chunk(ref, chunk)
+            replaced = self._get_latest_stored(self.encode_key(unencoded_key))
+            self.set(unencoded_key, ref, append=append)
+            done = True
+            if not (append or self.append_mode):
+                self._drop_stream(replaced)
+        finally:
+            if not done:
+                self._drop_stream(ref)
+
+    def _get_latest_stored(self, encoded_key):
+        # newest stored value, with any StashedStream left as is
+        values = self._get_decoded(encoded_key)
+        return values[-1] if values else None
+
+    def _set_stream_chunk(self, ref, chunk):
+        ref.num_chunks += 1
+        ref.length += len(chunk)
+        self.streams.set(f"{ref.stream_id}/{ref.num_chunks}", chunk)
+
+    def _drop_stream(self, ref):
+        if isinstance(ref, StashedStream) and ref.num_chunks:
+            self.streams.delete_many([f"{ref.stream_id}/{n}" for n in range(1, ref.num_chunks + 1)])
+
+    def _replay_if_stream(self, value):
+        return self._replay_stream(value) if isinstance(value, StashedStream) else value
+
+    def _replay_stream(self, ref):
+        for n in range(1, ref.num_chunks + 1):
+            chunk = self.streams.get(f"{ref.stream_id}/{n}")
+            if chunk is None:
+                raise KeyError(f"chunk {n} of stream {ref.stream_id} is missing")
+            yield from chunk
+
+    ## Blobs
+    # With blob_min_size set, large leaves of a value's dicts, lists and tuples are
+    # encoded on their own and stored once in a sibling stash (`blobs`) under the
+    # md5 of their encoding; the value keeps a {'__blob__': digest} in their place.
+    # collect_blobs() deletes blobs no stored value refers to any more.
+
+    @cached_property
+    def dictionaries(self) -> "BaseHashStash":
+        return self._sibling_stash(self.dictionaries_dbname, compress=RAW_NO_COMPRESS)
+
+    @cached_property
+    def compression_dictionary(self):
+        """The zstd dictionary values are compressed with (under compress="zstd"), if one was trained."""
+        if self.ensure_dir and not os.path.exists(self.dictionaries.path_dirname):
+            return None
+        dict_id = self.dictionaries.get("current")
+        return self._get_compression_dictionary(dict_id) if dict_id is not None else None
+
+    def _get_compression_dictionary(self, dict_id):
+        try:
+            return self._compression_dictionaries[dict_id]
+        except KeyError:
+            import zstandard
+            data = self.dictionaries.get(dict_id)
+            if data is None:
+                raise ValueError(f"No compression dictionary {dict_id} in {self}")
+            dictionary = self._compression_dictionaries[dict_id] = zstandard.ZstdCompressionDict(data)
+            return dictionary
+
+    @log.debug
+    def train_compression_dictionary(self, sample: int = 1000, dict_size: int = 110 * 1024):
+        """
+        Train a zstd dictionary on up to `sample` stored values, keep it in the stash,
+        and compress all later values with it (switching this stash to compress="zstd").
+        Values written before, under any codec or dictionary, still decode.
+        """
+        import zstandard
+        samples = [bytes(self.decode(value)) for value in itertools.islice(self._values(), sample)]
+        if not samples:
+            raise ValueError("No stored values to train a compression dictionary on")
+        dictionary = zstandard.train_dictionary(dict_size, samples)
+        dict_id = dictionary.dict_id()
+        self.dictionaries.set(dict_id, dictionary.as_bytes())
+        self.dictionaries.set("current", dict_id)
+        self._compression_dictionaries[dict_id] = dictionary
+        self.compression_dictionary = dictionary
+        self.compress = "zstd"
+        return dictionary
+
+    @cached_property
+    def blobs(self) -> "BaseHashStash":
+        return self._sibling_stash(self.blobs_dbname)
+
+    def _extract_blobs(self, obj, seen):
+        obj_type = type(obj)
+        if obj_type in _BLOB_SCALARS:
+            return obj
+        if obj_type is dict:
+            new = {k: self._extract_blobs(v, seen) for k, v in obj.items()}
+            return obj if all(new[k] is v for k, v in obj.items()) else new
+        if obj_type is list or obj_type is tuple:
+            new = [self._extract_blobs(v, seen) for v in obj]
+            if all(a is b for a, b in zip(new, obj)):
+                return obj
+            return new if obj_type is list else tuple(new)
+        if approx_nbytes(obj) < self.blob_min_size:
+            return obj
+        if id(obj) not in seen:
+            seen[id(obj)] = (obj, {"__blob__": self._set_blob(obj)})
+        return seen[id(obj)][1]
+
+    def _set_blob(self, obj):
+        encoded_value = self.blobs.encode_value(obj)
+        digest = self.hash(encoded_value)
+        if digest not in self._stored_blobs:
+            encoded_key = self.blobs.encode_key(digest)
+            # repeated content is only hashed, never rewritten
+            if not self.blobs._has(encoded_key):
+                self.blobs._set(encoded_key, encoded_value)
+            self._stored_blobs.add(digest)
+        return digest
+
+    def _resolve_blobs(self, obj, seen):
+        obj_type = type(obj)
+        if obj_type is dict:
+            if len(obj) == 1 and "__blob__" in obj:
+                digest = obj["__blob__"]
+                if digest not in seen:
+                    seen[digest] = self._get_blob(digest)
+                return seen[digest]
+            for k, v in obj.items():
+                if type(v) in (dict, list, tuple):
+                    obj[k] = self._resolve_blobs(v, seen)
+        elif obj_type is list:
+            for i, v in enumerate(obj):
+                if type(v) in (dict, list, tuple):
+                    obj[i] = self._resolve_blobs(v, seen)
+        elif obj_type is tuple:
+            return tuple(self._resolve_blobs(v, seen) for v in obj)
+        return obj
+
+    def _get_blob(self, digest):
+        encoded_value = self.blobs._get(self.blobs.encode_key(digest))
+        if encoded_value is None:
+            raise KeyError(f"blob {digest} is missing")
+        return self.blobs.decode_value(encoded_value)
+
+    def _blob_records(self):
+        # every stored record that may refer to blobs
+        yield from self._values()
+        if self._has_versions_store():
+            yield from self.versions._values()
+
+    @log.debug
+    def collect_blobs(self) -> int:
+        """
+        Delete blobs that no stored value (or version) refers to, and return how many.
+        Run it while nothing else is writing to the stash.
+        """
+        if not os.path.exists(self.blobs.path_dirname) and self.ensure_dir:
+            return 0
+        referenced = set()
+        for encoded_value in self._blob_records():
+            stack = [self.deserialize(self.decode(encoded_value))]
+            while stack:
+                obj = stack.pop()
+                if type(obj) is dict:
+                    if len(obj) == 1 and "__blob__" in obj:
+                        referenced.add(obj["__blob__"])
+                    else:
+                        stack.extend(obj.values())
+                elif type(obj) in (list, tuple):
+                    stack.extend(obj)
+        unreferenced = [
+            encoded_key
+            for encoded_key in self.blobs._keys()
+            if self.blobs.decode_key(encoded_key) not in referenced
+        ]
+        self.blobs._del_many(unreferenced)
+        self._stored_blobs.clear()
+        return len(unreferenced)
+
+    ## Migrating legacy folders
+    # Stashes used to live in a folder named for their codec, "<engine>.<serializer>.
+    # <codec>[+b64]" (by default "lz4+b64"), with untagged values compressed by that
+    # codec and base64-encoded on every engine. Their records are copied here with
+    # those layers swapped for this stash's own; values are never deserialized.
+
+    def _legacy_path_dirnames(self) -> List[Tuple[str, bool, str]]:
+        """
+        (codec, b64, folder) of this stash's legacy folders on disk, oldest first;
+        stashes kept elsewhere list every folder they could have.
+        """
+        own_path_dirname = self._get_path_dirname(self._own_b64)
+        found = []
+        for codec in [RAW_NO_COMPRESS] + COMPRESSERS:
+            for b64 in (False, True):
+                path_dirname = self._get_path_dirname(b64, codec)
+                if path_dirname != own_path_dirname and (not self.ensure_dir or os.path.exists(path_dirname)):
+                    found.append((codec, b64, path_dirname))
+        return sorted(found, key=lambda x: os.path.getmtime(x[2])) if self.ensure_dir else found
+
+    @log.debug
+    def migrate_legacy(self, batch_size: int = 1000, remove: bool = True, b64: bool = None) -> int:
+        """
+        Copy the records of this stash's legacy folders (see _legacy_path_dirnames;
+        only the b64-encoded ones if b64=True) into its own folder, `batch_size`
+        records at a time, and return how many were copied. Where folders share a
+        key, the most recently modified wins. Versions, key payloads, streams, blobs
+        and compression dictionaries come along. The old folders are removed unless
+        remove=False. A stash reading a legacy folder uses its own one afterwards.
+        """
+        folders = self._legacy_path_dirnames()
+        if self.legacy_codec is not None:
+            # leave the legacy folder: drop its connections and sibling stashes
+            self.close()
+            for child in self.children:
+                child.close()
+            self.children = []
+            for cls in type(self).__mro__:
+                for name, attr in vars(cls).items():
+                    if isinstance(attr, cached_property):
+                        self.__dict__.pop(name, None)
+            self._use_folder(self._own_b64)
+        num = 0
+        for codec, source_b64, _ in folders:
+            if b64 is not None and source_b64 != b64:
+                continue
+            # latest values only: versions are moved separately
+            source = self.__class__(
+                **{**self.to_dict(), "b64": source_b64, "append_mode": False, "legacy_codec": codec}
+            )
+            if not self.ensure_dir and not len(source):
+                continue
+            num += self._migrate_records(source, batch_size)
+            if remove:
+                source.clear()
+            else:
+                source.close()
+        self.lru_clear()
+        self.__dict__.pop("compression_dictionary", None)
+        return num
+
+    @log.debug
+    def migrate_from_b64(self, batch_size: int = 1000, remove: bool = True) -> int:
+        """
+        Move the records of this stash's b64-encoded legacy folders ("raw+b64",
+        "lz4+b64", ...) here without the b64 layer; see migrate_legacy.
+        """
+        if self._own_b64:
+            raise ValueError(f"{self} is b64-encoded itself")
+        return self.migrate_legacy(batch_size=batch_size, remove=remove, b64=True)
+
+    def _migrated_key(self, source, encoded_key):
+        # digests are stored as they are; serialized keys are re-encoded canonically,
+        # as legacy folders hold compressed, non-canonical ones
+        if self.key_mode == "digest":
+            return encoded_key
+        decoded_key = decode(encoded_key, b64=source.b64, compress=source.legacy_codec)
+        return self.encode_key(self.deserialize(decoded_key))
+
+    def _migrated_value(self, source, encoded_value):
+        versioned, encoded_value = _unmark_versioned(encoded_value)
+        codec = source.legacy_codec
+        encoded_value = decode(encoded_value, b64=source.b64, compress=codec)
+        if codec and codec != RAW_NO_COMPRESS:
+            # legacy values carry no codec header: recompress them with a tagged one
+            encoded_value = self.encode(encoded_value, as_string=self.string_values)
         else:
-            new_unencoded_value = [unencoded_value]
-        return new_unencoded_value
+            encoded_value = encode(encoded_value, b64=self.b64, compress=False, as_string=self.string_values)
+        return _mark_versioned(encoded_value) if versioned else encoded_value
+
+    def _migrate_records(self, source, batch_size) -> int:
+        num = 0
+        for batch in batched(source._items(), batch_size):
+            self._set_many(
+                [(self._migrated_key(source, k), self._migrated_value(source, v)) for k, v in batch]
+            )
+            num += len(batch)
+        self._migrate_versions(source, batch_size)
+        if self.key_mode == "digest":
+            for batch in batched(source.key_payloads._items(), batch_size):
+                self.key_payloads._set_many([(k, self._migrated_value(source, v)) for k, v in batch])
+        for name in ["streams", "blobs", "dictionaries"]:
+            sibling = getattr(source, name)
+            if os.path.exists(sibling.path_dirname) if self.ensure_dir else len(sibling):
+                getattr(self, name)._migrate_records(sibling, batch_size)
+        return num
+
+    def _migrate_versions(self, source, batch_size) -> None:
+        if not source._has_versions_store():
+            return
+        for old_keys in batched(source._keys(), batch_size):
+            for old_key, count in zip(old_keys, source._get_version_counts(old_keys)):
+                if not count:
+                    continue
+                new_key = self._migrated_key(source, old_key)
+                old = [old_key] + [self._encode_version_key(old_key, n) for n in range(1, count + 1)]
+                new = [new_key] + [self._encode_version_key(new_key, n) for n in range(1, count + 1)]
+                self.versions._set_many(
+                    [
+                        (k, self._migrated_value(source, v))
+                        for k, v in zip(new, source.versions._get_many(old))
+                        if v is not None
+                    ]
+                )
 
     @log.debug
     def _get(self, encoded_key: str, default: Any = None) -> Any:
@@ -576,6 +1301,24 @@ class BaseHashStash(MutableMapping):
         except Exception as e:
             log.error(f"Failed to set key {encoded_key}: {e}")
 
+    # batch hooks: engines with native batch operations override these
+    def _get_many(self, encoded_keys: List[Union[str, bytes]]) -> List[Any]:
+        return [self._get(encoded_key) for encoded_key in encoded_keys]
+
+    def _set_many(self, encoded_items: List[Tuple[Union[str, bytes], Any]]) -> None:
+        for encoded_key, encoded_value in encoded_items:
+            self._set(encoded_key, encoded_value)
+
+    def _has_many(self, encoded_keys: List[Union[str, bytes]]) -> List[bool]:
+        return [self._has(encoded_key) for encoded_key in encoded_keys]
+
+    def _del_many(self, encoded_keys: List[Union[str, bytes]]) -> None:
+        for encoded_key in encoded_keys:
+            try:
+                self._del(encoded_key)
+            except KeyError:
+                pass
+
     @log.debug
     def __contains__(self, unencoded_key: Any) -> bool:
         return self.has(unencoded_key)
@@ -586,25 +1329,80 @@ class BaseHashStash(MutableMapping):
 
     @log.debug
     def encode_key(self, unencoded_key: Any) -> Union[str, bytes]:
-        return self.encode(
-            self.serialize(unencoded_key),
+        if self.key_mode == "digest":
+            digest = fingerprint(unencoded_key)
+            return digest if self.string_keys else digest.encode()
+        if self._legacy_compressed:
+            return self.encode(self.serialize(unencoded_key, canonical=True), as_string=self.string_keys)
+        # keys are small and compared as written, so they are never compressed
+        return encode(
+            self.serialize(unencoded_key, canonical=True),
+            b64=self.b64,
+            compress=False,
             as_string=self.string_keys,
-            # compress=False
         )
 
     @log.debug
     def encode_value(self, unencoded_value: Any) -> Union[str, bytes]:
-        return self.encode(
-            self.serialize(unencoded_value),
-            as_string=self.string_values,
+        return join_pieces(self._encode_value_pieces(unencoded_value))
+
+    def _encode_value_pieces(self, unencoded_value: Any):
+        # the encoded value, or for large values an iterable of its pieces
+        if self.blob_min_size is not None:
+            unencoded_value = self._extract_blobs(unencoded_value, {})
+        if self.b64 or self.string_values or self._legacy_compressed:
+            return self.encode(self.serialize(unencoded_value), as_string=self.string_values)
+        parts = serialize_parts(unencoded_value, self.serializer)
+        if sum(memoryview(part).nbytes for part in parts) < self.codec_chunk_min_size:
+            return self.encode(join_pieces(parts) if len(parts) > 1 else parts[0])
+        if self.compress == RAW_NO_COMPRESS:
+            return parts
+        return iter_encode_chunked(
+            parts,
+            self.compress,
+            chunk_size=self.codec_chunk_size,
+            dictionary=self.compression_dictionary if self.compress == "zstd" else None,
         )
 
+    def _set_pieces(self, encoded_key, pieces, append=False) -> None:
+        # engines that can write a value piece by piece override this
+        encoded_value = join_pieces(pieces)
+        if append:
+            self._append(encoded_key, encoded_value)
+        else:
+            self._set(encoded_key, encoded_value)
+
+    @log.debug
+    def get_range(self, unencoded_key: Any, start: int = None, stop: int = None, default: Any = None) -> Any:
+        """
+        value[start:stop] of the latest value under `unencoded_key`. If the value is an
+        array (sliced along its first axis) or bytes, stored out of band by the
+        hashstash-binary or auto serializer, only the bytes of those elements are read,
+        and for chunked values only their chunks are decompressed. Anything else is
+        read whole, then sliced.
+        """
+        encoded_key = self.encode_key(unencoded_key)
+        encoded_value = self._get(encoded_key) if self.blob_min_size is None else None
+        if encoded_value is not None:
+            if not self.b64 and is_chunked(encoded_value):
+                get_dictionary = self._get_compression_dictionary
+                read = lambda a, b: decode_chunked(encoded_value, a, b, get_dictionary=get_dictionary)
+            else:
+                decoded = memoryview(self.decode(encoded_value))
+                read = lambda a, b: decoded[a:b]
+            value = deserialize_range(read, self.serializer, start, stop)
+            if value is not None:
+                return value
+        value = self.get(unencoded_key, default=default)
+        return value[start:stop] if value is not default else default
+
     @log.debug
     def decode_key(self, encoded_key: Any, as_string=False) -> Union[str, bytes]:
-        decoded_key = self.decode(
-            encoded_key,
-            # compress=False,
-        )
+        if self.key_mode == "digest":
+            encoded_key = self.key_payloads._get(encoded_key)
+            if encoded_key is None:
+                raise KeyError("no stored key for digest")
+        decoded_key = decode(encoded_key, b64=self.b64, compress=self._legacy_compressed and self.legacy_codec)
         return (
             self.deserialize(decoded_key)
             if not as_string
@@ -617,14 +1415,13 @@ class BaseHashStash(MutableMapping):
         encoded_value: Any,
         as_string=False,
     ) -> Union[str, bytes, dict, list]:
-        log.debug("Decoding value")
         decoded_value = self.decode(encoded_value)
-        log.debug(f"Decoded value of {len(decoded_value):,}B")
-        return (
-            self.deserialize(decoded_value)
-            if not as_string
-            else decoded_value.decode("utf-8")
-        )
+        if as_string:
+            return decoded_value.decode("utf-8")
+        value = self.deserialize(decoded_value)
+        if self.blob_min_size is not None:
+            value = self._resolve_blobs(value, {})
+        return value
 
     @log.debug
     def _has(self, encoded_key: Union[str, bytes]):
@@ -633,13 +1430,21 @@ class BaseHashStash(MutableMapping):
 
     @log.debug
     def clear(self) -> "BaseHashStash":
-        for sub in self.children:
-            sub.clear()
-        
+        self._clear_children()
         self.close()
         self._remove_dir(self.path_dirname)
         return self
 
+    def _clear_children(self):
+        # also resets what this instance remembers about its data
+        self.lru_clear()
+        self._stored_key_payloads.clear()
+        self._stored_blobs.clear()
+        self._compression_dictionaries.clear()
+        self.__dict__.pop("compression_dictionary", None)
+        for sub in self.children:
+            sub.clear()
+
     @log.debug
     def __len__(self) -> int:
         with self as cache, cache.db as db:
@@ -649,7 +1454,10 @@ class BaseHashStash(MutableMapping):
     def __delitem__(self, unencoded_key: str) -> None:
         if not self.has(unencoded_key):
             raise KeyError(unencoded_key)
-        self._del(self.encode_key(unencoded_key))
+        encoded_key = self.encode_key(unencoded_key)
+        self._lru_pop([encoded_key])
+        self._del(encoded_key)
+        self._drop_key_payloads([encoded_key])
 
     @log.debug
     def _del(self, encoded_key: Union[str, bytes]) -> None:
@@ -727,10 +1535,9 @@ class BaseHashStash(MutableMapping):
     @log.debug
     def update(self, other=None, **kwargs):
         if hasattr(other, "items"):
-            for key, value in other.items():
-                self[key] = value
-        for key, value in kwargs.items():
-            self[key] = value
+            self.set_many(other.items())
+        if kwargs:
+            self.set_many(kwargs)
 
     @log.debug
     def setdefault(self, key, default=None):
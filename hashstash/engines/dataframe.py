@@ -27,9 +27,19 @@ class DataFrameHashStash(PairtreeHashStash):
         log.debug(f"Input is a {mdf.df_engine} DataFrame with shape: {mdf.shape}")
 
         encoded_key = self.encode_key(unencoded_key)
+        self._set_key_payloads([(encoded_key, unencoded_key)])
         self._set_key(encoded_key)
-        filepath_value = self._get_path_new_value(encoded_key)
-        return mdf.write(filepath_value, io_engine=self.io_engine, compression=self.compress)
+        filepath_value = self._get_path_new_value(encoded_key) + "." + self.io_engine
+        tmp_path = self._get_path_tmp(filepath_value) + "." + self.io_engine
+        out = mdf.write(tmp_path, io_engine=self.io_engine, compression=self.compress)
+        os.replace(tmp_path, filepath_value)
+        self._write_manifest("add", encoded_key, filepath_value, os.path.getsize(filepath_value))
+        return out
+
+    def set_many(self, items, append=None):
+        # dataframes are written by io_engine rather than encoded, so go through set()
+        for unencoded_key, unencoded_value in iter_pairs(items):
+            self.set(unencoded_key, unencoded_value)
 
     @log.debug
     def get_all(
@@ -104,7 +114,7 @@ class DataFrameHashStash(PairtreeHashStash):
         if values is None: return default
         if is_dataframe(values): return values
         value = values[-1] if values else default
-        return self.serialize(value) if as_string else value
+        return self.serialize(value, as_string=True) if as_string else value
         # if values is None:
         #     return default
         
@@ -155,7 +165,7 @@ class DataFrameHashStash(PairtreeHashStash):
             all_results=all_results, with_metadata=with_metadata, as_dataframe=True
         ), total=len(self), desc='concatenating dataframes across values'):
             dfs.append(
-                df.assign(**{k:serialize(v) for k,v in flatten_args_kwargs(key).items()})
+                df.assign(**{k:serialize(v, canonical=True) for k,v in flatten_args_kwargs(key).items()})
             )
         if not dfs:
             return MetaDataFrame([], self.df_engine)
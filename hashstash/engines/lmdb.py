@@ -1,88 +1,175 @@
 from . import *
 
+# One environment per (process, path), shared by every stash instance on the path:
+# LMDB must not be opened twice in a process, as closing either copy (or letting
+# it be collected) drops the other's locks
+_lmdb_envs = {}
+
+
 class LMDBHashStash(BaseHashStash):
+    """
+    Stash on an LMDB environment with two sub-databases keyed by the md5 of the
+    encoded key: `keys` holds the encoded key, `values` the encoded value. Both
+    sort identically, so items are read in one pass over each.
+
+    The map grows (doubling) whenever a write hits MapFullError. With
+    buffers=True, values are decoded straight from LMDB's memory map.
+    """
     engine = 'lmdb'
     filename_is_dir = True
+    keys_dbname = b'keys'
+    values_dbname = b'values'
+    buffers = False
 
-    def __init__(self, *args, map_size=10 * 1024**3, **kwargs):  # Default to 10GB
+    def __init__(self, *args, map_size=10 * 1024**3, buffers=None, **kwargs):  # Default to 10GB, grows as needed
         self._env = None
         self.map_size = map_size
+        if buffers is not None: self.buffers = buffers
         super().__init__(*args, **kwargs)
 
     @log.debug
     def get_db(self):
-        if self._env is None:
-            import lmdb
-            os.makedirs(self.path_dirname, exist_ok=True)
+        entry = _lmdb_envs.get(self.path)
+        if entry is not None and entry[0] == os.getpid():
+            _, self._env, self._keys_db, self._values_db = entry
+            return self._env
+        # never reuse an environment inherited across fork
+        import lmdb
+        os.makedirs(self.path_dirname, exist_ok=True)
 
-            self._env = lmdb.open(self.path, map_size=self.map_size)
+        self._env = lmdb.open(self.path, map_size=self.map_size, max_dbs=2)
+        self._keys_db = self._env.open_db(self.keys_dbname)
+        self._values_db = self._env.open_db(self.values_dbname)
+        _lmdb_envs[self.path] = (os.getpid(), self._env, self._keys_db, self._values_db)
+        self._import_legacy_records()
         return self._env
 
-
     @contextmanager
-    def get_transaction(self, write=False):
+    def get_transaction(self, write=False, buffers=False):
         import lmdb
-        max_retries = 3
-        for attempt in range(max_retries):
+        env = self.get_db()
+        try:
+            txn = env.begin(write=write, buffers=buffers)
+        except lmdb.MapResizedError:
+            # another process grew the map: adopt its size
+            env.set_mapsize(0)
+            txn = env.begin(write=write, buffers=buffers)
+        with txn:
+            yield txn
+
+    def _write(self, func):
+        import lmdb
+        while True:
             try:
-                with self.get_db().begin(write=write) as txn:
-                    yield txn
-                break
-            except lmdb.Error as e:
-                log.debug(f"LMDB transaction error (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-                self.close()  # Close the current environment
-                self._env = None  # Reset the environment to force a new one on next attempt
+                with self.get_transaction(write=True) as txn:
+                    return func(txn)
+            except lmdb.MapFullError:
+                self._grow_map_size()
+
+    def _grow_map_size(self):
+        self.map_size = self._env.info()['map_size'] * 2
+        log.info(f'growing LMDB map to {self.map_size:,}B at {self.path}')
+        self._env.set_mapsize(self.map_size)
+
+    def _import_legacy_records(self):
+        # earlier versions kept <md5hex>.key / <md5hex>.value records in the main database
+        def move(txn):
+            moved = []
+            for key, value in txn.cursor():
+                for suffix, db in [(b'.key', self._keys_db), (b'.value', self._values_db)]:
+                    if key.endswith(suffix):
+                        txn.put(bytes.fromhex(key[: -len(suffix)].decode()), value, db=db)
+                        moved.append(key)
+            for key in moved:
+                txn.delete(key)
+
+        with self.get_transaction() as txn:
+            named_dbs = 2
+            if txn.stat()['entries'] <= named_dbs:
+                return
+        self._write(move)
 
-    def _set(self, encoded_key, encoded_value):
-        with self.get_transaction(write=True) as txn:
-            txn.put(self._encode_key_key(encoded_key), encoded_key)
-            txn.put(self._encode_key_value(encoded_key), encoded_value)
+    @staticmethod
+    def _hash(encoded_key):
+        return hashlib.md5(encoded_key).digest()
+
+    def _put(self, txn, encoded_key, encoded_value):
+        hashed_key = self._hash(encoded_key)
+        txn.put(hashed_key, encoded_key, db=self._keys_db)
+        txn.put(hashed_key, encoded_value, db=self._values_db)
 
-    def _get(self, encoded_key):
-        with self.get_transaction(write=False) as txn:
-            return txn.get(self._encode_key_value(encoded_key))
+    def _delete(self, txn, encoded_key):
+        hashed_key = self._hash(encoded_key)
+        txn.delete(hashed_key, db=self._keys_db)
+        txn.delete(hashed_key, db=self._values_db)
+
+    def _set(self, encoded_key, encoded_value):
+        self._write(lambda txn: self._put(txn, encoded_key, encoded_value))
+
+    def _get(self, encoded_key, default=None):
+        with self.get_transaction() as txn:
+            return txn.get(self._hash(encoded_key), default, db=self._values_db)
+
+    def _get_decoded(self, encoded_key):
+        if not self.buffers:
+            return super()._get_decoded(encoded_key)
+        values = self._lru_get(encoded_key)
+        if values is None:
+            # decode while the transaction keeps the mapped buffer valid
+            with self.get_transaction(buffers=True) as txn:
+                buffer = txn.get(self._hash(encoded_key), db=self._values_db)
+                if buffer is None:
+                    return None
+                values = self.decode_value(buffer)
+                self._lru_set(encoded_key, values, buffer)
+        return values
 
     def _del(self, encoded_key):
-        with self.get_transaction(write=True) as txn:
-            txn.delete(self._encode_key_key(encoded_key))
-            txn.delete(self._encode_key_value(encoded_key))
+        self._write(lambda txn: self._delete(txn, encoded_key))
+
+    def _get_many(self, encoded_keys):
+        with self.get_transaction() as txn:
+            return [txn.get(self._hash(k), db=self._values_db) for k in encoded_keys]
+
+    def _set_many(self, encoded_items):
+        def put_all(txn):
+            for encoded_key, encoded_value in encoded_items:
+                self._put(txn, encoded_key, encoded_value)
+        self._write(put_all)
+
+    def _has_many(self, encoded_keys):
+        with self.get_transaction() as txn:
+            return [txn.get(self._hash(k), db=self._keys_db) is not None for k in encoded_keys]
+
+    def _del_many(self, encoded_keys):
+        def delete_all(txn):
+            for encoded_key in encoded_keys:
+                self._delete(txn, encoded_key)
+        self._write(delete_all)
 
     def __len__(self):
-        with self.get_transaction(write=False) as txn:
-            return txn.stat()['entries'] // 2
+        with self.get_transaction() as txn:
+            return txn.stat(self._keys_db)['entries']
 
     def _has(self, encoded_key):
-        with self.get_transaction(write=False) as txn:
-            return txn.get(self._encode_key_key(encoded_key)) is not None
-    
+        with self.get_transaction() as txn:
+            return txn.get(self._hash(encoded_key), db=self._keys_db) is not None
+
     def _keys(self):
-        with self.get_transaction(write=False) as txn:
-            cursor = txn.cursor()
-            for key, value in cursor:
-                if key.endswith(b'.key'):
-                    yield value
+        with self.get_transaction() as txn:
+            yield from txn.cursor(db=self._keys_db).iternext(keys=False, values=True)
 
     def _values(self):
-        with self.get_transaction(write=False) as txn:
-            cursor = txn.cursor()
-            for key, value in cursor:
-                if key.endswith(b'.value'):
-                    yield value
+        with self.get_transaction() as txn:
+            yield from txn.cursor(db=self._values_db).iternext(keys=False, values=True)
 
     def _items(self):
-        with self.get_transaction(write=False) as txn:
-            cursor = txn.cursor()
-            for key, value in cursor:
-                if key.endswith(b'.key'):
-                    yield value, txn.get(key[:-4]+b'.value')
-
-    def _encode_key_key(self, encoded_key):
-        return encode_hash(encoded_key).encode() + b'.key'
-    
-    def _encode_key_value(self, encoded_key):
-        return encode_hash(encoded_key).encode() + b'.value'
+        # both sub-databases hold the same hashes in the same order
+        with self.get_transaction() as txn:
+            yield from zip(
+                txn.cursor(db=self._keys_db).iternext(keys=False, values=True),
+                txn.cursor(db=self._values_db).iternext(keys=False, values=True),
+            )
 
     @staticmethod
     def _close_connection(connection):
@@ -96,7 +183,10 @@ class LMDBHashStash(BaseHashStash):
 
     def close(self):
         if self._env is not None:
-            self._env.close()
+            # closes it for every instance on the path; they reopen it when next used
+            if _lmdb_envs.get(self.path, (None, None))[1] is self._env:
+                del _lmdb_envs[self.path]
+                self._env.close()
             self._env = None
         super().close()
 
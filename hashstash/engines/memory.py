@@ -1,6 +1,5 @@
 from . import *
 from .base import get_manager, BaseHashStash
-from multiprocessing import Manager
 
 # # Use the existing get_manager function
 # manager = Manager()
@@ -25,6 +24,7 @@ class MemoryHashStash(BaseHashStash):
         yield cache[self.path]
 
     def clear(self):
+        self._clear_children()
         cache = get_shared_memory_cache()
         cache[self.path] = {}
         return self
@@ -60,10 +60,10 @@ class MongoHashStash(BaseHashStash):
                 upsert=True
             )
 
-    def _get(self, encoded_key):
+    def _get(self, encoded_key, default=None):
         with self.db as db:
             result = db.find_one({"_id": encoded_key})
-        return result["value"] if result else None
+        return result["value"] if result else default
 
     def _has(self, encoded_key):
         with self.db as db:
@@ -73,7 +73,32 @@ class MongoHashStash(BaseHashStash):
         with self.db as db:
             db.delete_one({"_id": encoded_key})
 
+    def _get_many(self, encoded_keys):
+        with self.db as db:
+            found = {doc["_id"]: doc["value"] for doc in db.find({"_id": {"$in": encoded_keys}})}
+        return [found.get(k) for k in encoded_keys]
+
+    def _set_many(self, encoded_items):
+        if not encoded_items:
+            return
+        from pymongo import UpdateOne
+        with self.db as db:
+            db.bulk_write(
+                [UpdateOne({"_id": k}, {"$set": {"value": v}}, upsert=True) for k, v in encoded_items],
+                ordered=True,
+            )
+
+    def _has_many(self, encoded_keys):
+        with self.db as db:
+            found = {doc["_id"] for doc in db.find({"_id": {"$in": encoded_keys}}, {"_id": 1})}
+        return [k in found for k in encoded_keys]
+
+    def _del_many(self, encoded_keys):
+        with self.db as db:
+            db.delete_many({"_id": {"$in": encoded_keys}})
+
     def clear(self):
+        self._clear_children()
         with self.db as db:
             db.drop()
         return self
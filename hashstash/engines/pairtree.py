@@ -1,20 +1,281 @@
 from . import *
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import mmap
+
+# One writer per (process, path), so every stash instance on a path waits for its queue
+_pairtree_writers = {}
+# Reads retry with a fresh manifest when a concurrent write removed the file they found
+_READ_ATTEMPTS = 3
+
+
+class PairtreeManifest:
+    """
+    Append-only index of a pairtree stash, one JSON line per change:
+
+        {"op": "set"|"add"|"del", "hash": ..., "key": <b64>, "file": ..., "size": ...}
+
+    "set" replaces a key's versions with one file, "add" appends a version, "del"
+    drops the key. Lines are replayed into `entries` (hash -> [encoded key, [(file,
+    size), ...]]); appends by other processes are picked up on the next refresh().
+    A missing manifest next to existing data is rebuilt from the directory tree.
+    """
+
+    def __init__(self, stash):
+        self.stash = stash
+        self.path = os.path.join(stash.path, stash.manifest_filename)
+        self.lock = threading.RLock()
+        self._file = None
+        self._file_pid = None
+        self._reset()
+
+    def _reset(self, inode=None):
+        self.entries = {}
+        self.offset = 0
+        self.inode = inode
+
+    def refresh(self, rebuild=True):
+        with self.lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                if self.entries or self.offset:
+                    self._reset()
+                if rebuild and self.stash._has_tree():
+                    self.rebuild()
+                return self
+            if st.st_ino != self.inode or st.st_size < self.offset:
+                # replaced by a rebuild, or cleared
+                self._reset(st.st_ino)
+            if st.st_size > self.offset:
+                with open(self.path, "rb") as f:
+                    f.seek(self.offset)
+                    data = f.read(st.st_size - self.offset)
+                # leave a half-written last line for the next refresh
+                data = data[: data.rfind(b"\n") + 1]
+                self.offset += len(data)
+                for line in data.splitlines():
+                    self._apply(line)
+            return self
+
+    def _apply(self, line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            log.warning(f"skipping unreadable line in {self.path}")
+            return
+        op, hashed_key = record["op"], record["hash"]
+        if op == "del":
+            self.entries.pop(hashed_key, None)
+            return
+        entry = self.entries.get(hashed_key)
+        if entry is None:
+            key = record.get("key")
+            entry = self.entries[hashed_key] = [
+                base64.b64decode(key) if key is not None else None,
+                [],
+            ]
+        if op == "set":
+            entry[1] = []
+        entry[1].append((record["file"], record["size"]))
+
+    def _record(self, op, hashed_key, encoded_key=None, filename=None, size=None):
+        record = {"op": op, "hash": hashed_key}
+        if op != "del":
+            if hashed_key not in self.entries:
+                if isinstance(encoded_key, str):
+                    encoded_key = encoded_key.encode()
+                record["key"] = base64.b64encode(encoded_key).decode()
+            record["file"] = filename
+            record["size"] = size
+        return json.dumps(record)
+
+    def write(self, *records):
+        with self.lock:
+            # the stash refreshed (and if need be rebuilt) before writing any files
+            self.refresh(rebuild=False)
+            lines = [self._record(*record) for record in records]
+            data = "".join(line + "\n" for line in lines).encode()
+            f = self._get_file()
+            f.write(data)
+            if self.stash.durable:
+                os.fsync(f.fileno())
+            end = f.tell()
+            if self.inode is None or end != self.offset + len(data):
+                # new file, or another process wrote meanwhile: replay in file order
+                self.refresh(rebuild=False)
+                return
+            for line in lines:
+                self._apply(line)
+            self.offset = end
+
+    def _get_file(self):
+        # kept open for appends; reopened once the manifest is replaced or removed, or after fork
+        f = self._file
+        if (
+            f is None
+            or self._file_pid != os.getpid()
+            or self.inode is None
+            or os.fstat(f.fileno()).st_ino != self.inode
+        ):
+            if f is not None and self._file_pid == os.getpid():
+                f.close()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            f = self._file = open(self.path, "ab", buffering=0)
+            self._file_pid = os.getpid()
+        return f
+
+    def close(self):
+        with self.lock:
+            if self._file is not None and self._file_pid == os.getpid():
+                self._file.close()
+            self._file = None
+
+    def rebuild(self):
+        """Rewrite (and compact) the manifest from the files on disk."""
+        with self.lock:
+            self._reset()
+            lines = []
+            for hashed_key, encoded_key, files in self.stash._walk_tree():
+                for i, (filename, size) in enumerate(files):
+                    lines.append(self._record("add" if i else "set", hashed_key, encoded_key, filename, size))
+                    self._apply(lines[-1])
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write("".join(line + "\n" for line in lines).encode())
+            os.replace(tmp_path, self.path)
+            st = os.stat(self.path)
+            self.inode, self.offset = st.st_ino, st.st_size
+            return self
+
+
+class PairtreeWriter:
+    """Background thread that applies queued pairtree writes in batches."""
+
+    def __init__(self, stash):
+        self.stash = stash
+        self.pid = os.getpid()
+        self.queue = queue.Queue(maxsize=stash.write_batch_size * 10)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name=f"hashstash-writer-{stash.path}", daemon=True)
+        self.thread.start()
+
+    def put(self, op, encoded_key, encoded_value):
+        self.queue.put((op, encoded_key, encoded_value))
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.stash.write_batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.stash._write_batch(batch)
+            except Exception as e:
+                log.error(f"background write to {self.stash.path} failed: {e}")
+                self.error = e
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self):
+        self.queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+@atexit.register
+def flush_pairtree_writers():
+    for writer in list(_pairtree_writers.values()):
+        if writer.pid == os.getpid():
+            writer.queue.join()
 
 
 class PairtreeHashStash(BaseHashStash):
+    """
+    Stash on a directory tree: each key gets a directory named by its hash
+    (aa/bb/cc/rest/), holding the encoded key (.key) and one file per version.
+    Files are written to a temporary name and renamed into place, so readers
+    never see partial values.
+
+    With write_behind=True, sets are queued and written by a background thread
+    in batches of up to write_batch_size; reads in this process, flush(),
+    close() and exit wait for them. With durable=True, files and manifest
+    appends are fsynced before they count as written.
+    """
     engine = "pairtree"
     filename_is_dir = True
     key_filename = ".key"
     valtype_filename = ".valtype"
+    manifest_filename = ".manifest"
     metadata_cols = ["_version", "_timestamp"]
     needs_lock = False
+    max_io_workers = 8
+    write_behind = False
+    write_batch_size = 1000
+    durable = False
+    mmap_min_size = 1024**2
+
+    def __init__(self, *args, write_behind=None, write_batch_size=None, durable=None, **kwargs):
+        if write_behind is not None: self.write_behind = write_behind
+        if write_batch_size is not None: self.write_batch_size = write_batch_size
+        if durable is not None: self.durable = durable
+        self._stamp_lock = threading.Lock()
+        self._last_stamp = 0
+        super().__init__(*args, **kwargs)
+
+    def to_dict(self):
+        return {**super().to_dict(), "write_behind": self.write_behind, "durable": self.durable}
 
     def connect(self):
         pass
 
+    @cached_property
+    def manifest(self):
+        return PairtreeManifest(self)
+
+    def rebuild_manifest(self):
+        """Re-index the stash from its directory tree, e.g. after a crash or manual edits."""
+        self.manifest.rebuild()
+        return self
+
+    def _write_manifest(self, op, encoded_key, filepath=None, size=None):
+        filename = os.path.basename(filepath) if filepath else None
+        self.manifest.write((op, self.hash(encoded_key), encoded_key, filename, size))
+
+    def _entries(self):
+        self.flush()  # read our own queued writes
+        return self.manifest.refresh().entries
+
+    def _get_entry(self, encoded_key):
+        return self._entries().get(self.hash(encoded_key))
+
+    def _has_tree(self):
+        try:
+            return any(f[0] != "." for f in os.listdir(self.path))
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+
+    def _walk_tree(self):
+        for root, _, files in os.walk(self.path):
+            if self.key_filename not in files:
+                continue
+            encoded_key = self._get_from_filepath(os.path.join(root, self.key_filename))
+            value_files = sorted(f for f in files if f[0] != ".")
+            if value_files:
+                yield self.hash(encoded_key), encoded_key, [
+                    (f, os.path.getsize(os.path.join(root, f))) for f in value_files
+                ]
+
     @log.debug
     def _get_path(self, encoded_key):
-        hashed_key = self.hash(encoded_key)
+        return self._get_path_from_hash(self.hash(encoded_key))
+
+    def _get_path_from_hash(self, hashed_key):
         dir1, dir2, dir3, fname = (
             hashed_key[:2],
             hashed_key[2:4],
@@ -41,17 +302,11 @@ class PairtreeHashStash(BaseHashStash):
 
     @log.debug
     def _get_path_values(self, encoded_key, all_results=None, with_metadata=None):
-        path = self._get_path(encoded_key)
-        if not os.path.exists(path): return []
-        try:
-            paths = [
-                os.path.join(path, f)
-                for f in os.listdir(path)
-                if f[0] != "." and f != self.key_filename
-            ]
-        except NotADirectoryError:
+        entry = self._get_entry(encoded_key)
+        if entry is None:
             return []
-        paths.sort()
+        path = self._get_path(encoded_key)
+        paths = [os.path.join(path, f) for f, _ in entry[1]]
         if not self._all_results(all_results):
             paths = paths[-1:]
         if with_metadata:
@@ -72,9 +327,10 @@ class PairtreeHashStash(BaseHashStash):
 
     @log.debug
     def _get_path_new_value(self, encoded_key):
-        return os.path.join(
-            self._get_path(encoded_key), str(int(time.time() * 1000000))
-        )
+        # microsecond stamps, kept unique so quick successive versions don't collide
+        with self._stamp_lock:
+            stamp = self._last_stamp = max(int(time.time() * 1000000), self._last_stamp + 1)
+        return os.path.join(self._get_path(encoded_key), str(stamp))
 
     @log.debug
     def get_path_new_value(self, unencoded_key):
@@ -89,78 +345,255 @@ class PairtreeHashStash(BaseHashStash):
         all_results=True,
         **kwargs,
     ) -> Any:
-        paths_ld = self.get_path_values(
-            unencoded_key,
-            all_results=self._all_results(all_results),
-            with_metadata=True,
-        )
+        encoded_key = self.encode_key(unencoded_key)
+        latest_only = not with_metadata and not self._all_results(all_results)
+        if latest_only:
+            values = self._lru_get(encoded_key)
+            if values is not None:
+                return [self._replay_if_stream(value) for value in values]
         out = []
-        for path_d in paths_ld:
-            path = path_d.pop("_path")
-            encoded_value = self._get_from_filepath(path)
+        for path_d, encoded_value in self._read_path_values(encoded_key, all_results):
             decoded_value = self.decode_value(encoded_value)
             if not with_metadata:
                 out.append(decoded_value)
             else:
-                path_d['_value'] = decoded_value
+                path_d['_value'] = self._replay_if_stream(decoded_value)
                 out.append(path_d)
+        if latest_only and out:
+            self._lru_set(encoded_key, list(out), encoded_value)
+        if not with_metadata:
+            out = [self._replay_if_stream(value) for value in out]
         return out if out else default
 
     def new_unencoded_value(self, unencoded_value: Any, *args, **kwargs):
         return unencoded_value # file versioning takes care of this
 
+    @cached_property
+    def _mmap_reads(self):
+        # values reach the deserializer as stored, and it keeps views into them
+        return (
+            self.serializer in ZERO_COPY_SERIALIZERS
+            and not self.b64
+            and self.compress == RAW_NO_COMPRESS
+        )
+
+    def _read_path_values(self, encoded_key, all_results=None):
+        # (metadata, encoded_value) per version. A file can go between reading the
+        # manifest and opening it, when another writer replaces or deletes the key;
+        # the refreshed manifest then lists what replaced it
+        for _ in range(_READ_ATTEMPTS):
+            paths_ld = self._get_path_values(
+                encoded_key,
+                all_results=self._all_results(all_results),
+                with_metadata=True,
+            )
+            encoded_values = [self._get_from_filepath(path_d.pop("_path")) for path_d in paths_ld]
+            if None not in encoded_values:
+                break
+        return [(d, v) for d, v in zip(paths_ld, encoded_values) if v is not None]
+
     def _get_from_filepath(self, filepath):
-        if not os.path.exists(filepath):
+        try:
+            f = open(filepath, "rb")
+        except FileNotFoundError:
             return None
-
-        with open(filepath, "rb") as f:
+        with f:
+            if os.fstat(f.fileno()).st_size >= self.mmap_min_size and (
+                # chunked values are decoded from the map a chunk at a time
+                self._mmap_reads or (not self.b64 and f.read(len(CHUNKED_MAGIC)) == CHUNKED_MAGIC)
+            ):
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            f.seek(0)
             return f.read()
 
+    def _get_path_tmp(self, filepath):
+        # dot-prefixed, so never taken for a version file
+        dirname, fname = os.path.split(filepath)
+        return os.path.join(dirname, f".{fname}.{os.getpid()}.{threading.get_ident()}.tmp")
+
     def _set_to_filepath(self, filepath, encoded_data):
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, "wb") as f:
-            f.write(encoded_data)
+        # encoded_data may also be an iterable of pieces; returns the bytes written
+        tmp_path = self._get_path_tmp(filepath)
+        try:
+            f = open(tmp_path, "wb")
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            f = open(tmp_path, "wb")
+        with f:
+            if isinstance(encoded_data, (str, bytes, bytearray, memoryview, mmap.mmap)):
+                size = f.write(encoded_data)
+            else:
+                size = sum(f.write(piece) for piece in encoded_data)
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+        return size
 
     @log.debug
     def _set(self, encoded_key: str, encoded_value: Any) -> None:
-        self._set_key(encoded_key)
-        filepath_value = self._get_path_new_value(encoded_key)
-        self._set_to_filepath(filepath_value, encoded_value)
-        if not self.append_mode:
-            self._prune_dir(filepath_value)
-
+        if self.write_behind:
+            return self._get_writer().put("set", encoded_key, encoded_value)
+        self._commit_versions(self._write_versions(encoded_key, [("set", encoded_value)]))
 
-    def _prune_dir(self, filepath_value):
-        dir_path = os.path.dirname(filepath_value)
-        files = os.listdir(dir_path)
-        for file in files:
-            if file and file[0]!='.':
-                file_path = os.path.join(dir_path, file)
-                if file_path != filepath_value and os.path.isfile(file_path):
-                    os.remove(file_path)
+    @log.debug
+    def _append(self, encoded_key: str, encoded_value: Any) -> None:
+        if self.write_behind:
+            return self._get_writer().put("add", encoded_key, encoded_value)
+        self._commit_versions(self._write_versions(encoded_key, [("add", encoded_value)]))
+
+    def _set_pieces(self, encoded_key, pieces, append=False):
+        if self.write_behind or isinstance(pieces, (str, bytes)):
+            return super()._set_pieces(encoded_key, pieces, append=append)
+        # large values go into their file as they are encoded
+        self._commit_versions(self._write_versions(encoded_key, [("add" if append else "set", pieces)]))
+
+    def _write_versions(self, encoded_key, ops):
+        """Write (op, encoded_value) versions of one key; returns their manifest records and the files they replace."""
+        hashed_key = self.hash(encoded_key)
+        entry = self.manifest.refresh().entries.get(hashed_key)
+        sets = [i for i, (op, _) in enumerate(ops) if op == "set"]
+        if sets:
+            ops = ops[sets[-1]:]  # a set replaces everything before it
+        if entry is None:
+            self._set_to_filepath(self._get_path_key(encoded_key), encoded_key)
+        records = []
+        for op, encoded_value in ops:
+            filepath_value = self._get_path_new_value(encoded_key)
+            size = self._set_to_filepath(filepath_value, encoded_value)
+            records.append((op, hashed_key, encoded_key, os.path.basename(filepath_value), size))
+        replaced = []
+        if sets and entry is not None:
+            path = self._get_path(encoded_key)
+            replaced = [os.path.join(path, fname) for fname, _ in entry[1]]
+        return records, replaced
+
+    def _commit_versions(self, *written):
+        # the manifest points at the new files before the ones they replace go, so
+        # readers of the current manifest never meet a missing file
+        self.manifest.write(*(record for records, _ in written for record in records))
+        for _, replaced in written:
+            for filepath in replaced:
+                try:
+                    os.remove(filepath)
+                except FileNotFoundError:
+                    pass
+
+    def _write_batch(self, batch):
+        ops = {}
+        for op, encoded_key, encoded_value in batch:
+            ops.setdefault(encoded_key, []).append((op, encoded_value))
+        self._commit_versions(*self._map_io(lambda encoded_key: self._write_versions(encoded_key, ops[encoded_key]), ops))
+
+    def _get_writer(self):
+        writer = _pairtree_writers.get(self.path)
+        if writer is None or writer.pid != os.getpid():
+            # never reuse a writer inherited across fork
+            writer = _pairtree_writers[self.path] = PairtreeWriter(self)
+        return writer
+
+    def flush(self):
+        """Wait until queued background writes are on disk."""
+        writer = _pairtree_writers.get(self.path)
+        if writer is not None and writer.pid == os.getpid():
+            writer.flush()
+        return self
+
+    def close(self):
+        self.flush()
+        if "manifest" in self.__dict__:
+            self.manifest.close()
+        super().close()
 
+    @log.debug
+    def _get(self, encoded_key: str, default: Any = None) -> Any:
+        for _ in range(_READ_ATTEMPTS):
+            filepath_value = self._get_path_value(encoded_key)
+            if not filepath_value:
+                break
+            encoded_value = self._get_from_filepath(filepath_value)
+            if encoded_value is not None:
+                return encoded_value
+        return default
+
+    def _get_latest_stored(self, encoded_key):
+        encoded_value = self._get(encoded_key)
+        return self.decode_value(encoded_value) if encoded_value is not None else None
 
-        
+    @log.debug
+    def _del(self, encoded_key: str) -> None:
+        if self._get_entry(encoded_key) is None:
+            raise KeyError(encoded_key)
+        shutil.rmtree(self._get_path(encoded_key), ignore_errors=True)
+        self._write_manifest("del", encoded_key)
 
     @log.debug
     def _set_key(self, encoded_key):
-        filepath_key = self._get_path_key(encoded_key)
-        if not os.path.exists(filepath_key):
-            self._set_to_filepath(filepath_key, encoded_key)
+        if self.hash(encoded_key) not in self._entries():
+            self._set_to_filepath(self._get_path_key(encoded_key), encoded_key)
+
+    def _map_io(self, func, iterable):
+        iterable = list(iterable)
+        if len(iterable) < 2 or self.max_io_workers < 2:
+            return [func(x) for x in iterable]
+        with ThreadPoolExecutor(max_workers=self.max_io_workers) as pool:
+            return list(pool.map(func, iterable))
+
+    @log.debug
+    def get_many(self, unencoded_keys, default=None, **kwargs):
+        return self._map_io(
+            lambda unencoded_key: self.get(unencoded_key, default=default, **kwargs),
+            unencoded_keys,
+        )
+
+    @log.debug
+    def set_many(self, items, append=None):
+        batch, unencoded_keys = {}, {}
+        for unencoded_key, unencoded_value in iter_pairs(items):
+            encoded_key = self.encode_key(unencoded_key)
+            batch.setdefault(encoded_key, []).append(unencoded_value)
+            unencoded_keys[encoded_key] = unencoded_key
+        self._lru_pop(batch)
+        self._set_key_payloads(unencoded_keys.items())
+
+        def set_versions(encoded_key):
+            unencoded_values = batch[encoded_key]
+            if not (append or self.append_mode):
+                return self._set(encoded_key, self.encode_value(unencoded_values[-1]))
+            for unencoded_value in unencoded_values:
+                self._append(encoded_key, self.encode_value(unencoded_value))
+
+        self._map_io(set_versions, batch)
+
+    @log.debug
+    def has_many(self, unencoded_keys):
+        return self._map_io(self.has, unencoded_keys)
+
+    @log.debug
+    def delete_many(self, unencoded_keys):
+        encoded_keys = [self.encode_key(k) for k in unencoded_keys]
+        self._lru_pop(encoded_keys)
+        entries = self._entries()
+        self._map_io(
+            lambda encoded_key: shutil.rmtree(self._get_path(encoded_key), ignore_errors=True),
+            encoded_keys,
+        )
+        hashed_keys = {self.hash(k) for k in encoded_keys}
+        self.manifest.write(*(("del", h) for h in hashed_keys if h in entries))
+        self._drop_key_payloads(encoded_keys)
 
     @log.debug
     def _has(self, encoded_key: bytes) -> bool:
-        return bool(self._get_path_values(encoded_key))
+        return self._get_entry(encoded_key) is not None
 
     @log.debug
     def __len__(self):
-        return sum(1 for _ in self.paths())
+        return len(self._entries())
 
     @log.debug
     def paths(self):
-        for root, _, files in os.walk(self.path):
-            if self.key_filename in files:
-                yield root
+        for hashed_key in list(self._entries()):
+            yield self._get_path_from_hash(hashed_key)
 
     def paths_keys(self, all_results=False, with_metadata=None):
         for keypath, valpaths in self.paths_items(all_results=all_results, with_metadata=False):
@@ -190,16 +623,10 @@ class PairtreeHashStash(BaseHashStash):
         return self.decode_value(self._get_from_filepath(filepath))
 
     def paths_items(self, all_results=None, with_metadata=None):
-        for root, _, files in os.walk(self.path):
-            if not self.key_filename in set(files):
-                continue
+        for hashed_key, (_, files) in list(self._entries().items()):
+            root = self._get_path_from_hash(hashed_key)
             key_path = os.path.join(root, self.key_filename)
-            value_paths = [
-                os.path.join(root, file)
-                for file in files
-                if file != self.key_filename
-                and file[0] != "."
-            ]
+            value_paths = [os.path.join(root, f) for f, _ in files]
             if not value_paths:
                 continue
             if with_metadata:
@@ -214,14 +641,36 @@ class PairtreeHashStash(BaseHashStash):
 
     @log.debug
     def _keys(self):
-        for path in self.paths_keys():
-            yield self._get_from_filepath(path)
+        for hashed_key, (encoded_key, _) in list(self._entries().items()):
+            if encoded_key is None:
+                encoded_key = self._get_from_filepath(
+                    os.path.join(self._get_path_from_hash(hashed_key), self.key_filename)
+                )
+            yield encoded_key
 
     @log.debug
     def _values(self, all_results=None):
-        for paths in self.paths_values(all_results=all_results):
-            for path in paths:
-                yield self._get_from_filepath(path)
+        for _, encoded_value in self._items(all_results=all_results):
+            yield encoded_value
+
+    def _blob_records(self):
+        # versions are files beside the latest, not a sibling stash
+        return self._values(all_results=True)
+
+    def _migrate_versions(self, source, batch_size):
+        # rewrite the keys that have history with all their version files
+        self.flush()
+        for hashed_key, (encoded_key, files) in list(source._entries().items()):
+            if len(files) < 2:
+                continue
+            root = source._get_path_from_hash(hashed_key)
+            if encoded_key is None:
+                encoded_key = source._get_from_filepath(os.path.join(root, source.key_filename))
+            ops = [
+                ("add" if i else "set", self._migrated_value(source, source._get_from_filepath(os.path.join(root, f))))
+                for i, (f, _) in enumerate(files)
+            ]
+            self._commit_versions(self._write_versions(self._migrated_key(source, encoded_key), ops))
 
     @log.debug
     # def values(self, all_results=None, **kwargs):
@@ -231,11 +680,18 @@ class PairtreeHashStash(BaseHashStash):
 
     @log.debug
     def _items(self, all_results=None):
-        for path_key, path_values in self.paths_items(all_results=all_results):
-            encoded_key = self._get_from_filepath(path_key)
-            for path_value in path_values:
-                encoded_value = self._get_from_filepath(path_value)
-                yield (encoded_key, encoded_value)
+        for hashed_key, (encoded_key, files) in list(self._entries().items()):
+            root = self._get_path_from_hash(hashed_key)
+            if encoded_key is None:
+                encoded_key = self._get_from_filepath(os.path.join(root, self.key_filename))
+            if not self._all_results(all_results):
+                files = files[-1:]
+            for f, _ in files:
+                encoded_value = self._get_from_filepath(os.path.join(root, f))
+                if encoded_value is None and not self._all_results(all_results):
+                    encoded_value = self._get(encoded_key)  # replaced since the listing
+                if encoded_value is not None:
+                    yield (encoded_key, encoded_value)
 
     @log.debug
     # def items(self, all_results=None, with_metadata=False, **kwargs):
@@ -262,7 +718,10 @@ class PairtreeHashStash(BaseHashStash):
     #                 yield {**key_d, **meta_d, **value_d}
 
     def __delitem__(self, unencoded_key: str) -> None:
-        path = self.get_path(unencoded_key)
-        if not os.path.exists(path):
+        encoded_key = self.encode_key(unencoded_key)
+        if self._get_entry(encoded_key) is None:
             raise KeyError(unencoded_key)
-        shutil.rmtree(path, ignore_errors=True)
+        self._lru_pop([encoded_key])
+        shutil.rmtree(self._get_path(encoded_key), ignore_errors=True)
+        self._write_manifest("del", encoded_key)
+        self._drop_key_payloads([encoded_key])
@@ -39,7 +39,31 @@ class RedisHashStash(BaseHashStash):
     def _close_connection(connection):
         pass # how does one close a redis connection?
 
+    def _get_many(self, encoded_keys):
+        with self.db as db:
+            results = db.redis.mget([db._format_key(k) for k in encoded_keys]) if encoded_keys else []
+            return [db._transform(r) if r is not None else None for r in results]
+
+    def _set_many(self, encoded_items):
+        with self.db as db:
+            # RedisDict.update queues every SET on one pipeline
+            db.update(dict(encoded_items))
+
+    def _has_many(self, encoded_keys):
+        with self.db as db:
+            pipe = db.redis.pipeline()
+            for k in encoded_keys:
+                pipe.exists(db._format_key(k))
+            return [bool(x) for x in pipe.execute()]
+
+    def _del_many(self, encoded_keys):
+        if not encoded_keys:
+            return
+        with self.db as db:
+            db.redis.delete(*[db._format_key(k) for k in encoded_keys])
+
     def clear(self):
+        self._clear_children()
         super().close()
         import redis
         log.debug(f"Dropping Redis database at {self.host}:{self.port}")
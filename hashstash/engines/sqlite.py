@@ -2,24 +2,277 @@ from . import *
 import sqlite3
 import os
 
+# One connection per (process, path), shared by every stash instance on that path,
+# so writes still waiting for a batched commit are visible to all of them.
+_sqlite_connections = {}
+
+
+class SqliteConnection:
+    """A sqlite3 connection in WAL mode that commits writes in batches."""
+
+    def __init__(self, path, pragmas=None, flush_interval=0, max_pending=10_000, timeout=60):
+        self.path = path
+        self.pid = os.getpid()
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.lock = threading.RLock()
+        self.pending = 0
+        self.pending_since = None
+        self.flush_timer = None
+        # isolation_level=None: transactions are opened and committed explicitly below
+        self.conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        for name, value in (pragmas or {}).items():
+            self.conn.execute(f"PRAGMA {name}={value}")
+        tables = self.tables()
+        self.conn.executescript(SqliteHashStash.schema)
+        if "stash" not in tables and "unnamed" in tables:
+            self.import_sqlitedict()
+
+    def tables(self):
+        return {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    def import_sqlitedict(self, tablename="unnamed"):
+        """
+        Move rows from a stash written by the former sqlitedict-based engine. They
+        keep the encoding of the legacy folder they're in, which migrate_legacy
+        decodes when they're copied into the stash's own folder.
+        """
+        with self.lock:
+            rows = self.conn.execute(f'SELECT key, value FROM "{tablename}"').fetchall()
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                SqliteHashStash.sql_set,
+                [
+                    (SqliteHashStash._hash(key), key, pickle.loads(bytes(value)))
+                    for key, value in rows
+                ],
+            )
+            self.conn.execute(f'DROP TABLE "{tablename}"')
+            self.conn.execute("COMMIT")
+
+    def read(self, query, params=()):
+        with self.lock:
+            self.flush_if_due()
+            return self.conn.execute(query, params).fetchall()
+
+    def iterate(self, query, params=(), batch_size=1_000):
+        cursor = self.conn.cursor()
+        with self.lock:
+            cursor.execute(query, params)
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            yield from rows
+            with self.lock:
+                rows = cursor.fetchmany(batch_size)
+
+    def write(self, query, params=(), many=False):
+        with self.lock:
+            if not self.conn.in_transaction:
+                if not self.flush_interval and not many:
+                    self.conn.execute(query, params)  # commits on its own
+                    return
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.pending_since = time.time()
+                if self.flush_interval:
+                    # commit on time even if this process writes nothing more, so
+                    # it never holds the write lock while idle
+                    self.flush_timer = threading.Timer(self.flush_interval, self.flush)
+                    self.flush_timer.daemon = True
+                    self.flush_timer.start()
+            if many:
+                cursor = self.conn.executemany(query, params)
+            else:
+                cursor = self.conn.execute(query, params)
+            self.pending += max(cursor.rowcount, 1)
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if self.pending and (
+            self.pending >= self.max_pending
+            or time.time() - self.pending_since >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if self.conn.in_transaction:
+                self.conn.execute("COMMIT")
+            self.pending = 0
+            self.pending_since = None
+
+    def close(self):
+        with self.lock:
+            try:
+                self.flush()
+            finally:
+                self.conn.close()
+
+
+@atexit.register
+def flush_sqlite_connections():
+    for connection in list(_sqlite_connections.values()):
+        if connection.pid == os.getpid():
+            try:
+                connection.flush()
+            except sqlite3.Error as e:
+                log.debug(f"error flushing {connection.path}: {e}")
+
+
 class SqliteHashStash(BaseHashStash):
+    """
+    Stash on a native sqlite3 database.
+
+    Rows are (hash, key, value) BLOBs keyed by the md5 of the encoded key. The
+    database runs in WAL mode, so any number of processes can read while one
+    writes, and writers wait up to `timeout` seconds for each other. Each process
+    opens its own connection.
+
+    With flush_interval=0 (default) every write is committed immediately. With
+    flush_interval > 0, writes are batched into one transaction, committed (from a
+    timer thread if need be) once it is that many seconds old or holds
+    `max_pending` rows, and on flush(), close() or exit. Other processes only see
+    committed writes, and wait for the transaction to write themselves.
+    """
+
     engine = "sqlite"
-    _db = None
-    needs_reconnect = True
+    needs_lock = False
+    max_sql_vars = 500  # stay well under sqlite's SQLITE_MAX_VARIABLE_NUMBER
+    flush_interval = 0
+    max_pending = 10_000
+    timeout = 60
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "cache_size": -64_000,  # KiB
+        "mmap_size": 256 * 1024**2,
+    }
+    # stash_meta keeps the row count, so len() doesn't scan the table
+    schema = """
+        CREATE TABLE IF NOT EXISTS stash (
+            hash BLOB PRIMARY KEY,
+            key BLOB NOT NULL,
+            value BLOB NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS stash_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        INSERT OR IGNORE INTO stash_meta VALUES ('count', (SELECT COUNT(*) FROM stash));
+        CREATE TRIGGER IF NOT EXISTS stash_count_insert AFTER INSERT ON stash
+            BEGIN UPDATE stash_meta SET value = value + 1 WHERE name = 'count'; END;
+        CREATE TRIGGER IF NOT EXISTS stash_count_delete AFTER DELETE ON stash
+            BEGIN UPDATE stash_meta SET value = value - 1 WHERE name = 'count'; END;
+    """
+    sql_get = "SELECT value FROM stash WHERE hash = ?"
+    sql_has = "SELECT 1 FROM stash WHERE hash = ?"
+    sql_set = (
+        "INSERT INTO stash (hash, key, value) VALUES (?, ?, ?) "
+        "ON CONFLICT (hash) DO UPDATE SET value = excluded.value"
+    )
+    sql_del = "DELETE FROM stash WHERE hash = ?"
+    sql_len = "SELECT value FROM stash_meta WHERE name = 'count'"
+
+    def __init__(self, *args, flush_interval=None, max_pending=None, timeout=None, pragmas=None, **kwargs):
+        if flush_interval is not None: self.flush_interval = flush_interval
+        if max_pending is not None: self.max_pending = max_pending
+        if timeout is not None: self.timeout = timeout
+        self.pragmas = {**self.pragmas, **(pragmas or {})}
+        super().__init__(*args, **kwargs)
 
     @log.debug
     @retry_patiently()
     def get_db(self):
-        log.debug(f'Path exists: {os.path.exists(self.path)}\nPath: {self.path}')
-        log.debug(f'Directory exists: {os.path.exists(self.path_dirname)}\nDirectory: {self.path_dirname}')
-        
-        # Ensure the directory exists
-        os.makedirs(self.path_dirname, exist_ok=True)
-        
-        from sqlitedict import SqliteDict
-        
-        if self._db is None or not os.path.exists(self.path):
-            log.debug("Creating new SqliteDict instance")
-            self._db = SqliteDict(self.path, flag='c', autocommit=True)
-        
-        return self._db
\ No newline at end of file
+        connection = _sqlite_connections.get(self.path)
+        if connection is None or connection.pid != os.getpid():
+            # never reuse a connection inherited across fork
+            os.makedirs(self.path_dirname, exist_ok=True)
+            connection = SqliteConnection(
+                self.path,
+                pragmas=self.pragmas,
+                flush_interval=self.flush_interval,
+                max_pending=self.max_pending,
+                timeout=self.timeout,
+            )
+            _sqlite_connections[self.path] = connection
+        return connection
+
+    @contextmanager
+    def get_connection(self):
+        yield self.get_db()
+
+    @staticmethod
+    def _hash(encoded_key):
+        return hashlib.md5(encoded_key).digest()
+
+    def _get(self, encoded_key, default=None):
+        rows = self.db_read(self.sql_get, (self._hash(encoded_key),))
+        return rows[0][0] if rows else default
+
+    def _set(self, encoded_key, encoded_value):
+        self.get_db().write(self.sql_set, (self._hash(encoded_key), encoded_key, encoded_value))
+
+    def _has(self, encoded_key):
+        return bool(self.db_read(self.sql_has, (self._hash(encoded_key),)))
+
+    def _del(self, encoded_key):
+        self.get_db().write(self.sql_del, (self._hash(encoded_key),))
+
+    def db_read(self, query, params=()):
+        return self.get_db().read(query, params)
+
+    def _get_many(self, encoded_keys):
+        found = {}
+        for i in range(0, len(encoded_keys), self.max_sql_vars):
+            hashes = [self._hash(k) for k in encoded_keys[i : i + self.max_sql_vars]]
+            query = "SELECT hash, value FROM stash WHERE hash IN (%s)" % ",".join("?" * len(hashes))
+            found.update(self.db_read(query, hashes))
+        return [found.get(self._hash(k)) for k in encoded_keys]
+
+    def _has_many(self, encoded_keys):
+        found = set()
+        for i in range(0, len(encoded_keys), self.max_sql_vars):
+            hashes = [self._hash(k) for k in encoded_keys[i : i + self.max_sql_vars]]
+            query = "SELECT hash FROM stash WHERE hash IN (%s)" % ",".join("?" * len(hashes))
+            found.update(row[0] for row in self.db_read(query, hashes))
+        return [self._hash(k) in found for k in encoded_keys]
+
+    def _set_many(self, encoded_items):
+        # one executemany inside one transaction
+        self.get_db().write(
+            self.sql_set,
+            [(self._hash(k), k, v) for k, v in encoded_items],
+            many=True,
+        )
+
+    def _del_many(self, encoded_keys):
+        self.get_db().write(self.sql_del, [(self._hash(k),) for k in encoded_keys], many=True)
+
+    def __len__(self):
+        rows = self.db_read(self.sql_len)
+        return rows[0][0] if rows else 0
+
+    def _keys(self):
+        for (key,) in self.get_db().iterate("SELECT key FROM stash"):
+            yield key
+
+    def _values(self):
+        for (value,) in self.get_db().iterate("SELECT value FROM stash"):
+            yield value
+
+    def _items(self):
+        yield from self.get_db().iterate("SELECT key, value FROM stash")
+
+    def flush(self):
+        """Commit any batched writes now."""
+        connection = _sqlite_connections.get(self.path)
+        if connection is not None and connection.pid == os.getpid():
+            connection.flush()
+        return self
+
+    def close(self):
+        connection = _sqlite_connections.pop(self.path, None)
+        if connection is not None and connection.pid == os.getpid():
+            connection.close()
@@ -3,11 +3,12 @@ from .constants import *
 
 ## standard library
 import multiprocessing as mp
-try:
-    mp.set_start_method('fork')
-except RuntimeError:
-    pass
-from multiprocessing import freeze_support, Manager
+
+@fcache
+def get_mp_context():
+    # prefer fork where available, without touching the global start method
+    return mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else None)
+
 import ast
 import atexit
 import uuid
@@ -23,7 +24,7 @@ from collections.abc import Mapping
 import typing
 import importlib
 from warnings import filterwarnings
-from collections import UserDict, defaultdict
+from collections import UserDict, defaultdict, namedtuple, OrderedDict
 import subprocess
 import atexit
 import threading
@@ -34,6 +35,7 @@ import base64
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from pprint import pprint
 import textwrap
+import itertools
 import shutil
 import os
 import pickle
@@ -1,4 +1,5 @@
 from .. import *
 
 from .profiler import *
-from .engine_profiler import *
\ No newline at end of file
+from .engine_profiler import *
+from .serializer_profiler import *
\ No newline at end of file
@@ -183,6 +183,30 @@ class HashStashProfiler:
             # odf = pd.DataFrame(o)
             # return odf
 
+    def profile_get_overhead(self, iterations: int = 1_000, size: int = 100):
+        """Mean seconds per `get` of a small value, untraced and with call tracing on."""
+        from ..utils.logs import tracing
+
+        key, value = "overhead", generate_data(size, data_type="list")
+        self.stash[key] = value
+
+        def time_gets():
+            start = time.perf_counter()
+            for _ in range(iterations):
+                self.stash.get(key)
+            return (time.perf_counter() - start) / iterations
+
+        untraced = time_gets()
+        with tracing(sink=lambda record: None):
+            traced = time_gets()
+        return {
+            "Engine": self.stash.engine,
+            "Iterations": iterations,
+            "Get Time (s)": untraced,
+            "Traced Get Time (s)": traced,
+            "Tracing Overhead (s)": traced - untraced,
+        }
+
     @classmethod
     def profile_stash(cls, stash, **opt):
         return HashStashProfiler(stash).profile(**opt)
@@ -742,6 +766,44 @@ class HashStashProfiler:
 
 
 
+def profile_compression_dictionary(
+    num_values: int = 5_000,
+    sample: int = 1_000,
+    compressers=None,
+    engine: ENGINE_TYPES = "memory",
+):
+    """
+    Compression ratio (serialized / encoded bytes) and encode/decode seconds over
+    `num_values` small JSON results, per compressor and for zstd with a dictionary
+    trained on `sample` of them.
+    """
+    if compressers is None:
+        compressers = [c for c in COMPRESSERS if c in get_working_compressers()]
+    rng = random.Random(0)
+    values = [generate_json_result(i, rng) for i in range(num_values)]
+    results = []
+    for compress in [*compressers, "zstd+dict"]:
+        with HashStash(engine=engine, compress=compress.split("+")[0], b64=False).tmp() as stash:
+            if compress == "zstd+dict":
+                stash.set_many(enumerate(values[:sample]))
+                stash.train_compression_dictionary(sample=sample)
+            serialized = [stash.serialize(value) for value in values]
+            encoded, encode_time = time_function(lambda: [stash.encode(data) for data in serialized])
+            _, decode_time = time_function(lambda: [stash.decode(data) for data in encoded])
+            raw_size, encoded_size = sum(map(len, serialized)), sum(map(len, encoded))
+            results.append(
+                {
+                    "Compress": compress,
+                    "Ratio": raw_size / encoded_size,
+                    "Encode Time (s)": encode_time,
+                    "Decode Time (s)": decode_time,
+                    "Serialized Size (B)": raw_size,
+                    "Encoded Size (B)": encoded_size,
+                }
+            )
+    return results
+
+
 def profile_stash_transaction(
     stash,
     size=DEFAULT_DATA_SIZE,
@@ -15,6 +15,17 @@ def generate_primitive():
     return random.choice(primitives)()
 
 
+def generate_json_result(i: int, rng: random.Random = random) -> Dict[str, Any]:
+    """A small JSON record (roughly 200-2,000 bytes serialized), like a cached API or pipeline result."""
+    return {
+        "id": i,
+        "status": rng.choice(["ok", "error", "pending"]),
+        "user": {"name": f"user_{i}", "email": f"user_{i}@example.com"},
+        "scores": [round(rng.random(), 3) for _ in range(rng.randint(5, 150))],
+        "tags": rng.sample(["alpha", "beta", "gamma", "delta", "epsilon", "zeta"], 3),
+    }
+
+
 def generate_complex_data(size: int) -> Dict[str, Any]:
     return {
         "nested_structure": generate_data(size=size, data_type='dict'),
@@ -0,0 +1,173 @@
+from . import *
+import dataclasses
+import datetime
+import decimal
+import enum
+import fractions
+
+SERIALIZER_CORPORA = ["nested_dict", "nested_list", "instances", "typed_records"]
+
+
+class ProfileRecord:
+    """Plain instance for the "instances" corpus (serialized via its __dict__)."""
+
+    def __init__(self, i):
+        self.id = i
+        self.name = f"record_{i}"
+        self.scores = [i * 0.5, i * 1.5]
+        self.tags = {"even": i % 2 == 0}
+
+
+class ProfileKind(enum.Enum):
+    BUY = "buy"
+    SELL = "sell"
+
+
+class ProfileSpan(NamedTuple):
+    start: int
+    end: int
+
+
+@dataclasses.dataclass
+class ProfileTypedRecord:
+    """Dataclass of standard-library types for the "typed_records" corpus."""
+
+    id: int
+    kind: ProfileKind
+    span: ProfileSpan
+    created: datetime.datetime
+    elapsed: datetime.timedelta
+    price: decimal.Decimal
+    ratio: fractions.Fraction
+    uid: uuid.UUID
+
+    @classmethod
+    def sample(cls, i):
+        return cls(
+            id=i,
+            kind=ProfileKind.BUY if i % 2 else ProfileKind.SELL,
+            span=ProfileSpan(i, i + 10),
+            created=datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=i),
+            elapsed=datetime.timedelta(seconds=i, microseconds=i),
+            price=decimal.Decimal(i) / 100,
+            ratio=fractions.Fraction(i, 7),
+            uid=uuid.UUID(int=i),
+        )
+
+
+def generate_corpus(kind: str = "nested_dict", size: int = 1_000, depth: int = 4):
+    if kind == "nested_dict":
+        def node(level):
+            if level <= 0:
+                return {"a": 1, "b": "text", "c": 2.5, "d": [1, 2, 3]}
+            return {f"k{i}": node(level - 1) for i in range(4)}
+        return [node(depth) for _ in range(max(1, size // 4 ** depth))]
+    elif kind == "nested_list":
+        def node(level):
+            if level <= 0:
+                return [1, "text", 2.5, None, True]
+            return [node(level - 1) for _ in range(4)]
+        return [node(depth) for _ in range(max(1, size // 4 ** depth))]
+    elif kind == "instances":
+        return [ProfileRecord(i) for i in range(size)]
+    elif kind == "typed_records":
+        return [ProfileTypedRecord.sample(i) for i in range(size)]
+    raise ValueError(f"Invalid corpus: {kind}. Choose one of: {', '.join(SERIALIZER_CORPORA)}")
+
+
+def profile_serializer_corpora(
+    serializers=("hashstash", "hashstash-binary"),
+    corpora=SERIALIZER_CORPORA,
+    size: int = 1_000,
+    iterations: int = 5,
+):
+    """Best-of-`iterations` serialize/deserialize seconds per serializer and corpus."""
+    results = []
+    for kind in corpora:
+        corpus = generate_corpus(kind, size)
+        for serializer in serializers:
+            write_times, read_times = [], []
+            for _ in range(iterations):
+                data, write_time = time_function(serialize, corpus, serializer)
+                _, read_time = time_function(deserialize, data, serializer)
+                write_times.append(write_time)
+                read_times.append(read_time)
+            results.append(
+                {
+                    "Serializer": serializer,
+                    "Corpus": kind,
+                    "Size": size,
+                    "Serialize Time (s)": min(write_times),
+                    "Deserialize Time (s)": min(read_times),
+                    "Serialized Size (B)": len(data),
+                }
+            )
+    return results
+
+
+def profile_json_backends(
+    backends=None,
+    corpora=SERIALIZER_CORPORA,
+    size: int = 1_000,
+    iterations: int = 5,
+):
+    """Best-of-`iterations` hashstash serialize/deserialize seconds per installed JSON backend and corpus."""
+    from ..serializers.jsons import get_json_backend_name, set_json_backend
+
+    if backends is None:
+        backends = get_working_json_backends()
+    active = get_json_backend_name()
+    results = []
+    try:
+        for backend in backends:
+            set_json_backend(backend)
+            for result in profile_serializer_corpora(("hashstash",), corpora, size, iterations):
+                results.append({"JSON Backend": backend, **result})
+    finally:
+        set_json_backend(active)
+    return results
+
+
+AUTO_PROFILE_DATA_TYPES = ["primitive", "list", "dict", *SERIALIZER_CORPORA, "numpy_array", "pandas_df"]
+
+
+def generate_auto_sample(data_type: str, size: int = 1_000):
+    if data_type in SERIALIZER_CORPORA:
+        return generate_corpus(data_type, size)
+    if data_type == "primitive":
+        return generate_primitive()
+    if data_type == "list":
+        return generate_list(size)
+    if data_type == "dict":
+        return {f"key_{i}": generate_list(10) for i in range(size // 10)}
+    import numpy as np
+    if data_type == "numpy_array":
+        return np.random.rand(size)
+    if data_type == "pandas_df":
+        import pandas as pd
+        return pd.DataFrame({"id": np.arange(size), "value": np.random.rand(size)})
+    raise ValueError(f"Invalid data type: {data_type}. Choose one of: {', '.join(AUTO_PROFILE_DATA_TYPES)}")
+
+
+def profile_auto_codecs(data_types=AUTO_PROFILE_DATA_TYPES, size: int = 1_000, iterations: int = 5):
+    """The codec the auto serializer picks per data type (as stored in a stash), with best-of-`iterations` timings."""
+    results = []
+    for data_type in data_types:
+        value = [generate_auto_sample(data_type, size)]
+        write_times, read_times = [], []
+        for _ in range(iterations):
+            data, write_time = time_function(serialize, value, "auto")
+            _, read_time = time_function(deserialize, data, "auto")
+            write_times.append(write_time)
+            read_times.append(read_time)
+        results.append(
+            {
+                "Data Type": data_type,
+                "Codec": get_auto_codec_of(data),
+                "Size": size,
+                "Serialize Time (s)": min(write_times),
+                "Deserialize Time (s)": min(read_times),
+                "Serialized Size (B)": len(data),
+            }
+        )
+    return results
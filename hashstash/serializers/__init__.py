@@ -1,4 +1,6 @@
 from .. import *
+from .frames import *
 from .jsons import *
 from .custom import *
+from .auto import *
 from .serializer import *
\ No newline at end of file
@@ -0,0 +1,70 @@
+from . import *
+from .custom import _JSON_SCALARS, _serialize_custom, _deserialize_custom, dump_doc
+
+# The "auto" serializer picks a codec per value. JSON codecs' output starts with a
+# tag byte naming the codec; hashstash-binary frames are left as they are, since
+# their magic already names them and keeps their buffers aligned.
+AUTO_CODEC_TAGS = {"json": b"\x01", "hashstash": b"\x02"}
+AUTO_TAG_CODECS = {tag: codec for codec, tag in AUTO_CODEC_TAGS.items()}
+# strings don't count: they're as fast in JSON
+AUTO_BINARY_MIN_SIZE = 1024
+
+
+def _is_large_buffer(obj):
+    obj_type = type(obj)
+    if obj_type in _JSON_SCALARS or obj_type is dict or obj_type is list:
+        return False
+    return approx_nbytes(obj) >= AUTO_BINARY_MIN_SIZE or is_dataframe(obj)
+
+
+def get_auto_codec(obj) -> str:
+    """
+    Codec the auto serializer starts from for `obj`: hashstash-binary if it is, or
+    directly holds, an array, dataframe or large bytes; else hashstash, which is
+    written as plain JSON if `obj` turns out to be JSON already.
+    """
+    if type(obj) is list and len(obj) == 1:
+        obj = obj[0]  # as stashes wrap each value
+    obj_type = type(obj)
+    if obj_type in _JSON_SCALARS:
+        return "json"
+    children = obj.values() if obj_type is dict else obj if obj_type in (list, tuple) else (obj,)
+    if any(_is_large_buffer(child) for child in children):
+        return "hashstash-binary"
+    return "hashstash"
+
+
+def get_auto_codec_of(data) -> str:
+    """Codec that auto-serialized `data` was written with."""
+    tag = bytes(memoryview(data)[:1])
+    if tag in AUTO_TAG_CODECS:
+        return AUTO_TAG_CODECS[tag]
+    if bytes(memoryview(data)[: len(BINARY_MAGIC)]) == BINARY_MAGIC:
+        return "hashstash-binary"
+    raise ValueError(f"Not auto-serialized data: unknown codec tag {tag!r}")
+
+
+@log.debug
+def serialize_auto(obj: Any, canonical=False, parts=False) -> bytes:
+    if get_auto_codec(obj) == "hashstash-binary":
+        return serialize_custom_binary(obj, parts=parts)
+    with out_of_band_buffers(None), interned_classes(ClassTable()) as table:
+        serialized = table.wrap(_serialize_custom(obj))
+    serialized, data = dump_doc(serialized, canonical=canonical)
+    if isinstance(data, str):
+        data = data.encode()
+    # native JSON comes back from _serialize_custom untouched
+    data = AUTO_CODEC_TAGS["json" if serialized is obj else "hashstash"] + data
+    return [data] if parts else data
+
+
+@log.debug
+def deserialize_auto(data) -> Any:
+    codec = get_auto_codec_of(data)
+    if codec == "hashstash-binary":
+        return deserialize_custom_binary(data)
+    doc = get_json_backend()[1](bytes(memoryview(data)[1:]))
+    if codec == "json":
+        return doc
+    with out_of_band_buffers(None), interned_classes(None):
+        return _deserialize_custom(doc)
@@ -2,40 +2,170 @@ from . import *
 from ..utils.logs import *
 from pprint import pprint
 import json
+import functools
+import dataclasses
+import datetime
+import decimal
+import enum
+import fractions
+import uuid
 from typing import Any
 from pathlib import Path
 from ..utils.misc import ReusableGenerator
 
 PANDAS_EXTENSION_ACTIVATED = True
 
+BINARY_MAGIC = b"HSB\x01"
+_out_of_band = threading.local()
+_class_tables = threading.local()
+
 def dump_json(obj,as_string=False):
-    try:
-        # res = serialize_orjson(obj)
-        res = serialize_json(obj)
-        log.debug('serialized via orjson')
-        if as_string: res = res.decode('utf-8')
-    except ImportError:
-        res = serialize_json(obj)
-        if not as_string: res = res.encode('utf-8')
+    res = get_json_backend()[0](obj)
+    if as_string and isinstance(res, bytes): res = res.decode('utf-8')
+    if not as_string and isinstance(res, str): res = res.encode('utf-8')
     return res
     
 
 @log.debug
-def serialize_custom(obj: Any) -> str:
-    serialized = _serialize_custom(obj)
-    return json.dumps(serialized)
+def serialize_custom(obj: Any, canonical=False) -> Union[str, bytes]:
+    with out_of_band_buffers(None), interned_classes(ClassTable()) as table:
+        serialized = table.wrap(_serialize_custom(obj))
+    # canonical output (for keys) is stdlib json's, whatever the JSON backend
+    return dump_doc(serialized, canonical=canonical)[1]
+
+def dump_doc(doc, canonical=False):
+    """
+    (doc, JSON) for a serialized doc, as stdlib json writes it if canonical. A doc
+    too deep for the JSON encoders is written flat instead: see flatten_doc.
+    """
+    dumps = json.dumps if canonical else get_json_backend()[0]
+    try:
+        return doc, dumps(doc)
+    except RecursionError:
+        doc = flatten_doc(doc)
+        return doc, dumps(doc)
+
+def flatten_doc(doc):
+    """
+    A doc as a table of its lists and dicts, each nested one replaced by
+    {'__node__': index}, so its JSON is never more than a few levels deep. The doc
+    itself is node 0, and nodes come after the node holding them.
+    """
+    nodes = []
+    stack = [(doc, None, None)]
+    while stack:
+        obj, parent, slot = stack.pop()
+        node = dict(obj) if type(obj) is dict else list(obj)
+        if parent is not None:
+            parent[slot] = {'__node__': len(nodes)}
+        nodes.append(node)
+        children = node.items() if type(node) is dict else enumerate(node)
+        stack.extend((v, node, k) for k, v in children if type(v) in (dict, list))
+    return {'__pytype__': 'flat', '__nodes__': nodes}
+
+def unflatten_doc(data):
+    nodes = data['__nodes__']
+    # last first, so the nodes put in place are already whole
+    for node in reversed(nodes):
+        children = list(node.items() if type(node) is dict else enumerate(node))
+        for k, v in children:
+            if type(v) is dict and len(v) == 1 and '__node__' in v:
+                node[k] = nodes[v['__node__']]
+    return nodes[0]
+
+@contextmanager
+def out_of_band_buffers(buffers):
+    """Within this block, array and bytes payloads go to `buffers` (if not None) instead of inline b64."""
+    prev = getattr(_out_of_band, "buffers", None)
+    _out_of_band.buffers = buffers
+    try:
+        yield buffers
+    finally:
+        _out_of_band.buffers = prev
+
+def get_out_of_band_buffers():
+    return getattr(_out_of_band, "buffers", None)
+
+def _add_out_of_band_buffer(buffer):
+    buffers = get_out_of_band_buffers()
+    buffers.append(buffer)
+    return {'__buffer__': len(buffers) - 1}
+
+def _serialize_buffer(buffer):
+    # out of band in a binary frame, else inline b64
+    if get_out_of_band_buffers() is not None:
+        return _add_out_of_band_buffer(buffer)
+    return encode(bytes(memoryview(buffer)), compress=False, b64=True, as_string=True)
+
+def _deserialize_buffer(payload):
+    if isinstance(payload, dict):
+        return get_out_of_band_buffers()[payload['__buffer__']]
+    return decode(payload, compress=False, b64=True)
+
+@contextmanager
+def interned_classes(table):
+    """Within this block, instances refer to their class by index into `table` (if not None)."""
+    prev = getattr(_class_tables, "table", None)
+    _class_tables.table = table
+    try:
+        yield table
+    finally:
+        _class_tables.table = prev
+
+def get_class_table():
+    return getattr(_class_tables, "table", None)
+
+
+class ClassTable:
+    """
+    The classes of one value's instances, serialized once each. Instances hold an
+    index into `classes`; the value is wrapped with the table by wrap().
+    """
+
+    def __init__(self, classes=None):
+        self.classes = [] if classes is None else classes
+        self.indices = {}
+        self.rebuilt = {}
+
+    def index(self, cls):
+        try:
+            return self.indices[cls]
+        except KeyError:
+            # reserve the slot first: class attributes may be instances of cls
+            i = self.indices[cls] = len(self.classes)
+            self.classes.append(None)
+            self.classes[i] = ClassSerializer.serialize(cls)
+            return i
+
+    def get_class(self, i):
+        try:
+            return self.rebuilt[i]
+        except KeyError:
+            cls = self.rebuilt[i] = ClassSerializer.deserialize(self.classes[i])
+            return cls
+
+    def wrap(self, serialized):
+        if not self.classes:
+            return serialized
+        return {'__pytype__': 'classes', '__classes__': self.classes, '__data__': serialized}
+
 
 @log.debug
-def serialize_custom(obj: Any) -> str:
-    serialized = _serialize_custom(obj)
-    return json.dumps(serialized)
+def serialize_custom_binary(obj: Any, parts=False) -> bytes:
+    """With parts=True, returns the frame as a list of parts, without joining them."""
+    with out_of_band_buffers([]) as buffers, interned_classes(ClassTable()) as table:
+        serialized = table.wrap(_serialize_custom(obj))
+    try:
+        frame = frame_parts(BINARY_MAGIC, {'doc': serialized}, buffers)
+    except RecursionError:
+        frame = frame_parts(BINARY_MAGIC, {'doc': flatten_doc(serialized)}, buffers)
+    return frame if parts else b"".join(frame)
 
 def stuff(obj, data=None):
     return _serialize_custom(obj, data=data)
 def unstuff(obj):
     return _deserialize_custom(obj)
 
-@log.debug
 def _serialize_custom(obj: Any, data:Any=None) -> Any:
     if obj is None:
         return None
@@ -45,57 +175,270 @@ def _serialize_custom(obj: Any, data:Any=None) -> Any:
             '__py__': get_obj_addr(obj),
             '__data__': _serialize_custom(data)
         }
-    
 
-    if isinstance(obj, (str, int, float, bool)):
+    if type(obj) in _JSON_SCALARS:
         return obj
-    
+    holder = [None]
+    stack = [(obj, holder, 0)]
+    # explicit stack rather than recursion, so deep trees don't hit the recursion limit.
+    # Frames are (obj, parent, slot): the result goes to parent[slot]. Lists and dicts
+    # are finished (by a _Finish frame) after their children, and returned as-is if
+    # no child changed.
+    while stack:
+        obj, parent, slot = stack.pop()
+        obj_type = type(obj)
+        if obj_type is _Finish:
+            parent[slot] = obj()
+            continue
+        if obj_type in _JSON_SCALARS:
+            parent[slot] = obj
+            continue
+        try:
+            handler = _SERIALIZE_DISPATCH[obj_type]
+        except KeyError:
+            handler = _resolve_serialize_handler(obj)
+
+        if handler is _serialize_list or handler is _serialize_dict:
+            _push_container(obj, parent, slot, stack, _serialize_custom)
+        elif isinstance(handler, _Expander):
+            parent[slot], key, child = handler.expand(obj)
+            stack.append((child, parent[slot], key))
+        else:
+            parent[slot] = handler(obj)
+    return holder[0]
+
+
+_JSON_SCALARS = frozenset({str, int, float, bool, type(None)})
+
+class _Finish(functools.partial):
+    """Stack frame object run once the frames above it are done; its result goes to parent[slot]."""
+
+def _push_container(obj, parent, slot, stack, convert_key):
+    """
+    Copy a list or dict's JSON scalars straight into a new one and push a frame for
+    each other child. A JSON-native container is itself the result, uncopied.
+    """
     if isinstance(obj, dict):
-        return {_serialize_custom(k): _serialize_custom(v) for k, v in obj.items()}
-    
-    if isinstance(obj, list):
-        return [_serialize_custom(v) for v in obj]
+        new, pending, as_is = {}, [], type(obj) is dict
+        for k, v in obj.items():
+            if type(k) not in _JSON_SCALARS:
+                k, as_is = convert_key(k), False
+            new[k] = v
+            if type(v) not in _JSON_SCALARS:
+                pending.append((v, new, k))
+    elif set(map(type, obj)) <= _JSON_SCALARS:
+        parent[slot] = obj if type(obj) is list else list(obj)
+        return
+    else:
+        new, as_is = list(obj), type(obj) is list
+        pending = [(v, new, i) for i, v in enumerate(new) if type(v) not in _JSON_SCALARS]
+    if not pending:
+        parent[slot] = obj if as_is else new
+        return
+    stack.append((_Finish(_unchanged_or_new, obj, new, pending if as_is else None), parent, slot))
+    stack.extend(reversed(pending))
+
+def _unchanged_or_new(orig, new, pending):
+    # the original stands in for the copy if every nested child came back as itself
+    if pending is not None and all(new[k] is v for v, _, k in pending):
+        return orig
+    return new
+
+
+class _Expander:
+    """
+    Dispatch handler for objects that serialize to a tagged dict around one nested
+    value, e.g. an instance's __dict__. expand(obj) returns (shell, key, child) so
+    that the caller's stack serializes the child into shell[key].
+    """
+
+    def __init__(self, expand):
+        self.expand = expand
+
+    def __call__(self, obj):
+        shell, key, child = self.expand(obj)
+        shell[key] = _serialize_custom(child)
+        return shell
+
+
+# type -> handler, resolved from the first instance seen and reused for the rest
+_SERIALIZE_DISPATCH = {}
+
+def _return_as_is(obj):
+    return obj
+
+def _serialize_dict(obj):
+    return {_serialize_custom(k): _serialize_custom(v) for k, v in obj.items()}
+
+def _serialize_list(obj):
+    return [_serialize_custom(v) for v in obj]
+
+_serialize_via_to_serialized = _Expander(
+    lambda obj: ({'__py__': get_obj_addr(obj), '__data__': None}, '__data__', obj.to_serialized())
+)
+
+_serialize_via_to_dict = _Expander(
+    lambda obj: ({'__py__': get_obj_addr(obj), '__data__': None}, '__data__', obj.to_dict())
+)
 
+_serialize_iterable = _Expander(
+    lambda obj: ({'__py__': get_obj_addr(obj), '__data__': None}, '__data__', list(obj))
+)
+
+def _class_ref(cls):
+    # an index into the active class table, else the class's address
+    table = getattr(_class_tables, "table", None)
+    if table is not None:
+        return {'__cls__': table.index(cls)}
+    return {'__py__': get_obj_addr(cls)}
+
+def _class_of(data):
+    cls_ref = data.get('__cls__')
+    if cls_ref is not None:
+        return _class_tables.table.get_class(cls_ref)
+    return flexible_import(data['__py__'])
+
+def _dataclass_state(obj):
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+
+_serialize_dataclass = _Expander(
+    lambda obj: ({**_class_ref(type(obj)), '__pytype__': 'dataclass', '__data__': None}, '__data__', _dataclass_state(obj))
+)
+
+_serialize_namedtuple = _Expander(
+    lambda obj: ({**_class_ref(type(obj)), '__pytype__': 'namedtuple', '__data__': None}, '__data__', list(obj))
+)
+
+def _is_namedtuple(obj):
+    return isinstance(obj, tuple) and hasattr(obj, '_fields') and hasattr(obj, '_make')
+
+def _serialize_instance(cls_data=None):
+    def expand(obj):
+        table = getattr(_class_tables, "table", None)
+        if table is not None:
+            shell = {'__pytype__': 'instance', '__cls__': table.index(obj.__class__), '__state__': None}
+            return shell, '__state__', obj.__dict__
+        shell = {
+            '__py__': get_obj_addr(obj),
+            '__pytype__': 'instance',
+            '__cls__': cls_data if cls_data is not None else ClassSerializer.serialize(obj.__class__),
+            '__state__': None,
+        }
+        return shell, '__state__', obj.__dict__
+    return _Expander(expand)
+
+def _serialize_class(obj):
+    # a class's address is its own, so it can't be resolved per type
     addr = get_obj_addr(obj)
     if addr in CUSTOM_SERIALIZERS:
         return CUSTOM_SERIALIZERS[addr](obj)
+    return ClassSerializer.serialize(obj)
 
-    if hasattr(obj, 'to_serialized') and callable(obj.to_serialized) and not inspect.isclass(obj):
-        return {
-            '__py__': addr,
-            '__data__': _serialize_custom(obj.to_serialized())
-        }
+def _serialize_unsupported(obj):
+    log.warning(f"Unsupported object type: {type(obj)}")
+    return obj
+
+def _get_serialize_handler(obj):
+    # before the scalars: IntEnum and StrEnum members are ints and strs
+    if isinstance(obj, enum.Enum) and can_import_object(type(obj)):
+        return EnumSerializer.serialize
+
+    if isinstance(obj, (str, int, float, bool)):
+        return _return_as_is
+
+    if isinstance(obj, type):
+        return _serialize_class
+
+    # before dict and list: registered types may subclass them (e.g. scipy's dok_matrix)
+    addr = get_obj_addr(obj)
+    if addr in CUSTOM_SERIALIZERS:
+        handler = CUSTOM_SERIALIZERS[addr]
+        return _serialize_iterable if handler is IterableSerializer.serialize else handler
     
-    if hasattr(obj, 'to_dict') and callable(obj.to_dict) and not inspect.isclass(obj):
-        return {
-            '__py__': addr,
-            '__data__': _serialize_custom(obj.to_dict())
-        }
+    if isinstance(obj, dict):
+        return _serialize_dict
     
-    if isinstance(obj, type):
-        return ClassSerializer.serialize(obj)
+    if isinstance(obj, list):
+        return _serialize_list
+
+    if hasattr(obj, 'to_serialized') and callable(obj.to_serialized):
+        return _serialize_via_to_serialized
+    
+    if hasattr(obj, 'to_dict') and callable(obj.to_dict):
+        return _serialize_via_to_dict
+
+    if dataclasses.is_dataclass(obj) and can_import_object(type(obj)):
+        return _serialize_dataclass
+
+    if _is_namedtuple(obj) and can_import_object(type(obj)):
+        return _serialize_namedtuple
     
     if inspect.isgenerator(obj):
-        return GeneratorSerializer.serialize(obj)
+        return GeneratorSerializer.serialize
 
     if is_function(obj):
-        return FunctionSerializer.serialize(obj)
+        return FunctionSerializer.serialize
     
     # Handle class instances
     if hasattr(obj, '__dict__'):
-        return InstanceSerializer.serialize(obj)
+        cls = type(obj)
+        if obj.__class__ is not cls or not can_import_object(cls):
+            return _serialize_instance()
+        # an importable class serializes to the same reference every time
+        return _serialize_instance(ClassSerializer.serialize(cls))
 
     if hasattr(obj, '__reduce__'):
-        return ReducerSerializer.serialize(obj)
+        return ReducerSerializer.serialize
     
-    log.warning(f"Unsupported object type: {type(obj)}")
-    return obj
+    return _serialize_unsupported
+
+def _resolve_serialize_handler(obj):
+    handler = _SERIALIZE_DISPATCH[type(obj)] = _get_serialize_handler(obj)
+    return handler
+
+def reset_serialize_dispatch():
+    """Forget resolved handlers, e.g. after changing CUSTOM_SERIALIZERS."""
+    _SERIALIZE_DISPATCH.clear()
 
 
 ### Deserializing
 
 def deserialize_custom(serialized_str: str) -> Any:
-    return _deserialize_custom(json.loads(serialized_str))
+    with out_of_band_buffers(None), interned_classes(None):
+        return _deserialize_custom(get_json_backend()[1](serialized_str))
+
+def deserialize_custom_binary(data: bytes) -> Any:
+    # buffers are views into `data`, so arrays are read without copying
+    header, buffers = unpack_frame(data, BINARY_MAGIC)
+    with out_of_band_buffers(buffers), interned_classes(None):
+        return _deserialize_custom(header['doc'])
+
+def deserialize_custom_binary_range(read, start=0, stop=None):
+    # see deserialize_range()
+    header, segments = read_frame_header(read, BINARY_MAGIC)
+    doc = header['doc']
+    if type(doc) is list and len(doc) == 1:
+        doc = doc[0]  # as stashes wrap each value
+    if type(doc) is not dict:
+        return None
+    if doc.get('__py__') == 'builtins.bytes' and isinstance(doc.get('__data__'), dict):
+        offset, nbytes = segments[doc['__data__']['__buffer__']]
+        start, stop, _ = slice(start, stop).indices(nbytes)
+        return bytes(read(offset + start, offset + max(start, stop)))
+    data = doc.get('__data__')
+    if doc.get('__py__') == 'numpy.ndarray' and isinstance(data, dict) and isinstance(data.get('bytes'), dict) and data['shape']:
+        import numpy as np
+
+        dtype, shape = np.dtype(data['dtype']), data['shape']
+        offset, _ = segments[data['bytes']['__buffer__']]
+        row_nbytes = dtype.itemsize * int(np.prod(shape[1:]))
+        start, stop, _ = slice(start, stop).indices(shape[0])
+        stop = max(start, stop)
+        buffer = read(offset + start * row_nbytes, offset + stop * row_nbytes)
+        return np.frombuffer(buffer, dtype=dtype).reshape([stop - start, *shape[1:]])
+    return None
 
 def _deserialize_object_data(obj, obj_data: Any) -> Any:
     if hasattr(obj, 'from_serialized') and callable(obj.from_serialized):
@@ -112,44 +455,92 @@ def _deserialize_object_data(obj, obj_data: Any) -> Any:
 
 
 def _deserialize_custom(data: Any) -> Any:
-    if isinstance(data, (str, int, float, bool, type(None))):
+    if not isinstance(data, (list, dict)):
         return data
+    holder = [None]
+    stack = [(data, holder, 0)]
+    # explicit stack, as in _serialize_custom
+    while stack:
+        data, parent, slot = stack.pop()
+        if type(data) is _Finish:
+            parent[slot] = data()
+        elif isinstance(data, list):
+            _push_container(data, parent, slot, stack, _deserialize_custom)
+        elif isinstance(data, dict):
+            if ('__py__' in data or '__pytype__' in data) and _push_tagged(data, parent, slot, stack):
+                continue
+            _push_container(data, parent, slot, stack, _deserialize_custom)
+        else:
+            parent[slot] = data
+    return holder[0]
+
+def _push_tagged(data: dict, parent, slot, stack) -> bool:
+    """Deserialize a tagged dict into parent[slot], nested data via `stack`; False if it's a plain dict."""
+    pytype = data.get('__pytype__')
+    addr = data.get('__py__')
+
+    if pytype == 'instance':
+        instance, state = InstanceSerializer.new_instance(data), [None]
+        stack.append((_Finish(_set_instance_state, instance, state), parent, slot))
+        stack.append((data['__state__'], state, 0))
+        return True
+
+    if pytype == 'flat':
+        stack.append((unflatten_doc(data), parent, slot))
+        return True
+
+    if pytype == 'classes':
+        # the table applies until the wrapped data is done
+        decoded = [None]
+        stack.append((_Finish(_end_class_table, get_class_table(), decoded), parent, slot))
+        stack.append((data['__data__'], decoded, 0))
+        _class_tables.table = ClassTable(data['__classes__'])
+        return True
+
+    handler = CUSTOM_DESERIALIZERS.get(addr) if addr else None
+    if handler is None and pytype:
+        handler = PYTYPE_DESERIALIZERS.get(pytype)
+    if isinstance(handler, _Builder):
+        decoded = [None]
+        stack.append((_Finish(lambda: handler.build(data, decoded[0])), parent, slot))
+        stack.append((data['__data__'], decoded, 0))
+        return True
+    if handler is not None:
+        parent[slot] = handler(data)
+        return True
+
+    obj_data = data.get('__data__')
+    if obj_data and can_import_object(addr):
+        obj, decoded = flexible_import(addr), [None]
+        stack.append((_Finish(lambda: _deserialize_object_data(obj, decoded[0])), parent, slot))
+        stack.append((obj_data, decoded, 0))
+        return True
     
-    if isinstance(data, list):
-        return [_deserialize_custom(v) for v in data]
+    if addr:
+        parent[slot] = flexible_import(addr)
+        return True
     
-    if isinstance(data, dict):
-        pytype = data.get('__pytype__')
-        addr = data.get('__py__')
-        
-        if pytype == 'instance':
-            return InstanceSerializer.deserialize(data)
-        
-        if addr and addr in CUSTOM_DESERIALIZERS:
-            return CUSTOM_DESERIALIZERS[addr](data)
-        
-        if pytype == 'reducer':
-            return ReducerSerializer.deserialize(data)
-        
-        if pytype in {'function', 'classmethod', 'instancemethod'}:
-            return FunctionSerializer.deserialize(data)
-        
-        if pytype == 'class':
-            return ClassSerializer.deserialize(data)
-        
-        if pytype == 'generator':
-            return GeneratorSerializer.deserialize(data)
+    return False
 
-        obj_data = data.get('__data__')
-        if obj_data and can_import_object(addr):
-            return _deserialize_object_data(flexible_import(addr), _deserialize_custom(obj_data))
-        
-        if '__py__' in data:
-            return flexible_import(data['__py__'])
-        
-        return {_deserialize_custom(k): _deserialize_custom(v) for k, v in data.items()}
-    
-    return data
+class _Builder:
+    """
+    Deserializer for a tagged dict around one nested value, the counterpart of
+    _Expander: build(data, value) gets data['__data__'] already deserialized.
+    """
+
+    def __init__(self, build):
+        self.build = build
+
+    def __call__(self, data):
+        return self.build(data, _deserialize_custom(data['__data__']))
+
+def _set_instance_state(instance, state):
+    instance.__dict__.update(state[0])
+    return instance
+
+def _end_class_table(prev, decoded):
+    _class_tables.table = prev
+    return decoded[0]
 
 
 
@@ -172,10 +563,9 @@ class IterableSerializer(CustomSerializer):
             '__data__': [_serialize_custom(x) for x in obj]
         }
 
-    @staticmethod
-    def deserialize(data):
-        obj = flexible_import(data['__py__'])
-        return obj(_deserialize_custom(data['__data__']))
+    @_Builder
+    def deserialize(data, items):
+        return flexible_import(data['__py__'])(items)
 
 class MetaDataFrameSerializer(CustomSerializer):
     @staticmethod
@@ -280,6 +670,11 @@ class NumpySerializer(CustomSerializer):
         }
         if obj.dtype.kind == 'O':
             outd['__data__']['values'] = [_serialize_custom(item) for item in obj.flatten()]
+        elif get_out_of_band_buffers() is not None:
+            import numpy as np
+            outd['__data__']['bytes'] = _add_out_of_band_buffer(
+                np.ascontiguousarray(obj).reshape(-1).view(np.uint8)
+            )
         else:
             outd['__data__']['bytes'] = encode(obj.tobytes(), compress=False, b64=True, as_string=True)
         return outd
@@ -292,6 +687,9 @@ class NumpySerializer(CustomSerializer):
             raise ImportError("NumPy is required for this deserializer.")
         dtype = data['__data__']['dtype']
         shape = data['__data__']['shape']
+        if isinstance(data['__data__'].get('bytes'), dict):
+            buffer = get_out_of_band_buffers()[data['__data__']['bytes']['__buffer__']]
+            return np.frombuffer(buffer, dtype=dtype).reshape(shape)
         if 'bytes' in data['__data__']:
             arr_bytes = decode(data['__data__']['bytes'], compress=False, b64=True)
             return np.frombuffer(arr_bytes, dtype=dtype).reshape(shape)
@@ -320,6 +718,101 @@ class PandasSeriesSerializer(CustomSerializer):
             index=NumpySerializer.deserialize(data['__data__']['index'])
         )
 
+class SparseSerializer(CustomSerializer):
+    """scipy.sparse matrices and arrays as their component numpy arrays."""
+
+    @staticmethod
+    def serialize(obj):
+        fmt = obj.format
+        stored = obj.tocoo() if fmt in ('dok', 'lil') else obj
+        if stored.format == 'coo':
+            coords = getattr(stored, 'coords', None) or (stored.row, stored.col)
+            arrays = {'data': stored.data, **{f'coords{i}': c for i, c in enumerate(coords)}}
+        elif fmt == 'dia':
+            arrays = {'data': stored.data, 'offsets': stored.offsets}
+        else:
+            arrays = {'data': stored.data, 'indices': stored.indices, 'indptr': stored.indptr}
+        return {
+            '__py__': get_obj_addr(obj),
+            '__pytype__': 'sparse',
+            '__data__': {
+                'class': type(obj).__name__,
+                'shape': list(obj.shape),
+                'arrays': {k: NumpySerializer.serialize(v) for k, v in arrays.items()},
+            }
+        }
+
+    @staticmethod
+    def deserialize(data):
+        import scipy.sparse
+        data = data['__data__']
+        # by name, as the modules defining these classes vary across scipy versions
+        fmt, kind = data['class'].split('_', 1)
+        shape = tuple(data['shape'])
+        arrays = {k: NumpySerializer.deserialize(v) for k, v in data['arrays'].items()}
+        if fmt in ('csr', 'csc', 'bsr'):
+            return getattr(scipy.sparse, data['class'])((arrays['data'], arrays['indices'], arrays['indptr']), shape=shape)
+        if fmt == 'dia':
+            return getattr(scipy.sparse, data['class'])((arrays['data'], arrays['offsets']), shape=shape)
+        coords = tuple(arrays[f'coords{i}'] for i in range(len(arrays) - 1))
+        coo = getattr(scipy.sparse, f'coo_{kind}')((arrays['data'], coords), shape=shape)
+        return coo if fmt == 'coo' else coo.asformat(fmt)
+
+class ArrowSerializer(CustomSerializer):
+    """pyarrow Tables and RecordBatches as an Arrow IPC stream, read back without copying."""
+
+    @staticmethod
+    def serialize(obj):
+        import pyarrow as pa
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, obj.schema) as writer:
+            writer.write(obj)
+        return {
+            '__py__': get_obj_addr(obj),
+            '__data__': _serialize_buffer(sink.getvalue())
+        }
+
+    @staticmethod
+    def deserialize(data):
+        import pyarrow as pa
+        reader = pa.ipc.open_stream(pa.py_buffer(_deserialize_buffer(data['__data__'])))
+        if data['__py__'].endswith('RecordBatch'):
+            return reader.read_next_batch()
+        return reader.read_all()
+
+class TorchTensorSerializer(CustomSerializer):
+    """Dense torch tensors through their raw bytes, moved to the CPU to be written."""
+
+    @staticmethod
+    def serialize(obj):
+        import torch
+        tensor = obj.detach().cpu().contiguous()
+        return {
+            '__py__': get_obj_addr(obj),
+            '__data__': {
+                'dtype': str(tensor.dtype).split('.')[-1],
+                'shape': list(tensor.shape),
+                'device': str(obj.device),
+                'requires_grad': obj.requires_grad,
+                # as bytes, so dtypes numpy lacks (e.g. bfloat16) work too
+                'bytes': _serialize_buffer(tensor.reshape(-1).view(torch.uint8).numpy()),
+            }
+        }
+
+    @staticmethod
+    def deserialize(data):
+        import numpy as np
+        import torch
+        addr, data = data['__py__'], data['__data__']
+        # copied once: tensors are writable, and stored buffers may be read-only memory
+        raw = np.frombuffer(_deserialize_buffer(data['bytes']), dtype=np.uint8).copy()
+        tensor = torch.from_numpy(raw).view(getattr(torch, data['dtype'])).reshape(data['shape'])
+        if data['device'] != 'cpu':
+            tensor = tensor.to(data['device'])
+        if addr.endswith('Parameter'):
+            return torch.nn.Parameter(tensor, requires_grad=data['requires_grad'])
+        return tensor.requires_grad_(data['requires_grad'])
+
 class ReducerSerializer(CustomSerializer):
     @staticmethod
     def serialize(obj):
@@ -380,14 +873,20 @@ class ReducerSerializer(CustomSerializer):
 class BytesSerializer(CustomSerializer):
     @staticmethod
     def serialize(obj):
+        if get_out_of_band_buffers() is not None:
+            payload = _add_out_of_band_buffer(obj)
+        else:
+            payload = encode(obj, compress=False, b64=True, as_string=True)
         return {
             '__py__': get_obj_addr(obj),
             '__pytype__': 'bytes',
-            '__data__': encode(obj, compress=False, b64=True, as_string=True)
+            '__data__': payload
         }
 
     @staticmethod
     def deserialize(data):
+        if isinstance(data['__data__'], dict):
+            return bytes(get_out_of_band_buffers()[data['__data__']['__buffer__']])
         return decode(data['__data__'], compress=False, b64=True)
 
 
@@ -477,6 +976,9 @@ def recreate_function_from_src(source, func_name):
         raise
 
 
+# (address, hash of class data) -> class rebuilt from that data
+_REBUILT_CLASSES = {}
+
 class ClassSerializer(CustomSerializer):
     @staticmethod
     def serialize(obj):
@@ -512,7 +1014,16 @@ class ClassSerializer(CustomSerializer):
     def deserialize(data):
         if can_import_object(data['__py__']):
             return flexible_import(data['__py__'])
-        
+
+        # rebuilt once per process for each address and definition
+        key = (data['__py__'], encode_hash(json.dumps(data, sort_keys=True)))
+        cls = _REBUILT_CLASSES.get(key)
+        if cls is None:
+            cls = _REBUILT_CLASSES[key] = ClassSerializer._rebuild(data)
+        return cls
+
+    @staticmethod
+    def _rebuild(data):
         bases = tuple(flexible_import(base) for base in data['__bases__'])
         
         # Create a new namespace for the class
@@ -678,24 +1189,30 @@ class ClassSerializer(CustomSerializer):
 
 class InstanceSerializer(CustomSerializer):
     @staticmethod
-    def serialize(obj):
+    def serialize(obj, cls_data=None):
         addr = get_obj_addr(obj)
         cls = obj.__class__
         return {
             '__py__': addr,
             '__pytype__': 'instance',
-            '__cls__': ClassSerializer.serialize(cls),
+            '__cls__': cls_data if cls_data is not None else ClassSerializer.serialize(cls),
             '__state__': _serialize_custom(obj.__dict__)
         }
 
     @staticmethod
-    def deserialize(data):
-        if isinstance(data['__cls__'], dict):
-            cls = ClassSerializer.deserialize(data['__cls__'])
+    def new_instance(data):
+        cls_ref = data['__cls__']
+        if type(cls_ref) is int:
+            cls = _class_tables.table.get_class(cls_ref)
+        elif isinstance(cls_ref, dict):
+            cls = ClassSerializer.deserialize(cls_ref)
         else:
-            cls = flexible_import(data['__cls__'])
-        
-        instance = cls.__new__(cls)
+            cls = flexible_import(cls_ref)
+        return cls.__new__(cls)
+
+    @staticmethod
+    def deserialize(data):
+        instance = InstanceSerializer.new_instance(data)
         instance.__dict__.update(_deserialize_custom(data['__state__']))
         return instance
 
@@ -730,6 +1247,119 @@ class PathSerializer(CustomSerializer):
     def deserialize(data):
         return Path(data['__data__'])
 
+class DatetimeSerializer(CustomSerializer):
+    """datetime, date and time as ISO strings, with any tzinfo but a fixed offset alongside."""
+    types = {get_obj_addr(t): t for t in (datetime.datetime, datetime.date, datetime.time)}
+
+    @staticmethod
+    def serialize(obj):
+        tzinfo = getattr(obj, 'tzinfo', None)
+        if tzinfo is None or type(tzinfo) is datetime.timezone:
+            result = {'__py__': get_obj_addr(obj), '__data__': obj.isoformat()}
+        else:
+            result = {
+                '__py__': get_obj_addr(obj),
+                '__data__': obj.replace(tzinfo=None).isoformat(),
+                '__tzinfo__': _serialize_custom(tzinfo),
+            }
+        if getattr(obj, 'fold', 0):
+            result['__fold__'] = 1
+        return result
+
+    @staticmethod
+    def deserialize(data):
+        obj = DatetimeSerializer.types[data['__py__']].fromisoformat(data['__data__'])
+        if '__tzinfo__' in data:
+            obj = obj.replace(tzinfo=_deserialize_custom(data['__tzinfo__']))
+        if '__fold__' in data:
+            obj = obj.replace(fold=1)
+        return obj
+
+class ZoneInfoSerializer(CustomSerializer):
+    @staticmethod
+    def serialize(obj):
+        return {'__py__': 'zoneinfo.ZoneInfo', '__data__': obj.key}
+
+    @staticmethod
+    def deserialize(data):
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(data['__data__'])
+
+class TimedeltaSerializer(CustomSerializer):
+    @staticmethod
+    def serialize(obj):
+        return {'__py__': 'datetime.timedelta', '__data__': [obj.days, obj.seconds, obj.microseconds]}
+
+    @staticmethod
+    def deserialize(data):
+        return datetime.timedelta(*data['__data__'])
+
+class DecimalSerializer(CustomSerializer):
+    @staticmethod
+    def serialize(obj):
+        return {'__py__': 'decimal.Decimal', '__data__': str(obj)}
+
+    @staticmethod
+    def deserialize(data):
+        return decimal.Decimal(data['__data__'])
+
+class UUIDSerializer(CustomSerializer):
+    @staticmethod
+    def serialize(obj):
+        return {'__py__': 'uuid.UUID', '__data__': obj.hex}
+
+    @staticmethod
+    def deserialize(data):
+        return uuid.UUID(data['__data__'])
+
+class FractionSerializer(CustomSerializer):
+    @staticmethod
+    def serialize(obj):
+        return {'__py__': 'fractions.Fraction', '__data__': str(obj)}
+
+    @staticmethod
+    def deserialize(data):
+        return fractions.Fraction(data['__data__'])
+
+class EnumSerializer(CustomSerializer):
+    """Members by name; Flag members by value, as combined flags have no single name."""
+    @staticmethod
+    def serialize(obj):
+        member = obj.value if isinstance(obj, enum.Flag) else obj.name
+        return {**_class_ref(type(obj)), '__pytype__': 'enum', '__data__': member}
+
+    @staticmethod
+    def deserialize(data):
+        cls, member = _class_of(data), data['__data__']
+        return cls(member) if type(member) is int else cls[member]
+
+class DataclassSerializer(CustomSerializer):
+    """Dataclass instances by class reference and field values, without running __init__."""
+    @staticmethod
+    def serialize(obj):
+        return _serialize_dataclass(obj)
+
+    @_Builder
+    def deserialize(data, state):
+        cls = _class_of(data)
+        obj = cls.__new__(cls)
+        if hasattr(obj, '__dict__'):
+            obj.__dict__.update(state)
+        else:
+            # slots, and maybe frozen
+            for name, value in state.items():
+                object.__setattr__(obj, name, value)
+        return obj
+
+class NamedTupleSerializer(CustomSerializer):
+    @staticmethod
+    def serialize(obj):
+        return _serialize_namedtuple(obj)
+
+    @_Builder
+    def deserialize(data, values):
+        return _class_of(data)._make(values)
+
 class ReusableGeneratorSerializer(CustomSerializer):
     @staticmethod
     def serialize(obj):
@@ -832,12 +1462,37 @@ CUSTOM_SERIALIZERS = {
     'types.GeneratorType': GeneratorSerializer.serialize,
     'pathlib.PosixPath': PathSerializer.serialize,
     'pathlib.WindowsPath': PathSerializer.serialize,
+    'datetime.datetime': DatetimeSerializer.serialize,
+    'datetime.date': DatetimeSerializer.serialize,
+    'datetime.time': DatetimeSerializer.serialize,
+    'datetime.timedelta': TimedeltaSerializer.serialize,
+    'zoneinfo.ZoneInfo': ZoneInfoSerializer.serialize,
+    'decimal.Decimal': DecimalSerializer.serialize,
+    'uuid.UUID': UUIDSerializer.serialize,
+    'fractions.Fraction': FractionSerializer.serialize,
+    'pyarrow.lib.Table': ArrowSerializer.serialize,
+    'pyarrow.lib.RecordBatch': ArrowSerializer.serialize,
+    'torch.Tensor': TorchTensorSerializer.serialize,
+    'torch.nn.parameter.Parameter': TorchTensorSerializer.serialize,
     'hashstash.utils.misc.ReusableGenerator': ReusableGeneratorSerializer.serialize,
     'hashstash.utils.dataframes.MetaDataFrame': MetaDataFrameSerializer.serialize,
     # 'hashstash.utils.pmap.Pmap': PmapSerializer.serialize,
     # 'hashstash.utils.pmap.PmapResult': PmapResultSerializer.serialize,
 }
 
+PYTYPE_DESERIALIZERS = {
+    'reducer': ReducerSerializer.deserialize,
+    'function': FunctionSerializer.deserialize,
+    'classmethod': FunctionSerializer.deserialize,
+    'instancemethod': FunctionSerializer.deserialize,
+    'class': ClassSerializer.deserialize,
+    'generator': GeneratorSerializer.deserialize,
+    'enum': EnumSerializer.deserialize,
+    'dataclass': DataclassSerializer.deserialize,
+    'namedtuple': NamedTupleSerializer.deserialize,
+    'sparse': SparseSerializer.deserialize,
+}
+
 CUSTOM_DESERIALIZERS = {
     'pandas.core.frame.DataFrame': PandasDataFrameSerializer.deserialize,
     'pandas.core.series.Series': PandasSeriesSerializer.deserialize,
@@ -852,8 +1507,28 @@ CUSTOM_DESERIALIZERS = {
     'types.GeneratorType': GeneratorSerializer.deserialize,
     'pathlib.PosixPath': PathSerializer.deserialize,
     'pathlib.WindowsPath': PathSerializer.deserialize,
+    'datetime.datetime': DatetimeSerializer.deserialize,
+    'datetime.date': DatetimeSerializer.deserialize,
+    'datetime.time': DatetimeSerializer.deserialize,
+    'datetime.timedelta': TimedeltaSerializer.deserialize,
+    'zoneinfo.ZoneInfo': ZoneInfoSerializer.deserialize,
+    'decimal.Decimal': DecimalSerializer.deserialize,
+    'uuid.UUID': UUIDSerializer.deserialize,
+    'fractions.Fraction': FractionSerializer.deserialize,
+    'pyarrow.lib.Table': ArrowSerializer.deserialize,
+    'pyarrow.lib.RecordBatch': ArrowSerializer.deserialize,
+    'torch.Tensor': TorchTensorSerializer.deserialize,
+    'torch.nn.parameter.Parameter': TorchTensorSerializer.deserialize,
     'hashstash.utils.misc.ReusableGenerator': ReusableGeneratorSerializer.deserialize,
     'hashstash.utils.dataframes.MetaDataFrame': MetaDataFrameSerializer.deserialize,
     # 'hashstash.utils.pmap.Pmap': PmapSerializer.deserialize,
     # 'hashstash.utils.pmap.PmapResult': PmapResultSerializer.deserialize,
 }
+
+# scipy.sparse classes by address: scipy.sparse._csr.csr_matrix etc., or
+# scipy.sparse.csr.csr_matrix before scipy 1.8. Keys are strings, so scipy is never imported here.
+SPARSE_FORMATS = ('csr', 'csc', 'coo', 'bsr', 'dia', 'dok', 'lil')
+for _fmt in SPARSE_FORMATS:
+    for _kind in ('matrix', 'array'):
+        for _module in (f'_{_fmt}', _fmt):
+            CUSTOM_SERIALIZERS[f'scipy.sparse.{_module}.{_fmt}_{_kind}'] = SparseSerializer.serialize
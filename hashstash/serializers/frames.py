@@ -0,0 +1,64 @@
+from . import *
+import struct
+
+# A frame is: magic, u32 header length, JSON header, then raw buffer segments,
+# each starting on a FRAME_ALIGN boundary. The header lists the segment sizes.
+FRAME_ALIGN = 64
+
+
+def _aligned(n):
+    return -(-n // FRAME_ALIGN) * FRAME_ALIGN
+
+
+def pack_frame(magic: bytes, header: dict, buffers: list) -> bytes:
+    return b"".join(frame_parts(magic, header, buffers))
+
+
+def frame_parts(magic: bytes, header: dict, buffers: list) -> list:
+    """The parts of a frame, in order; buffers are passed on as views, not copied."""
+    buffers = [memoryview(buffer).cast("B") for buffer in buffers]
+    header_b = json.dumps({**header, "buffers": [b.nbytes for b in buffers]}).encode()
+    parts = [magic, struct.pack("<I", len(header_b)), header_b]
+    offset = len(magic) + 4 + len(header_b)
+    for buffer in buffers:
+        parts.append(bytes(_aligned(offset) - offset))
+        parts.append(buffer)
+        offset = _aligned(offset) + buffer.nbytes
+    return parts
+
+
+def unpack_frame(data, magic: bytes):
+    """Returns (header, buffers); buffers are memoryviews into `data`, not copies."""
+    view = memoryview(data)
+    if bytes(view[: len(magic)]) != magic:
+        raise ValueError(f"Not a frame starting with {magic!r}")
+    (header_len,) = struct.unpack_from("<I", view, len(magic))
+    offset = len(magic) + 4
+    header = json.loads(bytes(view[offset : offset + header_len]))
+    offset += header_len
+    buffers = []
+    for nbytes in header["buffers"]:
+        offset = _aligned(offset)
+        buffers.append(view[offset : offset + nbytes])
+        offset += nbytes
+    return header, buffers
+
+
+def read_frame_header(read, magic: bytes):
+    """
+    Returns (header, [(offset, nbytes), ...] per buffer) of the frame that
+    read(start, stop) reads bytes from, reading only its header.
+    """
+    prefix = bytes(read(0, len(magic) + 4))
+    if prefix[: len(magic)] != magic:
+        raise ValueError(f"Not a frame starting with {magic!r}")
+    (header_len,) = struct.unpack_from("<I", prefix, len(magic))
+    offset = len(magic) + 4
+    header = json.loads(bytes(read(offset, offset + header_len)))
+    offset += header_len
+    segments = []
+    for nbytes in header["buffers"]:
+        offset = _aligned(offset)
+        segments.append((offset, nbytes))
+        offset += nbytes
+    return header, segments
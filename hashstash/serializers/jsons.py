@@ -1,4 +1,5 @@
 from . import *
+import math
 
 # try:
 #     import jsonpickle
@@ -26,6 +27,95 @@ def deserialize_json(obj):
     return json.loads(obj)
 
 
+## JSON backends
+# name -> (dumps, loads) used by the hashstash serializer for values; dumps may
+# return str or bytes. Every backend reads what any other wrote. Keys are always
+# written by stdlib json (see serialize_custom), so they are byte-identical
+# whichever backend is active and stashes stay readable when it changes.
+JSON_BACKENDS = {}
+_json_backend = None
+_json_backend_name = None
+
+def register_json_backend(name, dumps, loads):
+    JSON_BACKENDS[name] = (dumps, loads)
+
+def get_json_backend():
+    if _json_backend is None:
+        set_json_backend()
+    return _json_backend
+
+def get_json_backend_name():
+    if _json_backend is None:
+        set_json_backend()
+    return _json_backend_name
+
+def set_json_backend(name: JSON_BACKEND_TYPES = None):
+    """Use JSON backend `name` (default: the fastest installed) from now on; returns its name."""
+    global _json_backend, _json_backend_name
+    name = get_json_backend_type(name)
+    _json_backend, _json_backend_name = JSON_BACKENDS[name], name
+    return name
+
+def _dumps_orjson(obj):
+    import orjson
+    try:
+        data = orjson.dumps(obj)
+    except TypeError:  # ints beyond 64 bits, non-str dict keys, lone surrogates
+        return json.dumps(obj)
+    # orjson writes NaN and infinities as null; stdlib json keeps them. Only a doc
+    # with a null in it can hold one, so most docs skip the walk.
+    if b"null" in data and _has_nonfinite_float(obj):
+        return json.dumps(obj)
+    return data
+
+def _has_nonfinite_float(obj):
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        objtype = type(obj)
+        if objtype is float:
+            if not math.isfinite(obj):
+                return True
+        elif objtype is dict:
+            stack.extend(obj.values())
+        elif objtype is list:
+            stack.extend(obj)
+    return False
+
+def _loads_orjson(data):
+    import orjson
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:  # e.g. NaN, as written by stdlib json
+        return json.loads(data)
+
+def _dumps_ujson(obj):
+    import ujson
+    try:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, allow_nan=False)
+    except (TypeError, ValueError, OverflowError):
+        return json.dumps(obj)
+
+def _loads_ujson(data):
+    import ujson
+    try:
+        return ujson.loads(data)
+    except ValueError:
+        return json.loads(data)
+
+def _loads_simdjson(data):
+    import simdjson
+    try:
+        return simdjson.loads(data)
+    except ValueError:
+        return json.loads(data)
+
+register_json_backend("json", json.dumps, json.loads)
+register_json_backend("orjson", _dumps_orjson, _loads_orjson)
+register_json_backend("ujson", _dumps_ujson, _loads_ujson)
+register_json_backend("simdjson", json.dumps, _loads_simdjson)
+
+
 def deserialize_orjson(obj):
     import orjson
     return orjson.loads(obj)
@@ -42,6 +132,21 @@ def serialize_pickle(obj):
 def deserialize_pickle(data):
     return pickle.loads(data)
 
+PICKLE_OOB_MAGIC = b"HSP\x05"
+
+def serialize_pickle_oob(obj, parts=False):
+    # protocol 5 hands large contiguous buffers (numpy, pandas, PickleBuffer) to the
+    # callback instead of copying them into the pickle stream
+    buffers = []
+    stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    pack = frame_parts if parts else pack_frame
+    return pack(PICKLE_OOB_MAGIC, {}, [stream, *(buffer.raw() for buffer in buffers)])
+
+def deserialize_pickle_oob(data):
+    # objects are rebuilt over views of `data` (e.g. an mmap), without copying
+    _, buffers = unpack_frame(data, PICKLE_OOB_MAGIC)
+    return pickle.loads(buffers[0], buffers=buffers[1:])
+
 
 
 def serialize_jsonpickle(obj):
@@ -1,11 +1,25 @@
 from . import *
 import functools
 
+# serializers whose deserializer reads straight from a buffer (e.g. an lmdb memoryview)
+BUFFER_SERIALIZERS = {"pickle"}
+# serializers whose results may be views into the data they were read from; such
+# data must outlive them, as files mapped into memory do but transaction buffers don't
+ZERO_COPY_SERIALIZERS = {"hashstash-binary", "pickle5-oob", "auto"}
+# serializers whose output depends on the JSON backend unless asked to be canonical
+CANONICAL_SERIALIZERS = {"hashstash", "auto"}
+# serializers that can hand over their output in parts (e.g. views of an object's
+# buffers), which are then encoded and written without ever being joined
+PARTS_SERIALIZERS = {"hashstash-binary", "pickle5-oob", "auto"}
+
 def get_serializer(serializer: SERIALIZER_TYPES = DEFAULT_SERIALIZER):
     serializer_dict = {
         "hashstash": serialize_custom,
+        "hashstash-binary": serialize_custom_binary,
         "jsonpickle": serialize_jsonpickle,
         "pickle": serialize_pickle,
+        "pickle5-oob": serialize_pickle_oob,
+        "auto": serialize_auto,
     }
     
     return serializer_dict.get(serializer)
@@ -13,31 +27,60 @@ def get_serializer(serializer: SERIALIZER_TYPES = DEFAULT_SERIALIZER):
 def get_deserializer(serializer: SERIALIZER_TYPES = DEFAULT_SERIALIZER):
     deserializer_dict = {
         "hashstash": deserialize_custom,
+        "hashstash-binary": deserialize_custom_binary,
         "jsonpickle": deserialize_jsonpickle,
         "pickle": deserialize_pickle,
+        "pickle5-oob": deserialize_pickle_oob,
+        "auto": deserialize_auto,
     }
     
     return deserializer_dict.get(serializer)
 
 @log.debug
-def serialize(obj, serializer: SERIALIZER_TYPES = None, as_string=False):
+def serialize(obj, serializer: SERIALIZER_TYPES = None, as_string=False, canonical=False):
+    """
+    Serialize `obj`. With canonical=True the output is the same whichever JSON
+    backend is active, as stash keys must be.
+    """
     if serializer is None:
         serializer = Config().serializer
     serializer_func = get_serializer(serializer)
     if serializer_func is None:
         raise ValueError(f"Invalid serializer: {serializer}. Choose one of: {', '.join(repr(x) for x in SERIALIZERS)}")
     
-    log.debug(f"Attempting to serialize with {serializer_func.__name__}")
     try:
-        data = serializer_func(obj)
+        if canonical and serializer in CANONICAL_SERIALIZERS:
+            data = serializer_func(obj, canonical=True)
+        else:
+            data = serializer_func(obj)
         assert isinstance(data, (bytes, str)), "data should be bytes or string"
-        log.debug(f"Serialized data type: {type(data)}")
-        log.debug(f"Serialized data: {data}")
         return data.decode() if isinstance(data, bytes) and as_string else data
     except Exception as e:
         log.error(f"Serialization failed with serializer {serializer}:\n{e}")
         raise e
 
+def serialize_parts(obj, serializer: SERIALIZER_TYPES = None) -> list:
+    """serialize(obj) as a list of bytes-like parts, in order."""
+    if serializer is None:
+        serializer = Config().serializer
+    if serializer in PARTS_SERIALIZERS:
+        return get_serializer(serializer)(obj, parts=True)
+    data = serialize(obj, serializer)
+    return [data.encode() if isinstance(data, str) else data]
+
+def deserialize_range(read, serializer: SERIALIZER_TYPES = None, start=0, stop=None):
+    """
+    value[start:stop] of the value serialized in the bytes that read(start, stop)
+    returns, if it can be had without reading the rest: so far, an array (sliced
+    along its first axis) or bytes stored out of band in a hashstash-binary frame.
+    Otherwise None.
+    """
+    if serializer is None:
+        serializer = Config().serializer
+    if serializer in {"hashstash-binary", "auto"} and bytes(read(0, len(BINARY_MAGIC))) == BINARY_MAGIC:
+        return deserialize_custom_binary_range(read, start, stop)
+    return None
+
 @log.debug
 def deserialize(data, serializer: SERIALIZER_TYPES = None):
     if serializer is None:
@@ -46,10 +89,12 @@ def deserialize(data, serializer: SERIALIZER_TYPES = None):
     if deserializer_func is None:
         raise ValueError(f"Invalid deserializer: {serializer}")
     
-    log.debug(f"Attempting to deserialize with {deserializer_func.__name__}")
+    if isinstance(data, memoryview) and serializer not in BUFFER_SERIALIZERS:
+        data = bytes(data)
+    elif isinstance(data, bytearray) and serializer not in BUFFER_SERIALIZERS | ZERO_COPY_SERIALIZERS:
+        data = bytes(data)
     try:
         odata = deserializer_func(data)
-        log.trace(f"Deserialized with {deserializer_func.__name__}")
         return odata
     except Exception as e:
         log.warning(f"Deserialization failed with {deserializer_func.__name__}: {str(e)}")
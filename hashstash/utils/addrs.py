@@ -91,10 +91,27 @@ def get_function_src(func):
         return ""
 
     
+def _import_from_loaded_module(parts):
+    # fast path: resolve attributes from the longest already-imported module prefix,
+    # sparing import_module calls that fail on every class or function name
+    for i in range(len(parts), 0, -1):
+        obj = sys.modules.get('.'.join(parts[:i]))
+        if obj is not None:
+            try:
+                for part in parts[i:]:
+                    obj = getattr(obj, part)
+            except AttributeError:
+                return None
+            return obj
+    return None
+
 def flexible_import(obj_or_path):
     from .logs import log
     if isinstance(obj_or_path, str):
         parts = obj_or_path.split('.')
+        obj = _import_from_loaded_module(parts)
+        if obj is not None:
+            return obj
         current = ''
         obj = None
 
@@ -287,7 +287,7 @@ class MetaDataFrame:
         serialized_df = buffer.getvalue()
         return stuff(
             {
-                "data": b64encode(serialized_df).decode(),
+                "data": serialized_df,
                 "df_engine": self.df_engine,
                 "io_engine": io_engine,
             }
@@ -309,7 +309,9 @@ class MetaDataFrame:
         from ..serializers import unstuff
 
         unstuffed_data = unstuff(stuffed_data)
-        serialized_df_b = b64decode(unstuffed_data["data"].encode())
+        serialized_df_b = unstuffed_data["data"]
+        if isinstance(serialized_df_b, str):  # stashed before bytes were stuffed as such
+            serialized_df_b = b64decode(serialized_df_b.encode())
         io_engine = unstuffed_data["io_engine"]
         df_engine = unstuffed_data["df_engine"]
         buffer = io.BytesIO(serialized_df_b)
@@ -2,6 +2,7 @@ from . import *
 import zlib
 import base64
 import hashlib
+import struct
 
 
 @log.debug
@@ -31,12 +32,180 @@ def _decode(data_b, b64=DEFAULT_B64, compress=DEFAULT_COMPRESS):
         data_b = decode_compressed(data_b, compress)
     return data_b
 
-def encode_compressed(data, compress_type=DEFAULT_COMPRESS):
+_CODEC_HEADERS = {codec: CODEC_MAGIC + bytes([i]) for codec, i in CODEC_IDS.items()}
+_CODEC_NAMES = {i: codec for codec, i in CODEC_IDS.items()}
+CODEC_HEADER_SIZE = len(CODEC_MAGIC) + 1
+
+@log.debug
+def encode_tagged(data: Union[str, bytes], b64=DEFAULT_B64, compress=DEFAULT_COMPRESS, as_string=False, min_size=DEFAULT_COMPRESS_MIN_SIZE, dictionary=None):
+    """
+    Like encode(), but compressed data is prefixed with a header naming its codec;
+    data under `min_size` bytes, or that compression wouldn't shrink, is left as is.
+    With compress="zstd", `dictionary` is an optional zstandard.ZstdCompressionDict.
+    """
+    data_b = data.encode() if isinstance(data, str) else data
+    codec = get_compresser(compress)
+    if codec != RAW_NO_COMPRESS and len(data_b) >= min_size:
+        compressed = encode_compressed(data_b, codec, dictionary=dictionary)
+        if len(compressed) + CODEC_HEADER_SIZE < len(data_b):
+            data_b = _CODEC_HEADERS[codec] + compressed
+    return _encode(data_b, b64=b64 or as_string, compress=False, as_string=as_string)
+
+@log.debug
+def decode_tagged(data, b64=DEFAULT_B64, as_string=False, get_dictionary=None):
+    """
+    Decode data from encode_tagged(), whichever codec it was written with.
+    get_dictionary(dict_id) returns the zstd dictionary a value names, if any.
+    """
+    data_b = data.encode() if isinstance(data, str) else data
+    if b64:
+        data_b = decode_b64(data_b)
+    if is_chunked(data_b):
+        data_b = decode_chunked(data_b, get_dictionary=get_dictionary)
+        return data_b.decode('utf-8') if as_string else data_b
+    codec = get_codec_of(data_b)
+    if codec != RAW_NO_COMPRESS:
+        data_b = decode_compressed(memoryview(data_b)[CODEC_HEADER_SIZE:], codec, get_dictionary=get_dictionary)
+    return data_b.decode('utf-8') if as_string else data_b
+
+def get_codec_of(data_b) -> str:
+    """Codec named by the header of encode_tagged() or iter_encode_chunked() output (before b64)."""
+    view = memoryview(data_b)
+    if is_chunked(view):
+        return _CODEC_NAMES.get(view[len(CHUNKED_MAGIC)], RAW_NO_COMPRESS)
+    if view[: len(CODEC_MAGIC)] != CODEC_MAGIC:
+        return RAW_NO_COMPRESS
+    try:
+        return _CODEC_NAMES[view[len(CODEC_MAGIC)]]
+    except (KeyError, IndexError):
+        raise ValueError(f"Unknown codec in header: {bytes(view[:CODEC_HEADER_SIZE])!r}")
+
+## Chunked values
+# CHUNKED_MAGIC and a codec id, then each chunk compressed on its own (or left raw
+# if compression wouldn't shrink it), then an index of (raw size, stored size) per
+# chunk, the chunk count and CHUNKED_MAGIC again. The index comes last, so chunks
+# are written as soon as they're compressed; readers find it from the end.
+
+_CHUNK_INDEX = struct.Struct("<QQ")
+_CHUNKED_TRAILER = struct.Struct("<I4s")
+
+def iter_chunks(parts, chunk_size=CODEC_CHUNK_SIZE):
+    """Recut buffers into chunk_size pieces; pieces of large buffers are views, not copies."""
+    pending = bytearray()
+    for part in parts:
+        view = memoryview(part).cast("B")
+        if pending:
+            take = chunk_size - len(pending)
+            pending += view[:take]
+            view = view[take:]
+            if len(pending) < chunk_size:
+                continue
+            yield pending
+            pending = bytearray()
+        while len(view) >= chunk_size:
+            yield view[:chunk_size]
+            view = view[chunk_size:]
+        pending += view
+    if pending:
+        yield pending
+
+def iter_encode_chunked(parts, compress=DEFAULT_COMPRESS, chunk_size=CODEC_CHUNK_SIZE, dictionary=None):
+    """
+    Encode the concatenation of the buffers in `parts` as a chunked value, yielding
+    it piece by piece, so only one chunk is compressed in memory at a time.
+    """
+    codec = get_compresser(compress)
+    yield CHUNKED_MAGIC + bytes([CODEC_IDS.get(codec, 0)])
+    index = []
+    for chunk in iter_chunks(parts, chunk_size):
+        stored = encode_compressed(chunk, codec, dictionary=dictionary)
+        if len(stored) >= len(chunk):
+            stored = chunk
+        index.append(_CHUNK_INDEX.pack(len(chunk), len(stored)))
+        yield stored
+    yield b"".join(index) + _CHUNKED_TRAILER.pack(len(index), CHUNKED_MAGIC)
+
+def is_chunked(data) -> bool:
+    return memoryview(data)[: len(CHUNKED_MAGIC)] == CHUNKED_MAGIC
+
+def _read_chunked_index(view):
+    # -> codec, [(raw offset, raw size, offset, stored size), ...]
+    num_chunks, magic = _CHUNKED_TRAILER.unpack_from(view, len(view) - _CHUNKED_TRAILER.size)
+    if magic != CHUNKED_MAGIC:
+        raise ValueError("Chunked value has no index at its end; was it cut short?")
+    index_stop = len(view) - _CHUNKED_TRAILER.size
+    index_start = index_stop - num_chunks * _CHUNK_INDEX.size
+    chunks, raw_offset, offset = [], 0, len(CHUNKED_MAGIC) + 1
+    for raw_size, stored_size in _CHUNK_INDEX.iter_unpack(view[index_start:index_stop]):
+        chunks.append((raw_offset, raw_size, offset, stored_size))
+        raw_offset += raw_size
+        offset += stored_size
+    return _CODEC_NAMES.get(view[len(CHUNKED_MAGIC)], RAW_NO_COMPRESS), chunks
+
+def iter_decode_chunked(data, start=0, stop=None, get_dictionary=None):
+    """Yield bytes start:stop of a chunked value, decompressing only the chunks they fall in."""
+    view = memoryview(data)
+    codec, chunks = _read_chunked_index(view)
+    size = chunks[-1][0] + chunks[-1][1] if chunks else 0
+    start, stop, _ = slice(start, stop).indices(size)
+    for raw_offset, raw_size, offset, stored_size in chunks:
+        if raw_offset + raw_size <= start:
+            continue
+        if raw_offset >= stop:
+            break
+        chunk = view[offset : offset + stored_size]
+        if stored_size != raw_size:
+            chunk = memoryview(decode_compressed(chunk, codec, get_dictionary=get_dictionary))
+        yield chunk[max(start - raw_offset, 0) : stop - raw_offset]
+
+def decode_chunked(data, start=0, stop=None, get_dictionary=None) -> bytearray:
+    # filled in place, so only one decompressed chunk is held besides the result
+    out = bytearray()
+    for piece in iter_decode_chunked(data, start, stop, get_dictionary=get_dictionary):
+        out += piece
+    return out
+
+def join_pieces(pieces):
+    """A value encoded as one string or buffer, or as an iterable of pieces, as one."""
+    if isinstance(pieces, (str, bytes, bytearray, memoryview)):
+        return pieces
+    return b"".join(pieces)
+
+# zstd (de)compressors aren't thread-safe, so each thread keeps its own, per dictionary
+_zstd_local = threading.local()
+
+def _zstd_compressor(dictionary=None):
+    compressors = _zstd_local.__dict__.setdefault('compressors', {})
+    dict_id = dictionary.dict_id() if dictionary is not None else 0
+    try:
+        return compressors[dict_id]
+    except KeyError:
+        import zstandard
+        compressor = compressors[dict_id] = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+        return compressor
+
+def _zstd_decompress(data, get_dictionary=None):
+    import zstandard
+    decompressors = _zstd_local.__dict__.setdefault('decompressors', {})
+    # a frame names the dictionary it was compressed with
+    dict_id = zstandard.get_frame_parameters(data).dict_id
+    try:
+        decompressor = decompressors[dict_id]
+    except KeyError:
+        if dict_id and get_dictionary is None:
+            raise ValueError(f"zstd data needs dictionary {dict_id}")
+        dictionary = get_dictionary(dict_id) if dict_id else None
+        decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+    return decompressor.decompress(data)
+
+def encode_compressed(data, compress_type=DEFAULT_COMPRESS, dictionary=None):
     compress_type = get_compresser(compress_type)
     if compress_type == RAW_NO_COMPRESS:
         return data
     try:
-        if compress_type == 'zlib':
+        if compress_type == 'zstd':
+            return _zstd_compressor(dictionary).compress(data)
+        elif compress_type == 'zlib':
             return zlib.compress(data)
         elif compress_type == 'blosc':
             import blosc
@@ -56,12 +225,14 @@ def encode_compressed(data, compress_type=DEFAULT_COMPRESS):
         log.error(f"Compression error: {e}")
         return data
 
-def decode_compressed(data, compress_type=DEFAULT_COMPRESS):
+def decode_compressed(data, compress_type=DEFAULT_COMPRESS, get_dictionary=None):
     compress_type = get_compresser(compress_type)
     if compress_type == RAW_NO_COMPRESS:
         return data
     try:
-        if compress_type == 'zlib':
+        if compress_type == 'zstd':
+            return _zstd_decompress(data, get_dictionary)
+        elif compress_type == 'zlib':
             return zlib.decompress(data)
         elif compress_type == 'blosc':
             import blosc
@@ -101,3 +272,104 @@ def encode_hash(data_b):
         data_b = data_b.encode()
     return hashlib.md5(data_b).hexdigest()
 
+
+
+## Key fingerprints
+# A canonical digest of a key computed by walking it directly, rather than running
+# the full serializer + encoder: dicts and sets hash independently of their order,
+# lists and tuples hash alike, and ndarrays hash their raw buffer.
+
+FINGERPRINT_SIZE = 16
+FINGERPRINT_CACHE_SIZE = 100_000
+_fingerprint_cache = {}
+
+
+def fingerprint(obj) -> str:
+    """Fixed-size hex digest identifying `obj` as a stash key."""
+    cacheable = type(obj) in {str, bytes, int, float}
+    if cacheable:
+        # keyed by type too, since 1 == 1.0 == True
+        digest = _fingerprint_cache.get((type(obj), obj))
+        if digest is not None:
+            return digest
+    hasher = hashlib.blake2b(digest_size=FINGERPRINT_SIZE)
+    _update_fingerprint(hasher, obj)
+    digest = hasher.hexdigest()
+    if cacheable:
+        if len(_fingerprint_cache) >= FINGERPRINT_CACHE_SIZE:
+            _fingerprint_cache.clear()
+        _fingerprint_cache[(type(obj), obj)] = digest
+    return digest
+
+
+def _update_fingerprint(hasher, obj):
+    objtype = type(obj)
+    if obj is None:
+        hasher.update(b"N")
+    elif objtype is bool:
+        hasher.update(b"T" if obj else b"F")
+    elif objtype is str:
+        data = obj.encode()
+        hasher.update(b"s%d:" % len(data))
+        hasher.update(data)
+    elif objtype is int:
+        hasher.update(b"i%d;" % obj)
+    elif objtype is float:
+        hasher.update(b"f" + repr(obj).encode() + b";")
+    elif objtype in {bytes, bytearray}:
+        hasher.update(b"b%d:" % len(obj))
+        hasher.update(obj)
+    elif objtype in {tuple, list}:
+        hasher.update(b"l%d:" % len(obj))
+        # homogeneous runs of numbers hash as one packed buffer
+        packed = _pack_numbers(obj) if len(obj) > 8 else None
+        if packed is not None:
+            hasher.update(packed)
+        else:
+            for item in obj:
+                _update_fingerprint(hasher, item)
+    elif objtype is dict:
+        hasher.update(b"d%d:" % len(obj))
+        for digest in sorted(fingerprint((k, v)) for k, v in obj.items()):
+            hasher.update(digest.encode())
+    elif objtype in {set, frozenset}:
+        hasher.update(b"S%d:" % len(obj))
+        for digest in sorted(fingerprint(item) for item in obj):
+            hasher.update(digest.encode())
+    elif _is_buffer_array(obj):
+        import numpy as np
+
+        arr = np.ascontiguousarray(obj)
+        hasher.update(b"a" + f"{arr.dtype.str}{arr.shape}".encode() + b":")
+        hasher.update(memoryview(arr).cast("B"))
+    else:
+        from ..serializers.custom import serialize_custom
+
+        try:
+            data = serialize_custom(obj, canonical=True)
+        except Exception:
+            data = pickle.dumps(obj)
+        data = data.encode() if isinstance(data, str) else data
+        hasher.update(b"o%d:" % len(data))
+        hasher.update(data)
+
+
+def _pack_numbers(seq):
+    from array import array
+
+    first = type(seq[0])
+    if first not in {int, float} or any(type(x) is not first for x in seq):
+        return None
+    try:
+        return b"q" + array("q", seq).tobytes() if first is int else b"d" + array("d", seq).tobytes()
+    except OverflowError:
+        return None
+
+
+def _is_buffer_array(obj):
+    objtype = type(obj)
+    return (
+        objtype.__name__ == "ndarray"
+        and objtype.__module__ == "numpy"
+        and not obj.dtype.hasobject
+    )
@@ -1,4 +1,5 @@
 from . import *
+import weakref
 
 
 ## Logging setup
@@ -90,39 +91,154 @@ current_depth = 0
 indenter = '    '
 last_log_time = None
 
+
+## Tracing
+# Using a log method as a decorator (`@log.debug`) only registers the function
+# for tracing and returns it unchanged, so hot paths pay nothing for it in normal
+# operation. enable_tracing() swaps every registered function for a timing
+# wrapper that emits structured records; disable_tracing() swaps them back.
+
+TRACE_ENV_VAR = 'HASHSTASH_TRACE'
+_tracing = os.environ.get(TRACE_ENV_VAR, '').lower() not in {'', '0', 'false', 'no'}
+# weak, so closures decorated on every call don't pile up here
+_traced_funcs = weakref.WeakKeyDictionary()  # func -> level
+_trace_wrappers = {}     # id(func) -> (func, wrapper), only while tracing
+_trace_sinks = []
+_trace_state = threading.local()
+
+
+def tracing_enabled():
+    return _tracing
+
+
+def log_trace_record(record):
+    """Default sink: one indented line per call, innermost calls first."""
+    if logger.level > record['level']:
+        return
+    error = f"  !!! {record['error']}" if record['error'] else ''
+    logger.log(
+        record['level'],
+        f"{indenter * (record['depth'] - 1)}{record['func']}()  [{record['seconds'] * 1000:.3f}ms]{error}",
+    )
+
+
+def emit_trace_record(record):
+    if not _trace_sinks:
+        return log_trace_record(record)
+    for sink in _trace_sinks:
+        sink(record)
+
+
+def make_trace_wrapper(func, level=logging.DEBUG):
+    addr = f'{func.__module__}.{func.__qualname__}'
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        depth = _trace_state.depth = getattr(_trace_state, 'depth', 0) + 1
+        error = None
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            _trace_state.depth = depth - 1
+            emit_trace_record(
+                {'func': addr, 'depth': depth, 'seconds': seconds, 'error': error, 'level': level}
+            )
+
+    return wrapper
+
+
+def register_traced(func, level=logging.DEBUG):
+    try:
+        _traced_funcs[func] = level
+    except TypeError:
+        return func  # not weak-referenceable, so not traceable
+    if not _tracing:
+        return func
+    if id(func) not in _trace_wrappers:
+        _trace_wrappers[id(func)] = (func, make_trace_wrapper(func, level))
+    return _trace_wrappers[id(func)][1]
+
+
+def _swap_registered(replacements):
+    """Replace functions by id wherever hashstash modules and classes hold them."""
+    def swap(member):
+        if isinstance(member, (staticmethod, classmethod)):
+            new = replacements.get(id(member.__func__))
+            return type(member)(new) if new is not None else None
+        return replacements.get(id(member))
+
+    seen_classes = set()
+    for modname, module in list(sys.modules.items()):
+        if module is None or not (modname == 'hashstash' or modname.startswith('hashstash.')):
+            continue
+        namespace = vars(module)
+        for name, value in list(namespace.items()):
+            new = swap(value)
+            if new is not None:
+                namespace[name] = new
+            elif (
+                isinstance(value, type)
+                and id(value) not in seen_classes
+                and getattr(value, '__module__', '').startswith('hashstash')
+            ):
+                seen_classes.add(id(value))
+                for attr, member in list(vars(value).items()):
+                    new = swap(member)
+                    if new is not None:
+                        setattr(value, attr, new)
+
+
+def enable_tracing():
+    global _tracing
+    if _tracing:
+        return
+    for func, level in list(_traced_funcs.items()):
+        if id(func) not in _trace_wrappers:
+            _trace_wrappers[id(func)] = (func, make_trace_wrapper(func, level))
+    _swap_registered({key: wrapper for key, (_, wrapper) in _trace_wrappers.items()})
+    _tracing = True
+
+
+def disable_tracing():
+    global _tracing
+    if not _tracing:
+        return
+    _swap_registered({id(wrapper): func for func, wrapper in _trace_wrappers.values()})
+    _trace_wrappers.clear()
+    _tracing = False
+
+
+@contextmanager
+def tracing(sink=None):
+    """
+    Trace calls to registered functions within the block.
+
+    Yields a list that collects one record per call, as dicts with keys
+    func, depth, seconds, error and level. Pass `sink` to handle records yourself.
+    """
+    records = []
+    sink = records.append if sink is None else sink
+    was_tracing = _tracing
+    _trace_sinks.append(sink)
+    enable_tracing()
+    try:
+        yield records
+    finally:
+        _trace_sinks.remove(sink)
+        if not was_tracing:
+            disable_tracing()
+
+
 def log_wrapper(_func=None, level=logging.INFO):
-    """Decorator to automatically log function calls with module and function name."""
+    """Decorator registering a function for call tracing (see enable_tracing)."""
     def decorator(func):
+        return register_traced(func, level=level)
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            global current_depth, last_log_time
-            if level>=logger.level:
-                funcname,params_str = get_function_call_str_l(func,*args,**kwargs)
-                log_func(f'{funcname}(){"  <<<  "+params_str if params_str else ""}', level=level, incl_frame=False)
-                current_depth += 1
-            
-            try:
-                result = func(*args, **kwargs)
-            except Exception as e:
-                log.error(f"Error in {func.__name__}: {str(e)}")
-                current_depth = 0
-                raise e
-
-            if level>=logger.level:
-                current_depth -= 1
-                # if result is not None: 
-                if result is not None:
-                    resx=repr(result).replace("\n", " ")
-                    log_func(f'{funcname}()  >>>  {resx}', level=level, incl_frame=False)
-                # log_func(f'>>> {str(result)[:100]}', level=level)
-
-                if not current_depth:
-                    last_log_time = None
-
-            return result
-        return wrapper
-    
     if _func is None:
         return decorator
     return decorator(_func)
@@ -31,6 +31,38 @@ def ensure_dir(path):
     return os.makedirs(path, exist_ok=True)
 
 
+def approx_nbytes(obj):
+    """Rough in-memory size of a string, buffer, array, sparse matrix or dataframe; 0 for anything else."""
+    if isinstance(obj, (str, bytes, bytearray, memoryview)):
+        return len(obj)
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    nnz = getattr(obj, "nnz", None)
+    if isinstance(nnz, int):
+        # scipy.sparse: each stored value plus its index
+        return nnz * (obj.dtype.itemsize + 8)
+    memory_usage = getattr(obj, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            return int(memory_usage(deep=False).sum())
+        except Exception:
+            pass
+    return 0
+
+
+def iter_pairs(items):
+    return items.items() if hasattr(items, "items") else items
+
+
+def batched(iterable, n):
+    it = iter(iterable)
+    batch = list(itertools.islice(it, n))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(it, n))
+
+
 def reset_index_misc(df, _index=False):
     import pandas as pd
 
@@ -65,6 +97,68 @@ class ReusableGenerator:
         return self.func(*self.args, **self.kwargs)
 
 
+LRUCacheInfo = namedtuple("LRUCacheInfo", ["hits", "misses", "maxsize", "currsize", "maxbytes", "currbytes"])
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by entry count and by the approximate bytes given per entry."""
+
+    def __init__(self, maxsize=1024, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.data = OrderedDict()  # key -> (value, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value, _ = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, nbytes=0):
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return self.pop(key)
+        with self.lock:
+            old = self.data.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self.data[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.data and (
+                len(self.data) > self.maxsize
+                or (self.maxbytes is not None and self.nbytes > self.maxbytes)
+            ):
+                _, (_, evicted_nbytes) = self.data.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+
+    def pop(self, key):
+        with self.lock:
+            old = self.data.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.nbytes = 0
+
+    def info(self):
+        return LRUCacheInfo(
+            self.hits, self.misses, self.maxsize, len(self.data), self.maxbytes, self.nbytes
+        )
+
+    def __len__(self):
+        return len(self.data)
+
+
 def rmtreefn(dir_path):
     if not os.path.exists(dir_path):
         return
@@ -28,7 +28,7 @@ def get_global_executor(num_proc):
     pid = os.getpid()
     with executor_lock:
         if pid not in executors:
-            executors[pid] = ProcessPoolExecutor(max_workers=num_proc)
+            executors[pid] = ProcessPoolExecutor(max_workers=num_proc, mp_context=get_mp_context())
         return executors[pid]
 
 def shutdown_global_executors():
@@ -99,7 +99,7 @@ class StashMap(UserList):
             self.progress_bar = progress_bar(total=self.total, desc=self.desc)
 
         self._executor = get_global_executor(num_proc)
-        self._executor_lock = mp.Lock() if num_proc > 1 else None
+        self._executor_lock = get_mp_context().Lock() if num_proc > 1 else None
 
         if _results is None:
             self._results = [
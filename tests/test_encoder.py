@@ -3,6 +3,7 @@ from hashstash.utils.encodings import encode, decode, encode_hash, RAW_NO_COMPRE
 import json
 import base64
 import zlib
+import random
 
 @pytest.fixture
 def default_params():
@@ -66,4 +67,60 @@ def test_different_combinations():
         decoded = json.loads(decode(encoded, **decparams).decode('utf-8'))
         assert decoded == json.loads(data), f"Failed with params: {params}"
 
-# Add more tests as needed
\ No newline at end of file
+def test_tagged_codecs():
+    from hashstash.utils.encodings import encode_tagged, decode_tagged, get_codec_of, CODEC_HEADER_SIZE
+    data = json.dumps({"test": "data" * 1000}).encode()
+    for compress in [RAW_NO_COMPRESS, "zlib", "gzip", "bz2"]:
+        for b64 in [True, False]:
+            encoded = encode_tagged(data, b64=b64, compress=compress)
+            assert bytes(decode_tagged(encoded, b64=b64)) == data
+        assert get_codec_of(encode_tagged(data, b64=False, compress=compress)) == compress
+    assert decode_tagged(encode_tagged(data, compress="zlib", as_string=True), as_string=True) == data.decode()
+    # small or incompressible data is left as is, without a header
+    assert encode_tagged(b"[1, 2]", b64=False, compress="zlib") == b"[1, 2]"
+    noise = random.Random(0).randbytes(512)
+    assert encode_tagged(noise, b64=False, compress="zlib", min_size=0) == noise
+    assert len(encode_tagged(data, b64=False, compress="zlib", min_size=0)) < len(data) // 10 + CODEC_HEADER_SIZE
+    # untagged data (as written before headers) decodes as uncompressed
+    assert decode_tagged(encode(data, b64=True, compress=False)) == data
+
+def test_chunked_codec():
+    from hashstash.utils.encodings import iter_encode_chunked, decode_chunked, decode_tagged, get_codec_of
+    noise = random.Random(0).randbytes(5000)
+    data = noise + json.dumps({"test": "data" * 10_000}).encode()
+    parts = [data[:10], memoryview(data)[10:30_000], data[30_000:]]
+    for compress in [RAW_NO_COMPRESS, "zlib", "gzip"]:
+        pieces = list(iter_encode_chunked(parts, compress=compress, chunk_size=4096))
+        assert max(len(piece) for piece in pieces[:-1]) <= 4096
+        encoded = b"".join(pieces)
+        assert get_codec_of(encoded) == compress
+        assert decode_tagged(encoded, b64=False) == data
+        for start, stop in [(0, None), (100, 200), (4000, 9000), (-10, None), (50, 10)]:
+            assert decode_chunked(encoded, start, stop) == data[start:stop]
+
+# Add more tests as needed
+def test_fingerprint():
+    import numpy as np
+    from hashstash.utils.encodings import fingerprint
+    assert len(fingerprint("key")) == 32
+    assert fingerprint("key") == fingerprint("key")
+    assert len({fingerprint(x) for x in [1, 1.0, True, "1", b"1", None]}) == 6
+    assert fingerprint({"a": 1, "b": (2, 3)}) == fingerprint({"b": [2, 3], "a": 1})
+    assert fingerprint(((1, 2), {})) != fingerprint(((1, 2), {"x": 1}))
+    arr = np.arange(12).reshape(3, 4)
+    assert fingerprint(arr) == fingerprint(arr.copy())
+    assert fingerprint(arr) != fingerprint(arr.reshape(4, 3))
+    assert fingerprint(arr.T) == fingerprint(np.ascontiguousarray(arr.T))
+    # other objects hash their canonical serialization, whatever the JSON backend
+    from fractions import Fraction
+    from hashstash.serializers.jsons import JSON_BACKENDS, get_json_backend_name, set_json_backend
+    active = get_json_backend_name()
+    try:
+        digests = set()
+        for backend in ["json", "orjson"]:
+            if backend in JSON_BACKENDS:
+                set_json_backend(backend)
+                digests.add(fingerprint({"x": Fraction(1, 3), "when": None}))
+        assert len(digests) == 1
+    finally:
+        set_json_backend(active)
@@ -46,6 +46,7 @@ class TestHashStash:
 
     def test_get_default(self, cache):
         assert cache.get("non_existent_key", "default") == "default"
+        assert cache._get(cache.encode_key("non_existent_key"), default="default") == "default"
 
     def test_clear(self, cache):
         cache["test_key1"] = "test_value1"
@@ -426,6 +427,36 @@ class TestHashStash:
         assert test_func.stash.get(func_key) == result
         assert test_func.stash.keys_l() == [func_key]
 
+    def test_stashed_generator_result(self, cache):
+        produced = []
+        cache.stream_chunk_size = 4
+
+        @cache.stashed_result
+        def tokens(n):
+            for i in range(n):
+                produced.append(i)
+                yield {"token": i}
+
+        tokens.stash.clear()
+        stream = tokens(10)
+        assert next(stream) == {"token": 0} and produced == [0]  # lazy
+        assert tokens.stash.get_func(10) is None  # set only once exhausted
+        assert list(stream) == [{"token": i} for i in range(1, 10)]
+        ref = tokens.stash._get_latest_stored(tokens.stash.encode_key(tokens.stash.new_function_key(10)))
+        assert (ref.num_chunks, ref.length) == (3, 10)
+
+        # replayed lazily from the stash, without calling the function again
+        replay = tokens(10)
+        assert list(replay) == [{"token": i} for i in range(10)] and len(produced) == 10
+
+        # abandoned streams leave nothing behind; rerunning replaces the old chunks
+        partial = tokens(3, _force=True)
+        next(partial)
+        partial.close()
+        assert len(tokens.stash.streams) == 3
+        assert list(tokens(10, _force=True)) == [{"token": i} for i in range(10)]
+        assert len(tokens.stash.streams) == 3
+
     def test_sub_function_results(self, cache):
         def test_func(x):
             return x * 2
@@ -481,6 +512,284 @@ class TestHashStash:
         result = cache.get_all("key1", all_results=True, with_metadata=False)
         assert result == ["value1", "value2"]
 
+    def test_append_mode_versions(self, cache):
+        cache.append_mode = True
+        for i in range(20):
+            cache["key1"] = i
+        assert cache.get("key1") == 19
+        assert cache.get_all("key1") == list(range(20))
+        assert cache.get_all("key1", all_results=False) == [19]
+        latest = cache.get_all("key1", with_metadata=True)[-1]
+        assert (latest["_version"], latest["_value"]) == (20, 19)
+        assert len(cache) == 1 and cache.keys_l() == ["key1"]
+
+    def test_append_mode_writes_one_version(self, cache):
+        if isinstance(cache, PairtreeHashStash):
+            pytest.skip("pairtree stores one file per version")
+        cache.append_mode = True
+        for i in range(20):
+            cache["key1"] = i
+        # the main record holds only the newest version, not the whole history
+        assert cache.decode_value(cache._get(cache.encode_key("key1"))) == [19]
+
+    def test_append_then_overwrite(self, cache):
+        cache["key1"] = "value0"
+        cache.set("key1", "value1", append=True)
+        assert cache.get_all("key1", all_results=True) == ["value0", "value1"]
+        cache["key1"] = "value2"
+        assert cache.get_all("key1", all_results=True) == ["value2"]
+        del cache["key1"]
+        cache.set("key1", "value3", append=True)
+        assert cache.get_all("key1", all_results=True) == ["value3"]
+
+        # plain writes never read the versions store; prune_versions reclaims what they leave
+        for i in range(3):
+            cache.set("key2", i, append=True)
+        def no_versions(*args):
+            raise AssertionError("read the versions store")
+        cache._get_version_counts = no_versions
+        cache["key2"] = "plain"
+        cache.set_many({"key1": "value4"})
+        del cache["key1"]
+        assert cache.get_all("key2") == ["plain"] and cache.get("key1") is None
+        del cache._get_version_counts
+        if not isinstance(cache, PairtreeHashStash):
+            assert cache.prune_versions() == 6  # each key's count and version records
+            assert cache.prune_versions() == 0
+        cache.set("key2", "appended", append=True)
+        assert cache.get_all("key2") == ["plain", "appended"]
+
+    def test_blob_dedup(self, cache):
+        import numpy as np
+        stash = cache.__class__(cache.root_dir, blob_min_size=1024)
+        table = np.arange(10_000, dtype=np.int64)
+        df = pd.DataFrame({"a": range(1000)})
+        stash["run1"] = {"inputs": table, "config": {"lookup": df}, "n": 1}
+        stash["run2"] = [table, (df, "small"), 2]
+        assert len(stash.blobs) == 2  # each large sub-object stored once
+        # values only hold references, so they stay small
+        assert len(stash._get(stash.encode_key("run1"))) < 1024
+        run1, run2 = stash["run1"], stash["run2"]
+        assert np.array_equal(run1["inputs"], table) and run1["config"]["lookup"].equals(df)
+        assert np.array_equal(run2[0], table) and run2[1][0].equals(df) and run2[1][1] == "small"
+
+        # unreferenced blobs are reclaimed, referenced ones kept
+        stash["run1"] = {"inputs": table[:10]}
+        assert stash.collect_blobs() == 0
+        del stash["run2"]
+        assert stash.collect_blobs() == 2 and len(stash.blobs) == 0
+        stash["run3"] = {"inputs": table}
+        assert np.array_equal(stash["run3"]["inputs"], table) and len(stash.blobs) == 1
+
+    def test_mixed_codecs(self, cache):
+        from hashstash.utils.encodings import get_codec_of
+        big = {"text": "hello world " * 500}
+        zlib_stash = cache.__class__(cache.root_dir, compress="zlib", b64=False)
+        zlib_stash["big"] = big
+        zlib_stash["small"] = [1, 2]
+        assert get_codec_of(zlib_stash._get(zlib_stash.encode_key("big"))) == "zlib"
+        # small values (and keys) stay uncompressed
+        assert get_codec_of(zlib_stash._get(zlib_stash.encode_key("small"))) == "raw"
+        assert zlib_stash.encode_key("big") == encode(serialize("big", zlib_stash.serializer, canonical=True), b64=False)
+
+        # the same stash under other codecs reads every value and writes its own
+        for compress in ["gzip", None]:
+            stash = cache.__class__(cache.root_dir, compress=compress, b64=False)
+            assert stash.path == zlib_stash.path
+            assert stash["big"] == big and stash["small"] == [1, 2]
+            stash[compress or "raw"] = big
+        assert zlib_stash["gzip"] == zlib_stash["raw"] == big
+
+    def test_compression_dictionary(self, cache):
+        pytest.importorskip("zstandard")
+        from hashstash.profilers import generate_json_result
+        rng = random.Random(0)
+        stash = cache.__class__(cache.root_dir, compress="zlib")
+        stash.set_many((i, generate_json_result(i, rng)) for i in range(600))
+        zlib_size = len(stash._get(stash.encode_key(0)))
+        dictionary = stash.train_compression_dictionary(sample=500, dict_size=16 * 1024)
+        assert stash.compress == "zstd"
+        stash[0] = generate_json_result(0, random.Random(1))
+        stash[1000] = generate_json_result(1000, rng)
+        assert len(stash._get(stash.encode_key(0))) < zlib_size
+
+        # a new instance finds the dictionary, and reads values from before and after it
+        reopened = cache.__class__(cache.root_dir, compress="zstd")
+        assert reopened.compression_dictionary.dict_id() == dictionary.dict_id()
+        assert reopened[0] == stash[0] and reopened[599]["id"] == 599 and reopened[1000]["id"] == 1000
+        assert len(reopened) == len(stash) == 601
+
+    def test_lru(self, cache):
+        stash = cache.__class__(cache.root_dir, lru_size=2)
+        assert stash.lru_info() is None or stash.lru_info().currsize == 0
+        stash["key1"] = {"a": 1}
+        stash["key2"] = 2
+        assert stash["key1"] == {"a": 1} and stash["key1"] == {"a": 1}
+        assert stash.get_many(["key1", "key2", "missing"]) == [{"a": 1}, 2, None]
+        info = stash.lru_info()
+        assert info.hits >= 2 and info.currsize == 2
+
+        # a hit must not decode again
+        stash.decode_value = None
+        assert stash["key1"] == {"a": 1}
+        del stash.decode_value
+
+        # values from a hit are the caller's to change
+        stash["key1"]["a"] = 2
+        stash.get_many(["key1"])[0]["b"] = 3
+        stash.get_all("key1")[-1]["c"] = 4
+        assert stash["key1"] == {"a": 1}
+
+        stash["key1"] = "new"
+        assert stash["key1"] == "new"
+        del stash["key1"]
+        assert stash.get("key1") is None
+        stash["key3"] = 3
+        stash.clear()
+        assert stash.lru_info().currsize == 0 and stash.get("key3") is None
+
+    def test_digest_keys(self, cache):
+        stash = cache.__class__(cache.root_dir, key_mode="digest").clear()
+        keys = ["key1", ("a", 1), {"b": [1, 2], "a": None}, "x" * 10_000]
+        for i, key in enumerate(keys):
+            stash[key] = i
+        assert stash[{"a": None, "b": [1, 2]}] == 2  # dict order doesn't matter
+        assert len({len(stash.encode_key(key)) for key in keys}) == 1
+        assert sorted(map(repr, stash.keys_l())) == sorted(map(repr, keys))
+        stash.set_many([("key2", 5), ("key1", 6)])
+        assert stash.get_many(["key1", "key2"]) == [6, 5]
+        del stash["key1"]
+        stash.delete_many([("a", 1)])
+        assert len(stash) == 3 and "key1" not in stash
+        assert stash.path != cache.path
+        stash.clear()
+
+    def test_migrate_from_b64(self, cache):
+        assert cache.b64 == bool(cache.string_keys or cache.string_values)
+        if cache.b64:
+            return
+        kwargs = dict(append_mode=True, blob_min_size=1024, compress="zlib")
+        old = cache.__class__(cache.root_dir, b64=True, **kwargs)
+        assert old.path != cache.path
+        old["a"] = 1
+        old["a"] = {"words": ["hello world"] * 500}
+        old[("b", 1)] = "x" * 2000
+        list(old.stream("s", range(5), chunk_size=2))
+        digest = cache.__class__(cache.root_dir, b64=True, key_mode="digest")
+        digest[("c", 2)] = [1, 2]
+        digest.close()
+        # and a default stash of earlier versions, lz4-compressed without a codec header
+        lz4 = cache.__class__(cache.root_dir, b64=True, legacy_codec="lz4")
+        legacy = lambda x: encode(lz4.serialize(x), b64=True, compress="lz4")
+        lz4._set(legacy("d"), legacy(4 if isinstance(cache, PairtreeHashStash) else [4]))
+        lz4.close()
+
+        stash = cache.__class__(cache.root_dir, **kwargs)
+        assert stash.migrate_from_b64(batch_size=2) == 4
+        assert stash["d"] == 4
+        assert not (os.path.exists(lz4.path_dirname) if cache.ensure_dir else len(lz4))
+        assert stash.get_all("a") == [1, {"words": ["hello world"] * 500}]
+        assert stash[("b", 1)] == "x" * 2000 and len(stash.blobs) == 1
+        assert list(stash["s"]) == list(range(5))
+        assert not os.path.exists(old.path_dirname)
+        # values keep their codec, only the b64 layer is gone
+        raw = bytes(stash._get(stash.encode_key("a")))
+        if not isinstance(stash, PairtreeHashStash):  # keeps versions as files
+            assert raw.startswith(VERSIONED_MAGIC.encode())
+            raw = raw[len(VERSIONED_MAGIC):]
+        assert raw[:4] == CODEC_MAGIC
+
+        stash = cache.__class__(cache.root_dir, key_mode="digest")
+        assert stash.migrate_from_b64(remove=False) == 1
+        assert stash.items_l() == [(("c", 2), [1, 2])] and len(digest.__class__(**digest.to_dict())) == 1
+        with pytest.raises(ValueError):
+            digest.migrate_from_b64()
+
+    def test_open_legacy_stash(self, cache):
+        if not cache.ensure_dir:
+            return
+        # as earlier versions wrote them: in a "<codec>+b64" folder, keys and lists of
+        # values serialized, compressed with the folder's codec (no header) and b64-encoded
+        root_dir = cache.root_dir + "_legacy"
+        unwrap = isinstance(cache, PairtreeHashStash)  # one value per file, not lists
+        records = {"lz4": {"a": [1], ("b", 1): [{"words": ["hello world"] * 50}], "c": [1, 2]}, "zlib": {"a": [3]}}
+        folders = []
+        for codec, items in records.items():
+            old = cache.__class__(root_dir, b64=True, legacy_codec=codec)
+            assert old.path_dirname.endswith(f".{codec}+b64")
+            # dumped by json.dumps with its default separators
+            legacy = lambda x: encode(json.dumps(json.loads(old.serialize(x))), b64=True, compress=codec)
+            old._set_many([(legacy(k), legacy(v[-1] if unwrap else v)) for k, v in items.items()])
+            old.close()
+            folders.append(old.path_dirname)
+        age = lambda: [os.utime(folder, (1000 + i, 1000 + i)) for i, folder in enumerate(folders)]
+
+        # read in place: the folder of the stash's compress, else the newest one
+        age()
+        assert cache.__class__(root_dir, compress="bz2")["a"] == 3
+        stash = cache.__class__(root_dir, compress="lz4")
+        assert stash.legacy_codec == "lz4" and len(stash) == 3 and stash["a"] == 1
+        assert stash[("b", 1)] == {"words": ["hello world"] * 50}
+        assert stash.get_all("c") == ([2] if unwrap else [1, 2])
+        stash["e"] = 5
+        assert cache.__class__(root_dir, compress="lz4")["e"] == 5
+        assert not os.path.exists(stash._get_path_dirname(False))
+
+        age()
+        assert len(stash._legacy_path_dirnames()) == 2
+        assert stash.migrate_legacy() == 5 and not stash._legacy_path_dirnames()
+        assert stash.legacy_codec is None and stash.path_dirname == stash._get_path_dirname(False)
+        assert len(stash) == 4 and stash["a"] == 3 and stash["e"] == 5
+        assert stash[("b", 1)] == {"words": ["hello world"] * 50}
+        # recompressed behind a codec header
+        assert bytes(stash._get(stash.encode_key(("b", 1))))[:4] == CODEC_MAGIC
+
+    def test_chunked_values(self, cache):
+        import numpy as np
+        table = np.arange(200_000, dtype=np.int64).reshape(2000, 100)
+        for compress in ["zlib", "raw"]:
+            stash = cache.__class__(
+                cache.root_dir,
+                serializer="hashstash-binary",
+                compress=compress,
+                codec_chunk_size=64 * 1024,
+                codec_chunk_min_size=1024**2,
+            ).clear()
+            stash["table"] = table
+            stash["small"] = [1, 2, 3, 4]
+            encoded = stash._get(stash.encode_key("table"))
+            if not stash.b64:
+                assert (bytes(memoryview(encoded)[:4]) == CHUNKED_MAGIC) == (compress != "raw")
+            assert np.array_equal(stash["table"], table) and stash["small"] == [1, 2, 3, 4]
+            # only the rows asked for are decoded
+            assert np.array_equal(stash.get_range("table", 10, 20), table[10:20])
+            assert np.array_equal(stash.get_range("table", -5), table[-5:])
+            # anything else is read whole and sliced
+            assert stash.get_range("small", 1, 3) == [2, 3]
+            assert stash.get_range("missing", 0, 1, default=[]) == []
+
+    def test_set_get_many(self, cache):
+        cache.set_many({f"key{i}": f"value{i}" for i in range(10)})
+        assert len(cache) == 10
+        assert cache.get_many(["key0", "key9", "missing"], default="d") == ["value0", "value9", "d"]
+        assert cache["key5"] == "value5"
+
+    def test_set_many_append_mode(self, cache):
+        cache.append_mode = True
+        cache["key1"] = "value1"
+        cache.set_many([("key1", "value2"), ("key2", "a"), ("key1", "value3")])
+        assert cache.get_all("key1") == ["value1", "value2", "value3"]
+        assert cache.get_many(["key1", "key2"]) == ["value3", "a"]
+
+    def test_has_many(self, cache):
+        cache["key1"] = "value1"
+        assert cache.has_many(["key1", "missing"]) == [True, False]
+
+    def test_delete_many(self, cache):
+        cache.set_many({"key1": 1, "key2": 2, "key3": 3})
+        cache.delete_many(["key1", "key3", "missing"])
+        assert cache.keys_l() == ["key2"]
+
     def test_get_default_value(self, cache):
         assert cache.get("non_existent_key", default="default_value") == "default_value"
 
@@ -560,7 +869,7 @@ class TestHashStashFactory:
         assert stash.name == DEFAULT_NAME
         assert stash.dbname == DEFAULT_DBNAME
         assert stash.compress == config.compress
-        assert stash.b64 == config.b64
+        assert stash.b64 == bool(stash.string_keys or stash.string_values)
         assert stash.serializer in get_working_serializers()
 
     def test_multiple_parameters(self):
@@ -652,5 +961,179 @@ def test_encode_path():
     cache = HashStash(engine='pairtree')
     assert os.path.isabs(cache.get_path_key('unencoded_key'))
 
+def _sqlite_write_keys(path, start, n):
+    stash = SqliteHashStash(path)
+    stash.set_many({f"key{i}": i for i in range(start, start + n)})
+    for i in range(start, start + n):
+        stash[f"single{i}"] = i
+
+def _sqlite_write_and_idle(path, written):
+    stash = SqliteHashStash(path, flush_interval=0.5)
+    stash["idle"] = 1
+    written.set()
+    time.sleep(5)
+
+def test_sqlite_batched_commits(tmp_path):
+    import sqlite3
+    stash = SqliteHashStash(str(tmp_path), flush_interval=60)
+    stash["key1"] = "value1"
+    assert stash["key1"] == "value1" and len(stash) == 1
+    with sqlite3.connect(stash.path) as other:
+        assert other.execute("SELECT COUNT(*) FROM stash").fetchone()[0] == 0
+        stash.flush()
+        assert other.execute("SELECT COUNT(*) FROM stash").fetchone()[0] == 1
+    stash.close()
+
+def test_sqlite_batched_commits_while_idle(tmp_path):
+    # a process with a batch open that writes nothing more still commits it on time
+    ctx = get_mp_context()
+    written = ctx.Event()
+    proc = ctx.Process(target=_sqlite_write_and_idle, args=(str(tmp_path), written))
+    proc.start()
+    try:
+        assert written.wait(30)
+        stash = SqliteHashStash(str(tmp_path), timeout=3)
+        stash["other"] = 2
+        assert stash.get_many(["idle", "other"]) == [1, 2]
+        assert proc.is_alive()
+    finally:
+        proc.terminate()
+        proc.join()
+
+def test_sqlite_multiprocess(tmp_path):
+    stash = SqliteHashStash(str(tmp_path))
+    stash["parent"] = 0
+    ctx = get_mp_context()
+    procs = [ctx.Process(target=_sqlite_write_keys, args=(str(tmp_path), i * 50, 50)) for i in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+        assert proc.exitcode == 0
+    assert len(stash) == 401
+    assert stash.get_many(["key0", "key199", "single150"]) == [0, 199, 150]
+
+def test_sqlite_imports_sqlitedict(tmp_path):
+    sqlitedict = pytest.importorskip("sqlitedict")
+    # as earlier versions wrote them: a sqlitedict table in the default "lz4+b64"
+    # folder, keys and lists of values dumped by json.dumps, lz4-compressed and
+    # b64-encoded
+    old = SqliteHashStash(str(tmp_path), b64=True, legacy_codec="lz4")
+    legacy = lambda x: encode(json.dumps(json.loads(old.serialize(x))), b64=True, compress="lz4")
+    os.makedirs(old.path_dirname)
+    with sqlitedict.SqliteDict(old.path, autocommit=True) as table:
+        table[legacy("key1")] = legacy(["value1"])
+        table[legacy(("key", 2))] = legacy([{"words": ["hello world"] * 50}])
+    stash = SqliteHashStash(str(tmp_path))
+    assert stash["key1"] == "value1" and stash[("key", 2)] == {"words": ["hello world"] * 50}
+    assert sorted(stash.keys_l(), key=str) == [("key", 2), "key1"]
+    assert stash.migrate_legacy() == 2 and stash["key1"] == "value1"
+    assert bytes(stash._get(stash.encode_key(("key", 2))))[:4] == CODEC_MAGIC
+
+def test_lmdb_grows_map_size(tmp_path):
+    stash = LMDBHashStash(str(tmp_path), map_size=64 * 1024)
+    stash.set_many({f"key{i}": os.urandom(5_000).hex() for i in range(50)})
+    assert len(stash) == 50 and stash.map_size > 64 * 1024
+    stash.close()
+
+def test_lmdb_instances_share_an_environment(tmp_path):
+    import gc
+    one, two = LMDBHashStash(str(tmp_path)), LMDBHashStash(str(tmp_path))
+    one["key1"] = 1
+    assert two["key1"] == 1 and one.get_db() is two.get_db()
+    del one
+    gc.collect()  # a collected instance leaves the environment open
+    two["key2"] = 2
+    two.close()
+    assert LMDBHashStash(str(tmp_path)).get_many(["key1", "key2"]) == [1, 2]
+
+@pytest.mark.parametrize("serializer", ["hashstash", "pickle"])
+def test_lmdb_buffers(tmp_path, serializer):
+    stash = LMDBHashStash(str(tmp_path), buffers=True, serializer=serializer, b64=False)
+    stash["key1"] = {"a": [1, 2, 3]}
+    assert stash["key1"] == {"a": [1, 2, 3]}
+    assert stash.items_l() == [("key1", {"a": [1, 2, 3]})]
+    stash.close()
+
+def test_lmdb_imports_legacy_layout(tmp_path):
+    import lmdb
+    stash = LMDBHashStash(str(tmp_path))
+    os.makedirs(stash.path_dirname, exist_ok=True)
+    encoded_key, encoded_value = stash.encode_key("key1"), stash.encode_value(["value1"])
+    with lmdb.open(stash.path) as env, env.begin(write=True) as txn:
+        txn.put(encode_hash(encoded_key).encode() + b".key", encoded_key)
+        txn.put(encode_hash(encoded_key).encode() + b".value", encoded_value)
+    assert len(stash) == 1 and stash.items_l() == [("key1", "value1")]
+    stash.close()
+
+def test_lru_cache_bounds():
+    lru = LRUCache(maxsize=3, maxbytes=100)
+    for i in range(4):
+        lru.set(i, i, nbytes=10)
+    assert lru.get(0) is None and lru.get(1) == 1
+    lru.set("big", "x", nbytes=90)  # evicts least recently used until under 100 bytes
+    assert lru.info().currbytes <= 100
+    assert lru.get(2) is None and lru.get(3) is None
+    assert lru.get(1) == 1 and lru.get("big") == "x"
+    lru.set("huge", "y", nbytes=101)  # never cached
+    assert lru.get("huge") is None
+
+def test_pairtree_manifest(tmp_path, monkeypatch):
+    stash = PairtreeHashStash(str(tmp_path))
+    stash.set_many({f"key{i}": i for i in range(10)})
+    stash["key0"] = "new"
+    del stash["key9"]
+    other = PairtreeHashStash(str(tmp_path))  # sees the same manifest
+    def no_walk(*args, **kwargs):
+        raise AssertionError("walked the tree")
+    monkeypatch.setattr(os, "walk", no_walk)
+    assert len(other) == 9 and "key3" in other and "key9" not in other
+    assert sorted(other.keys_l()) == [f"key{i}" for i in range(9)]
+    assert other["key0"] == "new"
+    monkeypatch.undo()
+
+    # rebuilt from the directory tree when the manifest is lost
+    os.remove(stash.manifest.path)
+    assert len(PairtreeHashStash(str(tmp_path))) == 9
+    with open(stash.manifest.path, "a") as f:
+        f.write('{"op": "del"')  # torn write is ignored
+    assert len(PairtreeHashStash(str(tmp_path))) == 9
+    assert len(stash.rebuild_manifest()) == 9
+
+def test_pairtree_write_behind(tmp_path):
+    stash = PairtreeHashStash(str(tmp_path), write_behind=True, write_batch_size=50)
+    for i in range(200):
+        stash[f"key{i % 20}"] = i
+    assert len(stash) == 20 and stash["key19"] == 199  # reads wait for queued writes
+    stash["key0"] = "last"
+    PairtreeHashStash(str(tmp_path)).flush()  # any instance on the path can flush
+    assert PairtreeHashStash(str(tmp_path))["key0"] == "last"
+    # one version file per key, and no leftover temporary files
+    files = [f for _, _, fs in os.walk(stash.path) for f in fs if f[0] != "."]
+    assert len(files) == 20
+    assert not [f for _, _, fs in os.walk(stash.path) for f in fs if f.endswith(".tmp")]
+
+def _pairtree_overwrite(path, n):
+    stash = PairtreeHashStash(path)
+    for i in range(n):
+        stash["key"] = {"i": i}
+        stash.set_many({"a": i, "b": i})
+
+def test_pairtree_reads_during_overwrites(tmp_path):
+    stash = PairtreeHashStash(str(tmp_path))
+    stash.set_many({"key": {"i": -1}, "a": -1, "b": -1})
+    proc = get_mp_context().Process(target=_pairtree_overwrite, args=(str(tmp_path), 300))
+    proc.start()
+    seen = set()
+    while proc.is_alive():
+        # every read finds the old value or the new one, never a missing file
+        seen.add(stash["key"]["i"])
+        assert None not in stash.get_many(["a", "b"])
+        assert len(stash.get_all("key")) == 1
+        assert len([v for v in stash.values() if v is not None]) == 3
+    proc.join()
+    assert proc.exitcode == 0 and stash["key"] == {"i": 299}
+    assert len(seen) > 1
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+import pytest
+
+# generous enough for slow CI runners; a bare `import hashstash` takes ~0.15s locally
+IMPORT_TIME_BUDGET = 0.5
+
+def run_python(code):
+    return subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+def test_import_time_budget():
+    code = "import time; t=time.perf_counter(); import hashstash; print(time.perf_counter()-t)"
+    # best of three, to ignore a cold disk cache
+    assert min(float(run_python(code)) for _ in range(3)) < IMPORT_TIME_BUDGET
+
+def test_import_starts_no_processes():
+    code = "import multiprocessing as mp, hashstash; print(len(mp.active_children()))"
+    assert run_python(code) == "0"
+
+def test_import_keeps_start_method():
+    code = "import multiprocessing as mp, hashstash; print(mp.get_start_method(allow_none=True))"
+    assert run_python(code) == "None"
+
+@pytest.mark.parametrize("module", [
+    "multiprocessing.managers",
+    "hashstash.engines.pairtree",
+    "hashstash.engines.lmdb",
+    "hashstash.engines.sqlite",
+    "hashstash.profilers",
+    "sqlite3",
+    "lmdb",
+    "pandas",
+    "numpy",
+])
+def test_import_is_lazy(module):
+    code = f"import sys, hashstash; print({module!r} in sys.modules)"
+    assert run_python(code) == "False"
+
+def test_lazy_engine_access():
+    code = "import hashstash; print(hashstash.PairtreeHashStash.engine, hashstash.HashStash(engine='memory').engine)"
+    assert run_python(code) == "pairtree memory"
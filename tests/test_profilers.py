@@ -162,3 +162,36 @@ def test_profile_one():
     
 #     plot = HashStashProfiler.plot(df)
 #     assert plot is not None
+
+def test_profile_get_overhead():
+    with HashStash(engine='memory').tmp() as stash:
+        result = HashStashProfiler(stash).profile_get_overhead(iterations=50)
+        assert result['Iterations'] == 50
+        assert result['Get Time (s)'] > 0 and result['Traced Get Time (s)'] > 0
+
+def test_profile_serializer_corpora():
+    results = profile_serializer_corpora(size=100, iterations=1)
+    assert len(results) == len(SERIALIZER_CORPORA) * 2
+    assert all(r["Serialize Time (s)"] > 0 and r["Serialized Size (B)"] > 0 for r in results)
+    records = deserialize(serialize(generate_corpus("instances", 10)))
+    assert [r.name for r in records] == [f"record_{i}" for i in range(10)]
+
+def test_profile_json_backends():
+    from hashstash.serializers.jsons import get_json_backend_name
+    active = get_json_backend_name()
+    results = profile_json_backends(corpora=["nested_dict"], size=100, iterations=1)
+    assert [r["JSON Backend"] for r in results] == get_working_json_backends()
+    assert all(r["Serialize Time (s)"] > 0 for r in results)
+    assert get_json_backend_name() == active
+
+def test_profile_compression_dictionary():
+    pytest.importorskip("zstandard")
+    results = {r["Compress"]: r for r in profile_compression_dictionary(num_values=1_000, sample=500, compressers=["zlib", "zstd"])}
+    assert list(results) == ["zlib", "zstd", "zstd+dict"]
+    assert results["zstd+dict"]["Ratio"] > results["zstd"]["Ratio"] > 1
+
+def test_profile_auto_codecs():
+    results = {r["Data Type"]: r["Codec"] for r in profile_auto_codecs(size=2_000, iterations=1)}
+    assert results["primitive"] == results["list"] == results["nested_list"] == "json"
+    assert results["instances"] == "hashstash"
+    assert results["numpy_array"] == results["pandas_df"] == "hashstash-binary"
@@ -7,7 +7,7 @@ from pandas.testing import assert_frame_equal
 from pathlib import Path
 from hashstash.constants import SERIALIZER_TYPES
 
-serializers = ['hashstash']
+serializers = ['hashstash', 'hashstash-binary']
 
 @pytest.fixture(params=serializers)
 def serializer_type(request):
@@ -156,4 +156,232 @@ class TestSerializers:
         assert result == large_data
         #print(f"\nSerializer: {cache.serializer}")
         #print(f"Write time: {write_time:.4f} seconds")
-        #print(f"Read time: {read_time:.4f} seconds")
\ No newline at end of file
+        #print(f"Read time: {read_time:.4f} seconds")
+
+
+def test_binary_frame_keeps_payloads_raw():
+    arr = np.arange(100_000, dtype=np.float64).reshape(1000, 100)
+    data = serialize({'arr': arr, 'bytes': b'\x00' * 1000, 'df': pd.DataFrame({'a': [1, 2]})}, 'hashstash-binary')
+    assert len(data) < arr.nbytes + 4_000  # no b64 inflation
+    result = deserialize(data, 'hashstash-binary')
+    assert np.array_equal(result['arr'], arr) and result['bytes'] == b'\x00' * 1000
+    assert result['df'].equals(pd.DataFrame({'a': [1, 2]}))
+    # arrays are views over the frame, not copies
+    assert np.shares_memory(result['arr'], np.frombuffer(data, dtype=np.uint8))
+    assert deserialize(serialize(arr[:, ::7], 'hashstash-binary'), 'hashstash-binary').tolist() == arr[:, ::7].tolist()
+
+
+def test_pickle_oob_reads_over_mmap(tmp_path):
+    import mmap
+    stash = PairtreeHashStash(str(tmp_path), serializer='pickle5-oob', compress=False, b64=False)
+    arr = np.random.rand(500, 500)
+    df = pd.DataFrame({'a': np.arange(200_000)})
+    stash['arr'] = arr
+    stash['df'] = df
+    assert isinstance(stash._get(stash.encode_key('arr')), mmap.mmap)
+    result = stash['arr']
+    assert np.array_equal(result, arr) and not result.flags.writeable  # a view over the file
+    assert stash['df'].equals(df)
+    stash['small'] = {'a': [1, 2]}  # below mmap_min_size: read into bytes
+    assert stash['small'] == {'a': [1, 2]}
+
+
+@pytest.mark.parametrize("serializer", ["hashstash", "hashstash-binary", "auto"])
+def test_deep_structures_without_recursion(serializer):
+    class Node:
+        def __init__(self, id, child=None):
+            self.id = id
+            self.child = child
+
+    nested = leaf = []
+    for i in range(5_000):
+        leaf.append({'i': i, 'next': [], 't': (i,)})
+        leaf = leaf[-1]['next']
+    chain = None
+    for i in reversed(range(2_000)):
+        chain = Node(i, chain)
+    deep_dict, deep_list = {}, []
+    for _ in range(500):
+        deep_dict, deep_list = {'n': deep_dict}, [deep_list]
+
+    with HashStash(engine="memory", serializer=serializer).tmp() as stash:
+        stash['nested'] = nested
+        stash['chain'] = chain
+        stash['dict'] = deep_dict
+        stash['list'] = deep_list
+        stash[('deep', 'key', deep_list)] = 1
+        result = stash['nested']
+        for i in range(5_000):
+            assert result[0]['i'] == i and result[0]['t'] == (i,)
+            result = result[0]['next']
+        assert result == []
+        result = stash['chain']
+        for _ in range(1_999):
+            result = result.child
+        assert result.id == 1_999 and result.child is None
+        assert stash['dict'] == deep_dict and stash['list'] == deep_list
+        assert stash[('deep', 'key', deep_list)] == 1
+
+
+def test_json_native_subtrees_pass_through():
+    from hashstash.serializers.custom import _serialize_custom, _deserialize_custom
+    native = {'a': [1, 'x', {'b': None}], 'c': 2.0}
+    mixed = {'native': native, 't': (1, 2)}
+    assert _serialize_custom(native) is native
+    assert _serialize_custom(mixed)['native'] is native
+    assert _deserialize_custom(native) is native
+
+
+@pytest.mark.parametrize("backend", get_working_json_backends())
+def test_json_backends(backend):
+    from hashstash.serializers.jsons import get_json_backend_name, set_json_backend
+    active = get_json_backend_name()
+    key = {"b": [1, 2.5, "é", None], "a": (1, 2), 3: float("inf")}
+    canonical_key = serialize(key, "hashstash", canonical=True)
+    value = {"nan": float("nan"), "big": 2**70, 1: "int key", "s": "é/null", "arr": np.arange(3)}
+    try:
+        set_json_backend(backend)
+        assert Config().json_backend == backend
+        # keys are byte-identical under every backend
+        assert serialize(key, "hashstash", canonical=True) == canonical_key
+        data = serialize(value, "hashstash")
+        for reader in get_working_json_backends():
+            set_json_backend(reader)
+            result = deserialize(data, "hashstash")
+            assert np.isnan(result["nan"]) and result["big"] == 2**70 and result["s"] == "é/null"
+            assert result["1"] == "int key" and result["arr"].tolist() == [0, 1, 2]
+        if backend == "orjson":
+            # None alone keeps the fast path; only non-finite floats need stdlib json
+            dumps = get_json_backend()[0]
+            assert dumps({"a": [None, 1.5]}) == b'{"a":[null,1.5]}'
+            assert dumps({"a": [None, float("-inf")]}) == '{"a": [null, -Infinity]}'
+    finally:
+        set_json_backend(active)
+
+
+def test_auto_serializer_tags_codec_per_value():
+    values = {
+        "json": [{"a": [1, 2.5, None], "b": "text"}],
+        "hashstash": [{"t": (1, 2), "s": {3}}],
+        "hashstash-binary": [{"arr": np.arange(1000), "n": 1}],
+    }
+    for codec, value in values.items():
+        data = serialize(value, "auto")
+        assert get_auto_codec_of(data) == codec
+        result = deserialize(data, "auto")
+        assert str(result) == str(value)
+    df = pd.DataFrame({"a": [1, 2]})
+    assert deserialize(serialize([df], "auto"), "auto")[0].equals(df)
+    # mixed values in one stash stay readable
+    with HashStash(engine="memory", serializer="auto").tmp() as stash:
+        stash.update({"json": values["json"][0], "arr": np.arange(1000), "cls": {1, 2}})
+        assert stash["json"] == values["json"][0] and stash["cls"] == {1, 2}
+        assert np.array_equal(stash["arr"], np.arange(1000))
+
+
+@pytest.mark.parametrize("serializer", ["hashstash", "hashstash-binary", "auto"])
+def test_instances_share_a_class_table(serializer):
+    class Point:
+        def __init__(self, x):
+            self.x = x
+
+        def double(self):
+            return self.x * 2
+
+    points = [Point(i) for i in range(1000)]
+    data = serialize(points, serializer)
+    raw = data if isinstance(data, bytes) else data.encode()
+    assert raw.count(b"__methods__") == 1  # the class is written once, not per instance
+    for _ in range(2):
+        result = deserialize(data, serializer)
+        assert [p.double() for p in result] == [i * 2 for i in range(1000)]
+        assert len({type(p) for p in result}) == 1
+    # the rebuilt class is cached across values
+    assert type(deserialize(data, serializer)[0]) is type(result[0])
+
+
+@pytest.mark.parametrize("serializer", ["hashstash", "hashstash-binary", "auto"])
+def test_standard_library_types(serializer):
+    import datetime, decimal, fractions, uuid
+    from hashstash.profilers.serializer_profiler import ProfileKind, ProfileSpan, ProfileTypedRecord
+
+    values = [
+        datetime.datetime(2024, 5, 1, 12, 30, 15, 500),
+        datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=-5))),
+        datetime.date(2024, 5, 1),
+        datetime.time(23, 59, 59, 999999),
+        datetime.timedelta(days=-2, seconds=5, microseconds=7),
+        decimal.Decimal("1.10"),
+        decimal.Decimal("-Infinity"),
+        uuid.UUID(int=12345),
+        fractions.Fraction(-2, 3),
+        ProfileKind.SELL,
+        ProfileSpan(1, (2, 3)),
+        ProfileTypedRecord.sample(5),
+        {"records": [ProfileTypedRecord.sample(i) for i in range(3)]},
+    ]
+    for value in values[:-4]:
+        result = deserialize(serialize(value, serializer), serializer)
+        assert result == value and type(result) is type(value)
+    result = deserialize(serialize(values, serializer), serializer)
+    assert result[-4] is ProfileKind.SELL
+    assert result == values and type(result[-2].span) is ProfileSpan
+
+    # compact tags, not the generic instance or __reduce__ forms
+    data = serialize(values, serializer)
+    raw = data if isinstance(data, bytes) else data.encode()
+    assert b'"dataclass"' in raw and b'"namedtuple"' in raw and b'"enum"' in raw
+    assert b'"reducer"' not in raw
+
+
+def test_datetime_with_zoneinfo():
+    import datetime
+    from zoneinfo import ZoneInfo
+
+    when = datetime.datetime(2021, 11, 7, 1, 30, fold=1, tzinfo=ZoneInfo("America/New_York"))
+    result = deserialize(serialize(when))
+    assert result == when and result.tzinfo is when.tzinfo and result.fold == 1
+
+
+@pytest.mark.parametrize("serializer", ["hashstash", "hashstash-binary", "auto"])
+def test_scipy_sparse(serializer):
+    sparse = pytest.importorskip("scipy.sparse")
+    matrix = sparse.random(60, 40, density=0.1, format="csr", random_state=0)
+    for fmt in ["csr", "csc", "coo", "bsr", "dok", "lil"]:
+        for kind in ["matrix", "array"]:
+            value = getattr(sparse, f"{fmt}_{kind}")(matrix)
+            result = deserialize(serialize(value, serializer), serializer)
+            assert type(result) is type(value)
+            assert (result != value).nnz == 0
+
+
+@pytest.mark.parametrize("serializer", ["hashstash", "hashstash-binary", "auto"])
+def test_arrow_tables(serializer):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({"id": np.arange(5000), "name": [f"row_{i}" for i in range(5000)]})
+    data = serialize({"table": table, "batch": table.to_batches()[0]}, serializer)
+    result = deserialize(data, serializer)
+    assert result["table"].equals(table)
+    assert result["batch"].equals(table.to_batches()[0])
+
+
+@pytest.mark.parametrize("serializer", ["hashstash", "hashstash-binary", "auto"])
+def test_torch_tensors(serializer):
+    torch = pytest.importorskip("torch")
+    values = [
+        torch.arange(12, dtype=torch.float32).reshape(3, 4),
+        torch.ones(5, dtype=torch.bfloat16),
+        torch.zeros(0, 3, dtype=torch.int64),
+        torch.nn.Parameter(torch.rand(2, 2)),
+    ]
+    result = deserialize(serialize(values, serializer), serializer)
+    for got, expected in zip(result, values):
+        assert type(got) is type(expected) and got.dtype == expected.dtype
+        assert torch.equal(got.detach(), expected.detach())
+        assert got.requires_grad == expected.requires_grad
+
+
+def test_scientific_libraries_not_imported():
+    import subprocess, sys
+    code = "import sys, hashstash; print(any(m in sys.modules for m in ('scipy', 'pyarrow', 'torch')))"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip() == "False"
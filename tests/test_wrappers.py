@@ -121,5 +121,51 @@ def test_parallelized_with_stashed_result_single_input():
         result3 = parallel_stashed_function(7)
         assert result3 == 14
 
+def test_log_decorator_is_free_when_not_tracing():
+    from hashstash.utils.logs import tracing_enabled
+    @log.debug
+    def plain(x):
+        return x
+    assert not tracing_enabled()
+    assert not hasattr(plain, '__wrapped__')
+
+def test_tracing_records_and_restores():
+    from hashstash.engines.base import BaseHashStash
+    original = BaseHashStash.__dict__['get']
+    with HashStash(engine='memory').tmp() as stash:
+        stash['a'] = 1
+        with tracing() as records:
+            assert BaseHashStash.__dict__['get'] is not original
+            assert stash.get('a') == 1
+        assert BaseHashStash.__dict__['get'] is original
+        funcs = [r['func'] for r in records]
+        assert 'hashstash.engines.base.BaseHashStash.get' in funcs
+        outer = next(r for r in records if r['func'].endswith('BaseHashStash.get'))
+        assert outer['depth'] == 1 and outer['seconds'] > 0 and outer['error'] is None
+        assert all(r['depth'] > 1 for r in records if r is not outer)
+        stash.get('a')
+        assert len(funcs) == len(records)
+
+def test_tracing_records_errors():
+    with HashStash(engine='memory').tmp() as stash:
+        with tracing() as records:
+            with pytest.raises(KeyError):
+                stash['missing']
+        assert any(r['error'] == 'KeyError' for r in records)
+
+def test_traced_closures_are_not_kept():
+    import gc
+    import weakref
+
+    def make():
+        @log.debug
+        def inner():
+            pass
+        return weakref.ref(inner)
+
+    ref = make()
+    gc.collect()
+    assert ref() is None
+
 if __name__ == "__main__":
-    pytest.main()
\ No newline at end of file
+    pytest.main()